@@ -0,0 +1,168 @@
+#-------------------------------------------------------------------------------
+# Name:        Batch Runner
+#
+# Purpose:     Command-line batch entry point of the toolbox for many areas at once, for example all Urban Atlas FUAs.
+#              Jobs are read from a manifest (.json file) and each job runs one script of the toolbox in its own python process
+#              (the scripts read their parameters by arcpy.GetParameterAsText, which takes them from the command line outside ArcGIS Pro).
+#              At most "workers" jobs run at once and jobs with the same output workspace never run at the same time
+#              (the scripts use the same names of intermediate layers). All jobs share the cache of the toolbox (TN_CACHE_DIR, see "tn_core" module),
+#              the cache lock lets only one of them write into it at once. Completed jobs are saved into the state file, so they are skipped
+#              when the batch is started again, and at the end the summary report of all jobs (status, time, error) is written.
+#              Usage (in the python environment of ArcGIS Pro):
+#              python batch_runner.py manifest.json [--workers N]
+#
+# Author:      Adam Tóth
+#
+# This script is a part of bachelor thesis "Possibilities of calculation characteristics of the transport network of states and cities"
+# supervisor: doc. Ing. Zdena Dobešová, Ph.D.
+# Department of Geoinformatics, Faculty of Science, Palacký University in Olomouc, Czech republic
+#
+# Created:     17.10.2026
+#-------------------------------------------------------------------------------
+
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import argparse
+import subprocess
+
+# parameters of the scripts in the order of the tool's interface: pairs (name in the manifest, default value);
+# optional parameters at the end are described in README (empty value means the default value of the script)
+common = [("data", ""), ("area", ""), ("hex_or_own", "false"), ("size", ""), ("own_layer", ""), ("workspace", ""), ("cor_sys", "")]
+tools = {
+    "osm_highways": common + [("use_memory", ""), ("memory_budget", "")],
+    "bridges_tunnels": common + [("use_memory", ""), ("memory_budget", ""), ("tile_size", ""), ("workers", "")],
+    "eu_grid_population": common[:1] + [("pop_data", "")] + common[1:] + [("use_memory", ""), ("memory_budget", ""), ("tile_size", ""), ("workers", ""),
+                          ("pop_fields", "")],
+    "ua_density": common[:6] + [("ftroads", "true"), ("oroads", "true"), ("rails", "true"), ("ports", "true"), ("airports", "true"), ("cor_sys", ""),
+                                ("use_memory", ""), ("memory_budget", "")],
+    "fractal_dc": common + [("workers", ""), ("fit_stats", ""), ("levels", ""), ("adaptive", ""), ("resume", ""), ("batch_size", ""),
+                            ("use_memory", ""), ("memory_budget", "")],
+    "fused_indicators": common[:1] + [("pop_data", "")] + common[1:] + [("use_memory", ""), ("memory_budget", "")]}
+
+
+# text of the parameter for the command line: booleans as "true"/"false" (as in ArcGIS Pro), None as empty text
+def parameter_text(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return ""
+    return str(value)
+
+
+# identifier of the job: "id" from the manifest, otherwise hash of the tool and its parameters (the same job has the same identifier in every run)
+def job_id(job):
+    if "id" in job:
+        return str(job["id"])
+    return job["tool"] + "_" + hashlib.sha1(json.dumps(job, sort_keys=True).encode()).hexdigest()[:12]
+
+
+# command line of the job: python of this environment, the script of the tool and its parameters by names from "tools"
+# ("output" can be used instead of "workspace"); raises ValueError for unknown tool or parameter
+def job_command(job):
+    if job.get("tool") not in tools:
+        raise ValueError(f"unknown tool {job.get('tool')}, tools: {', '.join(tools)}")
+    names = [name for name, default in tools[job["tool"]]]
+    values = dict(job)
+    if "output" in values:
+        values["workspace"] = values.pop("output")
+    unknown = [key for key in values if key not in names + ["tool", "id"]]
+    if unknown:
+        raise ValueError(f"unknown parameters {unknown} of tool {job['tool']}")
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), job["tool"] + ".py")
+    return [sys.executable, script] + [parameter_text(values.get(name, default)) for name, default in tools[job["tool"]]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs jobs of the toolbox from the manifest (.json file with a list of jobs).")
+    parser.add_argument("manifest", help="manifest: list of jobs, each job is an object with 'tool' and parameters by names, e.g. "
+                                         "{\"tool\": \"ua_density\", \"data\": ..., \"area\": ..., \"size\": \"1 SquareKilometers\", \"output\": ...}")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="maximum number of jobs running at once")
+    parser.add_argument("--state", help="state file with completed jobs (default: <manifest>_state.json)")
+    parser.add_argument("--report", help="summary report (default: <manifest>_summary.csv)")
+    args = parser.parse_args()
+
+    base = os.path.splitext(args.manifest)[0]
+    state_file = args.state or base + "_state.json"
+    report_file = args.report or base + "_summary.csv"
+    log_folder = base + "_logs"
+    os.makedirs(log_folder, exist_ok=True)
+
+    with open(args.manifest) as file:
+        jobs = json.load(file)
+
+    # completed jobs of the previous runs are skipped
+    done = {}
+    if os.path.exists(state_file):
+        with open(state_file) as file:
+            done = json.load(file)
+
+    # "results" are rows of the summary report: id, tool, status (done, skipped, failed, invalid), time in seconds, log file and error
+    results = []
+    pending = []
+    for job in jobs:
+        name = job_id(job)
+        if name in done:
+            results.append([name, job.get("tool"), "skipped", done[name], "", ""])
+            continue
+        try:
+            pending.append((name, job, job_command(job)))
+        except ValueError as error:
+            results.append([name, job.get("tool"), "invalid", 0, "", str(error)])
+    print(f"{len(jobs)} jobs in the manifest, {len(pending)} to run, {len(jobs) - len(pending)} skipped or invalid, {args.workers} at once")
+
+    # jobs are started in the order of the manifest when less than "workers" jobs are running and no running job writes into the same workspace;
+    # all jobs use the same cache (reprojected inputs and hexagon grids are created only once, writing into the cache is serialized by its lock,
+    # see "tn_core" module); the output of each job goes into its log file, the job is successful if its script ended with exit code 0
+    # and printed "Trash deleted" (every script prints it only at the end of a successful run, errors of inputs don't change the exit code)
+    running = {}
+    while pending or running:
+        busy = set(os.path.normcase(os.path.abspath(job.get("workspace", job.get("output", "")))) for job, _, _, _ in running.values())
+        for item in list(pending):
+            if len(running) >= args.workers:
+                break
+            name, job, command = item
+            workspace = os.path.normcase(os.path.abspath(job.get("workspace", job.get("output", ""))))
+            if workspace in busy:
+                continue
+            log = open(os.path.join(log_folder, name + ".log"), "w")
+            running[name] = (job, subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT), log, time.time())
+            busy.add(workspace)
+            pending.remove(item)
+            print(f"started {name}")
+
+        time.sleep(1)
+        for name in list(running):
+            job, process, log, start = running[name]
+            if process.poll() is None:
+                continue
+            log.close()
+            seconds = round(time.time() - start, 1)
+            with open(log.name) as file:
+                lines = file.read().splitlines()
+            errors = [line for line in lines if ("ERROR" in line) or ("Error" in line)]
+            if (process.returncode == 0) and any("Trash deleted" in line for line in lines):
+                results.append([name, job["tool"], "done", seconds, log.name, ""])
+                done[name] = seconds
+                with open(state_file, "w") as file:
+                    json.dump(done, file, indent=2)
+                print(f"done {name} ({seconds} s)")
+            else:
+                results.append([name, job["tool"], "failed", seconds, log.name, errors[-1] if errors else f"exit code {process.returncode}, last message: {lines[-1] if lines else ''}"])
+                print(f"failed {name} ({seconds} s), see {log.name}")
+            del running[name]
+
+    # summary report
+    with open(report_file, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["id", "tool", "status", "seconds", "log", "error"])
+        writer.writerows(results)
+    counts = dict((status, sum(1 for row in results if row[2] == status)) for status in ["done", "skipped", "failed", "invalid"])
+    print(f"Summary: {counts}, total time of jobs {round(sum(row[3] for row in results if row[2] in ['done', 'failed']), 1)} s, report: {report_file}")
+    return 1 if counts["failed"] or counts["invalid"] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
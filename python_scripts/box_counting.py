@@ -0,0 +1,150 @@
+#-------------------------------------------------------------------------------
+# Name:        Box Counting
+#
+# Purpose:     In-memory box-counting engine for the "Fractal Dimension" tool (fractal_dc.py).
+#              Instead of creating a fishnet for every hexagon and selecting its squares by location,
+#              line segments of one hexagon are loaded into numpy arrays and the squares (boxes) which
+#              the segments pass through are counted with plain arithmetic on the hexagon's extent.
+#              This module uses only numpy, so it can be imported without arcpy.
+#
+# Author:      Adam Tóth
+#
+# This script is a part of bachelor thesis "Possibilities of calculation characteristics of the transport network of states and cities"
+# supervisor: doc. Ing. Zdena Dobešová, Ph.D.
+# Department of Geoinformatics, Faculty of Science, Palacký University in Olomouc, Czech republic
+#
+# Created:     17.10.2026
+#-------------------------------------------------------------------------------
+
+import numpy
+
+
+# converts polyline geometry (arcpy Polyline or any object which iterates over parts of points with X and Y)
+# into numpy array of segments, one row for each segment: x0, y0, x1, y1
+def polyline_segments(shape):
+    segments = []
+    for part in shape:
+        points = [(p.X, p.Y) for p in part if p]
+        if len(points) > 1:
+            points = numpy.array(points, dtype=float)
+            segments.append(numpy.hstack([points[:-1], points[1:]]))
+    if segments:
+        return numpy.vstack(segments)
+    return numpy.zeros((0, 4))
+
+
+# returns row and column indices of squares (boxes) of the finest grid (2**level x 2**level squares laid over "extent" = xmin, ymin, xmax, ymax)
+# which are crossed or touched by at least one segment; it is the same set of squares as the fishnet squares selected by location
+# in the original script (up to segments lying exactly on the grid lines)
+def occupied_cells(segments, extent, level):
+    divisions = 2 ** level
+    xmin, ymin, xmax, ymax = extent
+    width = (xmax - xmin) / divisions
+    height = (ymax - ymin) / divisions
+
+    # coordinates of segments are converted into units of squares, so the grid lines are integer numbers
+    x0 = (segments[:, 0] - xmin) / width
+    y0 = (segments[:, 1] - ymin) / height
+    x1 = (segments[:, 2] - xmin) / width
+    y1 = (segments[:, 3] - ymin) / height
+    n = len(x0)
+
+    # "t" are parameters (0-1) of points where the segments cross vertical and horizontal grid lines, together with the start (0)
+    # and the end (1) of each segment, "seg" is the index of the segment; only the grid lines which the segment really crosses are generated,
+    # so the work is proportional to the number of crossed squares and not to the number of squares in the grid
+    t = [numpy.zeros(n), numpy.ones(n)]
+    seg = [numpy.arange(n), numpy.arange(n)]
+    for a0, a1 in ((x0, x1), (y0, y1)):
+        lo = numpy.floor(numpy.minimum(a0, a1))
+        k = (numpy.floor(numpy.maximum(a0, a1)) - lo).astype(numpy.int64)
+        s = numpy.repeat(numpy.arange(n), k)
+        line = lo[s] + 1 + (numpy.arange(k.sum()) - numpy.repeat(numpy.cumsum(k) - k, k))
+        t.append((line - a0[s]) / (a1 - a0)[s])
+        seg.append(s)
+    t = numpy.concatenate(t)
+    seg = numpy.concatenate(seg)
+    order = numpy.lexsort((t, seg))
+    t = t[order]
+    seg = seg[order]
+
+    # middle of each piece between two crossings lies inside exactly one square, pieces of zero length are skipped
+    # (the start and end points of segments are included as well, so touching counts too)
+    valid = (seg[1:] == seg[:-1]) & (t[1:] > t[:-1])
+    s = seg[:-1][valid]
+    tm = (t[1:][valid] + t[:-1][valid]) / 2
+    px = numpy.concatenate([x0[s] + tm * (x1 - x0)[s], x0, x1])
+    py = numpy.concatenate([y0[s] + tm * (y1 - y0)[s], y0, y1])
+    col = numpy.clip(numpy.floor(px), 0, divisions - 1).astype(numpy.int64)
+    row = numpy.clip(numpy.floor(py), 0, divisions - 1).astype(numpy.int64)
+    cells = numpy.unique(row * divisions + col)
+    return cells // divisions, cells % divisions
+
+
+# list "intersections" for one hexagon: counts of squares which cover lines in grids of 1, 4, 16, ..., 4**levels squares;
+# the segments are rasterized only once in the finest grid and the coarser grids are derived by integer shifts of indices
+# (square (row, col) of the finer grid lies in the square (row // 2, col // 2) of the coarser grid),
+# levels = 4 gives the same scales as the fishnets in the original script (1, 4, 16, 64, 256)
+def box_counts(segments, extent, levels=4):
+    row, col = occupied_cells(segments, extent, levels)
+    intersections = []
+    for shift in range(levels, -1, -1):
+        intersections.append(numpy.unique(((row >> shift) << (levels - shift)) + (col >> shift)).size)
+    return intersections
+
+
+# worker function for parallel processing: "chunk" is a list of (segments, extent, levels) tuples of several hexagons,
+# the result is a list of their "intersections" lists in the same order
+def box_counts_chunk(chunk):
+    return [box_counts(segments, extent, levels) for segments, extent, levels in chunk]
+
+
+# relative sizes of squares for the given number of levels: 1, 0.5, 0.25, ..., 1/2**levels
+def edge_sizes(levels=4):
+    return [0.5 ** level for level in range(levels + 1)]
+
+
+# mask of levels used in the fit (adaptive stop): refinement ends at the first level where the count of squares grows
+# at most 2*(1+tolerance) times compared to the coarser level, because from there on the lines behave like simple lines (dimension 1)
+# and finer levels only describe the resolution, not the network; at least 3 levels (0, 1, 2) are always used
+def saturation_mask(counts, tolerance=0.05):
+    counts = numpy.asarray(counts, dtype=float)
+    ratio = counts[:, 1:] / counts[:, :-1]
+    saturated = ratio <= 2 * (1 + tolerance)
+    # first saturated level (1-based like levels), or the last level if the counts never saturate
+    first = numpy.where(saturated.any(axis=1), saturated.argmax(axis=1) + 1, counts.shape[1] - 1)
+    first = numpy.maximum(first, min(2, counts.shape[1] - 1))
+    return numpy.arange(counts.shape[1])[numpy.newaxis, :] <= first[:, numpy.newaxis]
+
+
+# fits straight line log(count) = intercept + slope * log(edge) for all hexagons at once by ordinary least squares,
+# "edge" is a list of relative sizes of squares (n_scales) and "counts" is a matrix of box counts (n_hex x n_scales),
+# "mask" (n_hex x n_scales, optional) tells which levels are used for each hexagon (see "saturation_mask");
+# returns numpy arrays (one value for each hexagon): slope, standard error of slope and coefficient of determination R2
+# (R2 is nan when all counts of the hexagon are the same, because then there is nothing to explain)
+def fit_loglog(edge, counts, mask=None):
+    logx = numpy.log(numpy.asarray(edge, dtype=float))
+    logy = numpy.log(numpy.asarray(counts, dtype=float).reshape(-1, len(logx)))
+    if mask is None:
+        w = numpy.ones(logy.shape)
+    else:
+        w = numpy.asarray(mask, dtype=float)
+    n = w.sum(axis=1)
+
+    # closed-form solution, "w" is 1 for used levels and 0 for the others
+    dx = logx[numpy.newaxis, :] - ((w * logx).sum(axis=1) / n)[:, numpy.newaxis]
+    dy = logy - ((w * logy).sum(axis=1) / n)[:, numpy.newaxis]
+    sxx = (w * dx ** 2).sum(axis=1)
+    slope = (w * dx * dy).sum(axis=1) / sxx
+
+    # residuals, standard error of slope and R2
+    ssr = (w * (dy - slope[:, numpy.newaxis] * dx) ** 2).sum(axis=1)
+    sst = (w * dy ** 2).sum(axis=1)
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        slope_se = numpy.where(n > 2, numpy.sqrt(ssr / (n - 2) / sxx), numpy.nan)
+        r2 = numpy.where(sst > 0, 1 - ssr / sst, numpy.nan)
+    return slope, slope_se, r2
+
+
+# transport provision from slope of the fitted line, the same formula as in the original script: float(int(slope*100000))/(-200000)
+def transport_provision(slope):
+    return numpy.trunc(numpy.asarray(slope) * 100000) / (-200000)
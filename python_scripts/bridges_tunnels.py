@@ -16,12 +16,15 @@
 # Created:     23.03.2022
 #-------------------------------------------------------------------------------
 
-# import library arcpy and allow overwriting features with the same name
+# import library arcpy and "tn_core" module of this toolbox and allow overwriting features with the same name
 import arcpy
+import tn_core
 arcpy.env.overwriteOutput = True
 
 def main():
     arcpy.AddMessage("The script has started!")
+    # results of the input checks of the previous run are forgotten (see "tn_core" module)
+    tn_core.reset_validation()
 
     # getting inputs from parameters in tool's interface
     data = arcpy.GetParameterAsText(0)
@@ -31,6 +34,10 @@ def main():
     own_layer = arcpy.GetParameterAsText(4)
     workspace = arcpy.GetParameterAsText(5)
     cor_sys_string = arcpy.GetParameterAsText(6)
+    # tiled mode for continent-scale inputs: side of square tiles in km (0 means no tiling, see "tn_core" module)
+    tile_size = float(tn_core.optional_parameter(9, "0"))
+    # number of worker processes for the tiles in tiled mode (1 means no parallel processing, 0 means all processors)
+    workers = tn_core.worker_count(tn_core.optional_parameter(10, "1"))
 
     area_name = area[(area.rfind(chr(92))+1):]
 
@@ -45,18 +52,13 @@ def main():
     if desc.shapeType == "Polyline":
         for i in fields:
             if (i.name == 'code') and ((i.type == 'SmallInteger') or (i.type == 'Integer')):
-                with arcpy.da.SearchCursor(data, i.name) as cursor:
-                    for row in cursor:
-                        if (row[0] > 5110) and (row[0] < 5136):
-                            check_d += 1
-                            rd_or_rlw = "rd"
-                            break
-                with arcpy.da.SearchCursor(data, i.name) as cursor:
-                    for row in cursor:
-                        if (row[0] == 6101) or (row[0] == 6102):
-                            check_d += 1
-                            rd_or_rlw = "rlw"
-                            break
+                # where-clause probes, only the first road and the first railway are read (see "tn_core" module)
+                if tn_core.has_rows(data, "code > 5110 And code < 5136"):
+                    check_d += 1
+                    rd_or_rlw = "rd"
+                if tn_core.has_rows(data, "code = 6101 Or code = 6102"):
+                    check_d += 1
+                    rd_or_rlw = "rlw"
             if (i.name == 'bridge') and (i.type == 'String'):
                 check_d += 1
             if (i.name == 'tunnel') and (i.type == 'String'):
@@ -77,7 +79,7 @@ def main():
 
     # if it doesn't meet the requirements, script is ended
     if check_d < 4:
-        del data, area, size, workspace, cor_sys_string, desc, fields, i, cursor, row, check_d, area_name, rd_or_rlw, hex_or_own, own_layer
+        del data, area, size, workspace, cor_sys_string, tile_size, workers, desc, fields, i, check_d, area_name, rd_or_rlw, hex_or_own, own_layer
         arcpy.AddError("Your data is not suitable for this script.")
     else:
         arcpy.AddMessage("Your data layer is OK.")
@@ -91,8 +93,11 @@ def main():
             arcpy.management.CreateFileGDB(workspace, "working.gdb")
             workspace = workspace + chr(92) + "working.gdb"
 
-        # setting of workspace in environments
-        arcpy.env.workspace = workspace
+        # setting of workspace in environments: intermediate layers can be kept in memory instead of the disk (optional parameters:
+        # "true" to use memory and the memory budget in MB), if their estimated size is bigger than the budget, the disk is used (see "tn_core" module);
+        # "disk_workspace" is the workspace on the disk where the output is saved
+        disk_workspace = workspace
+        workspace = tn_core.intermediate_workspace(workspace, tn_core.optional_parameter(7, "false"), float(tn_core.optional_parameter(8, "2048")), [data, area, own_layer])
 
         # checking and setting the main coordinate system and projecting data into it
         data_spref = arcpy.Describe(data).spatialReference
@@ -100,92 +105,51 @@ def main():
         if hex_or_own == "true":
             own_layer_spref = arcpy.Describe(own_layer).spatialReference
 
-       # if user selected projected coordinate system with meter as its unit, it is set as the main coordinate system
-        if (cor_sys_string[:6] == "PROJCS") and ('UNIT["Meter",1.0]' in cor_sys_string):
-            cor_sys = arcpy.SpatialReference()
-            cor_sys.loadFromString(cor_sys_string)
-            arcpy.AddMessage(f"You selected this projected coordinate system for the output: {cor_sys.name}")
+        # if user selected projected coordinate system with meter as its unit, it is set as the main coordinate system
         # if user selected geographic coordinate system or projected coordinate system with different unit than meter or they selected nothing,
-        # this is the order of setting the main coordinate system:
+        # this is the order of setting the main coordinate system (see "tn_core" module):
         # the coordinate system of their own output layer, the coordinate system of OSM layer, the system of area, WGS84 Web Mercator (Auxiliary Sphere)
+        if hex_or_own == "true":
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(own_layer_spref, "your output layer"), (data_spref, "OSM layer"), (area_spref, "area layer")])
         else:
-            if hex_or_own == "true":
-                if (own_layer_spref.type == "Projected") and (own_layer_spref.linearUnitName == "Meter"):
-                    cor_sys = own_layer_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of your output layer {cor_sys.name} will be used.")
-                elif (data_spref.type == "Projected") and (data_spref.linearUnitName == "Meter"):
-                    cor_sys = data_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of OSM layer {cor_sys.name} will be used.")
-                elif (area_spref.type == "Projected") and (area_spref.linearUnitName == "Meter"):
-                    cor_sys = area_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of area layer {cor_sys.name} will be used.")
-                else:
-                    cor_sys = arcpy.SpatialReference(3857)
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
-            elif (data_spref.type == "Projected") and (data_spref.linearUnitName == "Meter"):
-                cor_sys = data_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of OSM layer {cor_sys.name} will be used.")
-            elif (area_spref.type == "Projected") and (area_spref.linearUnitName == "Meter"):
-                cor_sys = area_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of area layer {cor_sys.name} will be used.")
-            else:
-                cor_sys = arcpy.SpatialReference(3857)
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(data_spref, "OSM layer"), (area_spref, "area layer")])
 
         arcpy.env.outputCoordinateSystem = cor_sys
 
         # if coordinate systems of data is different from the main coordinate system, it is reprojected into that coordinate system
-        if data_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(data, "reprj_data", cor_sys)
-            data = workspace + chr(92) + "reprj_data"
-            arcpy.AddMessage(f"Data layer was reprojected from {data_spref.factoryCode} to {cor_sys.factoryCode}")
+        # (reprojected layers are kept in the cache, so the same layer is not reprojected again in the next runs, see "tn_core" module)
+        data = tn_core.reproject(data, data_spref, cor_sys, "Data layer")
 
         # if coordinate systems of area is different from the main coordinate system, it is reprojected into that coordinate system
-        if area_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(area, "reprj_area", cor_sys)
-            area = workspace + chr(92) + "reprj_area"
-            arcpy.AddMessage(f"Area layer was reprojected from {area_spref.factoryCode} to {cor_sys.factoryCode}")
+        area = tn_core.reproject(area, area_spref, cor_sys, "Area layer")
 
         # control of output polygon layer which user selected
         check_a = 0
         if hex_or_own == "true":
             # reprojection into the main coordinate system if necessary
-            if own_layer_spref.factoryCode != cor_sys.factoryCode:
-                arcpy.management.Project(own_layer, "reprj_own_layer", cor_sys)
-                own_layer = workspace + chr(92) + "reprj_own_layer"
-                arcpy.AddMessage(f"Your output layer was reprojected from {own_layer_spref.factoryCode} to {cor_sys.factoryCode}")
+            own_layer = tn_core.reproject(own_layer, own_layer_spref, cor_sys, "Your output layer")
             del own_layer_spref
             # control whether the area layer and the output polygon layer overlap
-            control_selection = arcpy.management.SelectLayerByLocation(own_layer, "INTERSECT", area)
-            if int(control_selection[2]) == 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(own_layer, "CLEAR_SELECTION")
+            # (extents are compared first and only the first intersecting feature is searched, see "tn_core" module)
+            if not tn_core.layers_overlap(own_layer, area):
                 arcpy.AddError("Your output layer and area layer don't overlap.")
-            elif int(control_selection[2]) > 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(own_layer, "CLEAR_SELECTION")
-                # control whether the data and the output polygon layer overlap
-                control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", own_layer)
-                if int(control_selection[2]) > 0:
-                    control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
-                    check_a += 1
-                    arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
-                else:
-                    arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
+            # control whether the data and the output polygon layer overlap
+            elif tn_core.layers_overlap(data, own_layer):
+                check_a += 1
+                arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
             else:
-                arcpy.AddError("Your chosen polygon layer for the output and area layer don't overlap.")
+                arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
         else:
             check_a += 1
 
         # control of area layer, whether it is a polygon layer and if it overlaps with OSM layer
         desc = arcpy.Describe(area)
-        control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", area)
 
         if desc.shapeType == "Polygon":
-            if int(control_selection[2]) == 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
+            if not tn_core.layers_overlap(data, area):
                 arcpy.AddError("Your data and area layers don't overlap.")
             # if it meets the requirements, OSM layer is clipped by area
-            elif int(control_selection[2]) > 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
+            else:
                 check_a += 1
                 arcpy.analysis.Clip(data, area, "clipped_data")
                 data = workspace + chr(92) + "clipped_data"
@@ -195,7 +159,7 @@ def main():
 
         # if it doesn't meet the requirements, script is ended
         if check_a < 2:
-            del data, area, size, workspace, cor_sys_string, desc, fields, i, cursor, row, control_selection, check_d, check_a, leng, ending
+            del data, area, size, workspace, disk_workspace, cor_sys_string, tile_size, workers, desc, fields, i, check_d, check_a, leng, ending
             del area_name, data_spref, area_spref, cor_sys, rd_or_rlw, hex_or_own, own_layer
         else:
             # if user selected their own output layer, it is clipped by area layer, this clipped layer is called "hex_gr"
@@ -209,10 +173,8 @@ def main():
                     size = size.replace("Unknown", "SquareKilometers")
                     arcpy.AddMessage("You selected 'Unknown' as the areal unit, therefore 'Square Kilometers' will be used")
 
-                arcpy.management.GenerateTessellation("hex_grid", area, "HEXAGON", size)
-                arcpy.AddMessage("Hexagonal grid generated")
-                arcpy.analysis.Clip("hex_grid", area, "hex_gr")
-                arcpy.AddMessage("Clipped")
+                # the clipped grid is kept in the cache, so it is generated only once for the same area, size and coordinate system (see "tn_core" module)
+                tn_core.hexagon_grid(area, size, cor_sys)
 
             # selection of roads: major roads (5111-5115), minor roads (5121-5124), major road links (5131-5135)
             if rd_or_rlw == "rd":
@@ -247,44 +209,82 @@ def main():
 
             selected_features = arcpy.management.SelectLayerByAttribute("lines_export", "CLEAR_SELECTION")
 
-            # intersecting (cutting) roads/railways by "hex_gr"
-            # and dissolving (merging, aggregating) roads/railways in the same hexagon, so there will be only one feature for each hexagon
-            arcpy.analysis.Intersect(["lines_export", "hex_gr"], "lines_isect", "ONLY_FID")
-            arcpy.management.Dissolve("lines_isect", "lines_isect_diss", "FID_hex_gr")
+            # tiled mode: the hexagons/polygons are divided into tiles (see "tn_core" module)
+            tiles = None
+            if tile_size > 0:
+                tiles = tn_core.hexagon_tiles("hex_gr", tile_size * 1000)
+                arcpy.AddMessage(f"Tiled mode: {len(tiles)} tiles")
+
+            # generated hexagon grid: lengths of roads/railways, bridges and tunnels in hexagons are computed directly from coordinates of the lines,
+            # the lines are split at the edges of hexagons analytically (see "hex_lattice" and "tn_core" modules), so Intersect and Dissolve are not needed;
+            # in tiled mode only the lines of one tile are loaded at once
+            grid = None
+            if hex_or_own != "true":
+                grid = tn_core.grid_lattice("hex_gr")
+            if grid is not None:
+                lengths = {rd_or_rlw + "_length": tn_core.lattice_lengths("lines_export", grid, tiles=tiles)}
+                if arcpy.Exists("bridges"):
+                    lengths[rd_or_rlw + "_bridges_length"] = tn_core.lattice_lengths("bridges", grid, tiles=tiles)
+                if arcpy.Exists("tunnels"):
+                    lengths[rd_or_rlw + "_tunnels_length"] = tn_core.lattice_lengths("tunnels", grid, tiles=tiles)
+                tn_core.write_fields("hex_gr", lengths)
+                arcpy.AddMessage("Lengths in hexagons calculated")
+                del lengths
+            # tiled mode: the lines are intersected and summed tile by tile, so Intersect and Dissolve never process the whole input at once
+            elif tile_size > 0:
+                lengths = {rd_or_rlw + "_length": tn_core.tiled_sums("lines_export", "hex_gr", tiles, ["SHAPE@LENGTH"], workers=workers)}
+                if arcpy.Exists("bridges"):
+                    lengths[rd_or_rlw + "_bridges_length"] = tn_core.tiled_sums("bridges", "hex_gr", tiles, ["SHAPE@LENGTH"], workers=workers)
+                if arcpy.Exists("tunnels"):
+                    lengths[rd_or_rlw + "_tunnels_length"] = tn_core.tiled_sums("tunnels", "hex_gr", tiles, ["SHAPE@LENGTH"], workers=workers)
+                tn_core.write_fields("hex_gr", lengths)
+                arcpy.AddMessage("Lengths in hexagons calculated")
+                del lengths
+            # user's own output layer (or too small area for the lattice)
+            else:
+                # intersecting (cutting) roads/railways by "hex_gr"
+                # and dissolving (merging, aggregating) roads/railways in the same hexagon, so there will be only one feature for each hexagon
+                arcpy.analysis.Intersect(["lines_export", "hex_gr"], "lines_isect", "ONLY_FID")
+                arcpy.management.Dissolve("lines_isect", "lines_isect_diss", "FID_hex_gr")
 
-            # the same Intersect-Dissolve process with bridges, if there are some
-            if arcpy.Exists("bridges"):
-                arcpy.analysis.Intersect(["bridges", "hex_gr"], "bridges_isect", "ONLY_FID")
-                arcpy.management.Dissolve("bridges_isect", "bridges_isect_diss", "FID_hex_gr")
+                # the same Intersect-Dissolve process with bridges, if there are some
+                if arcpy.Exists("bridges"):
+                    arcpy.analysis.Intersect(["bridges", "hex_gr"], "bridges_isect", "ONLY_FID")
+                    arcpy.management.Dissolve("bridges_isect", "bridges_isect_diss", "FID_hex_gr")
 
-            # the same Intersect-Dissolve process with tunnels, if there are some
-            if arcpy.Exists("tunnels"):
-                arcpy.analysis.Intersect(["tunnels", "hex_gr"], "tunnels_isect", "ONLY_FID")
-                arcpy.management.Dissolve("tunnels_isect", "tunnels_isect_diss", "FID_hex_gr")
+                # the same Intersect-Dissolve process with tunnels, if there are some
+                if arcpy.Exists("tunnels"):
+                    arcpy.analysis.Intersect(["tunnels", "hex_gr"], "tunnels_isect", "ONLY_FID")
+                    arcpy.management.Dissolve("tunnels_isect", "tunnels_isect_diss", "FID_hex_gr")
 
-            arcpy.AddMessage("Intersected and dissolved")
+                arcpy.AddMessage("Intersected and dissolved")
 
-            # joining roads/railways length to "hex_gr"
-            arcpy.management.AddField("lines_isect_diss", rd_or_rlw + "_length", "DOUBLE")
-            arcpy.management.CalculateField("lines_isect_diss", rd_or_rlw + "_length", '!Shape_Length!')
-            arcpy.management.JoinField("hex_gr", "OBJECTID", "lines_isect_diss", "FID_hex_gr", [rd_or_rlw + "_length"])
+                # joining roads/railways, bridges and tunnels lengths to "hex_gr"
+                arcpy.management.AddField("lines_isect_diss", rd_or_rlw + "_length", "DOUBLE")
+                arcpy.management.CalculateField("lines_isect_diss", rd_or_rlw + "_length", '!shape.length!')
+                arcpy.management.JoinField("hex_gr", "OBJECTID", "lines_isect_diss", "FID_hex_gr", [rd_or_rlw + "_length"])
+                if arcpy.Exists("bridges"):
+                    arcpy.management.AddField("bridges_isect_diss", rd_or_rlw + "_bridges_length", "DOUBLE")
+                    arcpy.management.CalculateField("bridges_isect_diss", rd_or_rlw + "_bridges_length", '!shape.length!')
+                    arcpy.management.JoinField("hex_gr", "OBJECTID", "bridges_isect_diss", "FID_hex_gr", [rd_or_rlw + "_bridges_length"])
+                if arcpy.Exists("tunnels"):
+                    arcpy.management.AddField("tunnels_isect_diss", rd_or_rlw + "_tunnels_length", "DOUBLE")
+                    arcpy.management.CalculateField("tunnels_isect_diss", rd_or_rlw + "_tunnels_length", '!shape.length!')
+                    arcpy.management.JoinField("hex_gr", "OBJECTID", "tunnels_isect_diss", "FID_hex_gr", [rd_or_rlw + "_tunnels_length"])
 
             # calculating roads/railways density
             if rd_or_rlw == "rd":
                 arcpy.management.AddField("hex_gr", "rd_density", "DOUBLE")
-                arcpy.management.CalculateField("hex_gr", "rd_density", '(!rd_length!/1000)/(!Shape_Area!/1000000)')
+                arcpy.management.CalculateField("hex_gr", "rd_density", '(!rd_length!/1000)/(!shape.area!/1000000)')
             elif rd_or_rlw == "rlw":
                 arcpy.management.AddField("hex_gr", "rlw_density", "DOUBLE")
-                arcpy.management.CalculateField("hex_gr", "rlw_density", '(!rlw_length!/1000)/(!Shape_Area!/1000000)')
+                arcpy.management.CalculateField("hex_gr", "rlw_density", '(!rlw_length!/1000)/(!shape.area!/1000000)')
             elif rd_or_rlw == "rd_rlw":
                 arcpy.management.AddField("hex_gr", "rd_rlw_density", "DOUBLE")
-                arcpy.management.CalculateField("hex_gr", "rd_rlw_density", '(!rd_rlw_length!/1000)/(!Shape_Area!/1000000)')
+                arcpy.management.CalculateField("hex_gr", "rd_rlw_density", '(!rd_rlw_length!/1000)/(!shape.area!/1000000)')
 
-            # if there are some bridges, their length is joined to "hex_gr" and their ratio is calculated
+            # if there are some bridges, their ratio is calculated
             if arcpy.Exists("bridges"):
-                arcpy.management.AddField("bridges_isect_diss", rd_or_rlw + "_bridges_length", "DOUBLE")
-                arcpy.management.CalculateField("bridges_isect_diss", rd_or_rlw + "_bridges_length", '!Shape_Length!')
-                arcpy.management.JoinField("hex_gr", "OBJECTID", "bridges_isect_diss", "FID_hex_gr", [rd_or_rlw + "_bridges_length"])
                 arcpy.management.AddField("hex_gr", "br_" + rd_or_rlw + "_ratio", "DOUBLE")
 
                 # bridge ratio is bridges length in m per 1 km of roads/railways
@@ -295,11 +295,8 @@ def main():
                 elif rd_or_rlw == "rd_rlw":
                     arcpy.management.CalculateField("hex_gr", "br_rd_rlw_ratio", '!rd_rlw_bridges_length!/(!rd_rlw_length!/1000)')
 
-            # if there are some tunnels, their length is joined to "hex_gr" and their ratio is calculated
+            # if there are some tunnels, their ratio is calculated
             if arcpy.Exists("tunnels"):
-                arcpy.management.AddField("tunnels_isect_diss", rd_or_rlw + "_tunnels_length", "DOUBLE")
-                arcpy.management.CalculateField("tunnels_isect_diss", rd_or_rlw + "_tunnels_length", '!Shape_Length!')
-                arcpy.management.JoinField("hex_gr", "OBJECTID", "tunnels_isect_diss", "FID_hex_gr", [rd_or_rlw + "_tunnels_length"])
                 arcpy.management.AddField("hex_gr", "tu_" + rd_or_rlw + "_ratio", "DOUBLE")
 
                 # tunnel ratio is tunnels length in m per 1 km of roads/railways
@@ -356,6 +353,9 @@ def main():
             else:
                 area_ending = ""
 
+            # if intermediate layers were in memory, only the output "hex_gr" is copied into the workspace on the disk
+            workspace = tn_core.persist_output("hex_gr", workspace, disk_workspace)
+
             # "v" is version
             v = 0
             # if in the workspace is already a different layer with the same name, version number will be added
@@ -375,12 +375,6 @@ def main():
                     arcpy.AddMessage("Name of the output: " + rd_or_rlw + "_bridge_tunnel" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
 
                 # deleting all layers that were created during the run of the script
-                if arcpy.Exists("reprj_data"):
-                    arcpy.management.Delete("reprj_data")
-                if arcpy.Exists("reprj_area"):
-                    arcpy.management.Delete("reprj_area")
-                if arcpy.Exists("reprj_own_layer"):
-                    arcpy.management.Delete("reprj_own_layer")
                 if arcpy.Exists("hex_grid"):
                     arcpy.management.Delete("hex_grid")
                 if arcpy.Exists("bridges"):
@@ -395,19 +389,13 @@ def main():
                     arcpy.management.Delete("tunnels_isect")
                 if arcpy.Exists("tunnels_isect_diss"):
                     arcpy.management.Delete("tunnels_isect_diss")
-                arcpy.management.Delete(["clipped_data", "lines_export", "lines_isect", "lines_isect_diss"])
+                tn_core.delete_layers(["clipped_data", "lines_export", "lines_isect", "lines_isect_diss"])
             else:
                 # renaming the output layer: when exporting to shapefile, the version number is added automatically if some other layer with the same name is in the output folder
                 arcpy.management.Rename("hex_gr", rd_or_rlw + "_bridge_tunnel" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
                 arcpy.conversion.FeatureClassToShapefile(rd_or_rlw + "_bridge_tunnel" + "_" + siz_uni[0] + siz_uni[1] + area_ending, workspace[:(workspace.rfind(chr(92)))])
 
                 # deleting all layers that were created during the run of the script
-                if arcpy.Exists("reprj_data"):
-                    arcpy.management.Delete("reprj_data")
-                if arcpy.Exists("reprj_area"):
-                    arcpy.management.Delete("reprj_area")
-                if arcpy.Exists("reprj_own_layer"):
-                    arcpy.management.Delete("reprj_own_layer")
                 if arcpy.Exists("hex_grid"):
                     arcpy.management.Delete("hex_grid")
                 if arcpy.Exists("bridges"):
@@ -422,7 +410,7 @@ def main():
                     arcpy.management.Delete("tunnels_isect")
                 if arcpy.Exists("tunnels_isect_diss"):
                     arcpy.management.Delete("tunnels_isect_diss")
-                arcpy.management.Delete(["clipped_data", "lines_export", "lines_isect", "lines_isect_diss"])
+                tn_core.delete_layers(["clipped_data", "lines_export", "lines_isect", "lines_isect_diss"])
                 arcpy.env.workspace = workspace[:(workspace.rfind(chr(92)))]
 
                 # deleting the "working.gdb"
@@ -430,8 +418,8 @@ def main():
                 arcpy.AddMessage("Name of the output: " + rd_or_rlw + "_bridge_tunnel" + "_" + siz_uni[0] + siz_uni[1] + area_ending + ".shp")
 
             # deleting variables
-            del data, area, size, workspace, cor_sys_string, desc, fields, i, cursor, row, control_selection, check_d, check_a, leng, ending
-            del area_name, data_spref, area_spref, cor_sys, rd_or_rlw, selected_features, siz_uni, area_ending, v, hex_or_own, own_layer
+            del data, area, size, workspace, disk_workspace, cor_sys_string, tile_size, workers, desc, fields, i, check_d, check_a, leng, ending
+            del area_name, data_spref, area_spref, cor_sys, rd_or_rlw, selected_features, grid, tiles, siz_uni, area_ending, v, hex_or_own, own_layer
             arcpy.AddMessage("Trash deleted")
 
             # finish! :D
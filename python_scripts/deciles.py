@@ -0,0 +1,177 @@
+#-------------------------------------------------------------------------------
+# Name:        Deciles
+#
+# Purpose:     Numpy engine of the "Summary Transport Index" tool (sum_tr_index.py): decile breakpoints of indicators
+#              and classification of values into deciles 1-10 for all cells at once.
+#              The results are the same as the results of the original loops over sorted lists of values.
+#              Unweighted deciles can be cached in .npz file, so a change of weights doesn't need a new calculation of deciles.
+#              This module uses only numpy, so it can be imported without arcpy.
+#
+# Author:      Adam Tóth
+#
+# This script is a part of bachelor thesis "Possibilities of calculation characteristics of the transport network of states and cities"
+# supervisor: doc. Ing. Zdena Dobešová, Ph.D.
+# Department of Geoinformatics, Faculty of Science, Palacký University in Olomouc, Czech republic
+#
+# Created:     17.10.2026
+#-------------------------------------------------------------------------------
+
+import os
+import hashlib
+import numpy
+
+
+# 9 decile breakpoints of "values" (numpy array without nan): the values at positions round(i*n/10) (i = 1, ..., 9)
+# of the sorted values, the same positions as in the original script (position 0 gives index -1, the last value, as in python list)
+def breakpoints(values):
+    values = numpy.sort(values)
+    step = len(values) / 10
+    return values[[round(i * step) - 1 for i in range(1, 10)]]
+
+
+# deciles (1-10) of "values" (numpy array, nan is not classified and gets 0) by "deciles" breakpoints;
+# the original script went through sorted values and moved to the next decile by at most one decile per value,
+# so when more breakpoints are the same, the classes are assigned "in steps" - this is reproduced here:
+# "target" is the number of breakpoints smaller than the value (the decile the value belongs to, minus 1),
+# "j" is the position of the original loop, j[t] = min(j[t-1] + 1, target[t]) with j[-1] = 0, which is t + min(1, min(target[s] - s) for s <= t)
+def classify(values, deciles):
+    values = numpy.asarray(values, dtype=float)
+    classes = numpy.zeros(len(values), dtype=numpy.int64)
+    valid = numpy.flatnonzero(~numpy.isnan(values))
+    if len(valid) == 0:
+        return classes
+
+    order = valid[numpy.argsort(values[valid], kind="stable")]
+
+    # with less than 5 values some breakpoints are the last value (index -1), so they are not sorted,
+    # then the original loop is used (it is only a few values)
+    if numpy.any(numpy.diff(deciles) < 0):
+        j = 0
+        for k in order:
+            if values[k] <= deciles[j]:
+                classes[k] = j + 1
+            elif j < 8:
+                j += 1
+                classes[k] = j + 1
+            else:
+                classes[k] = 10
+        return classes
+
+    target = numpy.searchsorted(deciles, values[order], side="left")
+    t = numpy.arange(len(order))
+    j = t + numpy.minimum(1, numpy.minimum.accumulate(numpy.minimum(target, 8) - t))
+
+    # class is j+1, except when the loop was already at the last breakpoint and the value is bigger than it, then it is 10
+    j_prev = numpy.concatenate([[0], j[:-1]])
+    classes[order] = numpy.where((j_prev == 8) & (target == 9), 10, j + 1)
+    return classes
+
+
+# streaming mode for very big layers: mergeable quantile sketch with bounded memory
+# (the values are not kept, only a few buffers of at most "k" values for each level, level h holds values with weight 2**h)
+# the sketch is a dictionary:
+# "k" - capacity of one buffer, "levels" - list of numpy arrays (buffers), "n" - number of values added,
+# "error" - upper bound of the rank error introduced so far (each compaction of level h can move the rank of any value by at most 2**h)
+# "flip" - list of alternating offsets of compactions for each level (deterministic, so the same input gives the same result)
+def new_sketch(epsilon=0.001):
+    # the total error is at most (number of levels) * n / k * 2, 40 levels are enough for any number of rows
+    k = max(64, int(numpy.ceil(2 * 40 / epsilon)))
+    return {"k": k, "levels": [numpy.zeros(0)], "n": 0, "error": 0, "flip": [0]}
+
+
+# compaction: every level which has "k" or more values is sorted and every second value is moved to the next level (with double weight)
+def _compact(sketch):
+    h = 0
+    while h < len(sketch["levels"]):
+        buffer = sketch["levels"][h]
+        if len(buffer) >= sketch["k"]:
+            if h + 1 == len(sketch["levels"]):
+                sketch["levels"].append(numpy.zeros(0))
+                sketch["flip"].append(0)
+            buffer = numpy.sort(buffer)
+            # odd number of values: the last one stays at this level
+            even = len(buffer) - len(buffer) % 2
+            offset = sketch["flip"][h]
+            sketch["flip"][h] = 1 - offset
+            sketch["levels"][h + 1] = numpy.concatenate([sketch["levels"][h + 1], buffer[offset:even:2]])
+            sketch["levels"][h] = buffer[even:]
+            sketch["error"] += 2 ** h
+        h += 1
+
+
+# adds numpy array of values (nan values are skipped) to the sketch
+def sketch_update(sketch, values):
+    values = numpy.asarray(values, dtype=float)
+    values = values[~numpy.isnan(values)]
+    sketch["levels"][0] = numpy.concatenate([sketch["levels"][0], values])
+    sketch["n"] += len(values)
+    _compact(sketch)
+
+
+# merges sketch "other" into "sketch" (for example sketches of more layers or of more processes), errors of both are added
+def sketch_merge(sketch, other):
+    for h in range(len(other["levels"])):
+        if h == len(sketch["levels"]):
+            sketch["levels"].append(numpy.zeros(0))
+            sketch["flip"].append(0)
+        sketch["levels"][h] = numpy.concatenate([sketch["levels"][h], other["levels"][h]])
+    sketch["n"] += other["n"]
+    sketch["error"] += other["error"]
+    _compact(sketch)
+
+
+# 9 decile breakpoints from the sketch, at the same ranks as "breakpoints" function: round(i*n/10)
+# (if there was no compaction, the result is exactly the same as the result of "breakpoints")
+def sketch_breakpoints(sketch):
+    values = numpy.concatenate(sketch["levels"])
+    weights = numpy.concatenate([numpy.full(len(sketch["levels"][h]), 2 ** h) for h in range(len(sketch["levels"]))])
+    order = numpy.argsort(values, kind="stable")
+    values = values[order]
+    cumulative = numpy.cumsum(weights[order])
+    step = sketch["n"] / 10
+    ranks = [round(i * step) for i in range(1, 10)]
+    return numpy.array([values[-1] if r < 1 else values[numpy.searchsorted(cumulative, r, side="left")] for r in ranks])
+
+
+# deciles (1-10) of "values" by breakpoints without sorting (for streaming): 1 + number of breakpoints smaller than the value,
+# nan gets 0; it differs from "classify" only when more breakpoints are the same value
+def classify_streaming(values, deciles):
+    values = numpy.asarray(values, dtype=float)
+    classes = numpy.searchsorted(deciles, values, side="left") + 1
+    classes[numpy.isnan(values)] = 0
+    return classes
+
+
+# weight-only recompute cache: unweighted deciles (0-10) of all indicators are saved into .npz file together with the hash
+# of the indicator values they were calculated from, so when only the weights change, the deciles don't have to be calculated again
+
+# hash of the content of "table" (numpy structured array) in columns "fields": names of the fields and their values in the order of rows
+def table_hash(table, fields):
+    digest = hashlib.sha1()
+    digest.update(str(len(table)).encode())
+    for fld in fields:
+        digest.update(fld.encode())
+        digest.update(numpy.ascontiguousarray(table[fld], dtype=float).tobytes())
+    return digest.hexdigest()
+
+
+# loads the cache file "path"; returns dictionary with "key", "fields", "classes" (rows x fields), "oids" (OBJECTIDs of the rows of the output)
+# and "output" (path of the output created from it) if the file exists and it was calculated from the values with hash "key", otherwise None
+def load_classes(path, key):
+    if not os.path.exists(path):
+        return None
+    try:
+        with numpy.load(path) as cache:
+            if str(cache["key"]) != key:
+                return None
+            return {"key": key, "fields": cache["fields"].tolist(), "classes": cache["classes"], "oids": cache["oids"], "output": str(cache["output"])}
+    except (OSError, KeyError, ValueError):
+        # damaged or old cache file is ignored, it will be overwritten
+        return None
+
+
+# saves unweighted deciles "classes" (rows x fields) of "fields" calculated from the values with hash "key", OBJECTIDs "oids" of their rows
+# in the output and the path of the output
+def save_classes(path, key, fields, classes, oids, output):
+    numpy.savez(path, key=numpy.array(key), fields=numpy.array(fields), classes=numpy.asarray(classes, dtype=numpy.int8),
+                oids=numpy.asarray(oids, dtype=numpy.int64), output=numpy.array(output))
@@ -15,12 +15,15 @@
 # Created:     21.03.2022
 #-------------------------------------------------------------------------------
 
-# import library arcpy and allow overwriting features with the same name
+# import library arcpy and "tn_core" module of this toolbox and allow overwriting features with the same name
 import arcpy
+import tn_core
 arcpy.env.overwriteOutput = True
 
 def main():
     arcpy.AddMessage("The script has started!")
+    # results of the input checks of the previous run are forgotten (see "tn_core" module)
+    tn_core.reset_validation()
 
     # getting inputs from parameters in tool's interface
     data = arcpy.GetParameterAsText(0)
@@ -31,6 +34,16 @@ def main():
     own_layer = arcpy.GetParameterAsText(5)
     workspace = arcpy.GetParameterAsText(6)
     cor_sys_string = arcpy.GetParameterAsText(7)
+    # tiled mode for continent-scale inputs: side of square tiles in km (0 means no tiling, see "tn_core" module)
+    tile_size = float(tn_core.optional_parameter(10, "0"))
+    # number of worker processes for the tiles in tiled mode (1 means no parallel processing, 0 means all processors)
+    workers = tn_core.worker_count(tn_core.optional_parameter(11, "1"))
+    # population fields of the population grid separated by ";" (e.g. "TOT_P_2006;TOT_P_2011;TOT_P_2018;TOT_P_2021" or age bands),
+    # all of them are interpolated into hexagons in one overlay; population from "TOT_P_2018" is saved into "SUM_new_pop2018" (as before),
+    # from other fields into "SUM_<field>", and their "rd/rlw_per_capita" indicators get the year (fields "TOT_P_<year>") or the field as a suffix
+    pop_fields = [fld.strip() for fld in tn_core.optional_parameter(12, "TOT_P_2018").split(";") if fld.strip() != ""]
+    pop_sums = dict((fld, "SUM_new_pop2018" if fld == "TOT_P_2018" else "SUM_" + fld) for fld in pop_fields)
+    pop_suffix = dict((fld, "" if fld == "TOT_P_2018" else "_" + (fld[6:] if fld.startswith("TOT_P_") else fld)) for fld in pop_fields)
 
     area_name = area[(area.rfind(chr(92))+1):]
 
@@ -45,18 +58,13 @@ def main():
     if desc.shapeType == "Polyline":
         for i in fields:
             if (i.name == 'code') and ((i.type == 'SmallInteger') or (i.type == 'Integer')):
-                with arcpy.da.SearchCursor(data, i.name) as cursor:
-                    for row in cursor:
-                        if (row[0] > 5110) and (row[0] < 5136):
-                            check_d += 1
-                            rd_or_rlw = "rd"
-                            break
-                with arcpy.da.SearchCursor(data, i.name) as cursor:
-                    for row in cursor:
-                        if (row[0] == 6101) or (row[0] == 6102):
-                            check_d += 1
-                            rd_or_rlw = "rlw"
-                            break
+                # where-clause probes, only the first road and the first railway are read (see "tn_core" module)
+                if tn_core.has_rows(data, "code > 5110 And code < 5136"):
+                    check_d += 1
+                    rd_or_rlw = "rd"
+                if tn_core.has_rows(data, "code = 6101 Or code = 6102"):
+                    check_d += 1
+                    rd_or_rlw = "rlw"
 
     # if both roads and railways are in the input layer, both are included
     if check_d == 2:
@@ -73,7 +81,7 @@ def main():
 
     # if it doesn't meet the requirements, script is ended
     if check_d < 2:
-        del data, area, pop_data, size, workspace, cor_sys_string, desc, area_name, hex_or_own, own_layer, check_d, fields, rd_or_rlw, i, cursor, row
+        del data, area, pop_data, size, workspace, cor_sys_string, tile_size, workers, pop_fields, pop_sums, pop_suffix, desc, area_name, hex_or_own, own_layer, check_d, fields, rd_or_rlw, i
         arcpy.AddError("Your data is not suitable for this script.")
     else:
         # if the workspace is geodatabase, the result will be feature class in gdb,
@@ -85,8 +93,11 @@ def main():
             arcpy.management.CreateFileGDB(workspace, "working.gdb")
             workspace = workspace + chr(92) + "working.gdb"
 
-        # setting of workspace in environments
-        arcpy.env.workspace = workspace
+        # setting of workspace in environments: intermediate layers can be kept in memory instead of the disk (optional parameters:
+        # "true" to use memory and the memory budget in MB), if their estimated size is bigger than the budget, the disk is used (see "tn_core" module);
+        # "disk_workspace" is the workspace on the disk where the output is saved
+        disk_workspace = workspace
+        workspace = tn_core.intermediate_workspace(workspace, tn_core.optional_parameter(8, "false"), float(tn_core.optional_parameter(9, "2048")), [data, pop_data, area, own_layer])
 
         # checking and setting the main coordinate system and projecting data into it
         data_spref = arcpy.Describe(data).spatialReference
@@ -96,103 +107,53 @@ def main():
             own_layer_spref = arcpy.Describe(own_layer).spatialReference
 
         # if user selected projected coordinate system with meter as its unit, it is set as the main coordinate system
-        if (cor_sys_string[:6] == "PROJCS") and ('UNIT["Meter",1.0]' in cor_sys_string):
-            cor_sys = arcpy.SpatialReference()
-            cor_sys.loadFromString(cor_sys_string)
-            arcpy.AddMessage(f"You selected this projected coordinate system for the output: {cor_sys.name}")
         # if user selected geographic coordinate system or projected coordinate system with different unit than meter or they selected nothing,
-        # this is the order of setting the main coordinate system:
+        # this is the order of setting the main coordinate system (see "tn_core" module):
         # the coordinate system of their own output layer, the coordinate system of population grid, the system of OSM layer, the system of area, WGS84 Web Mercator (Auxiliary Sphere)
+        if hex_or_own == "true":
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(own_layer_spref, "your output layer"), (pop_data_spref, "population grid"), (data_spref, "OSM layer"), (area_spref, "area layer")])
         else:
-            if hex_or_own == "true":
-                if (own_layer_spref.type == "Projected") and (own_layer_spref.linearUnitName == "Meter"):
-                    cor_sys = own_layer_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of your output layer {cor_sys.name} will be used.")
-                elif (pop_data_spref.type == "Projected") and (pop_data_spref.linearUnitName == "Meter"):
-                    cor_sys = pop_data_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of population grid {cor_sys.name} will be used.")
-                elif (data_spref.type == "Projected") and (data_spref.linearUnitName == "Meter"):
-                    cor_sys = data_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of OSM layer {cor_sys.name} will be used.")
-                elif (area_spref.type == "Projected") and (area_spref.linearUnitName == "Meter"):
-                    cor_sys = area_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of area layer {cor_sys.name} will be used.")
-                else:
-                    cor_sys = arcpy.SpatialReference(3857)
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
-            elif (pop_data_spref.type == "Projected") and (pop_data_spref.linearUnitName == "Meter"):
-                cor_sys = pop_data_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of population grid {cor_sys.name} will be used.")
-            elif (data_spref.type == "Projected") and (data_spref.linearUnitName == "Meter"):
-                cor_sys = data_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of OSM layer {cor_sys.name} will be used.")
-            elif (area_spref.type == "Projected") and (area_spref.linearUnitName == "Meter"):
-                cor_sys = area_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of area layer {cor_sys.name} will be used.")
-            else:
-                cor_sys = arcpy.SpatialReference(3857)
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(pop_data_spref, "population grid"), (data_spref, "OSM layer"), (area_spref, "area layer")])
 
         arcpy.env.outputCoordinateSystem = cor_sys
 
         # if coordinate systems of data is different from the main coordinate system, it is reprojected into that coordinate system
-        if data_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(data, "reprj_data", cor_sys)
-            data = workspace + chr(92) + "reprj_data"
-            arcpy.AddMessage(f"Data layer was reprojected from {data_spref.factoryCode} to {cor_sys.factoryCode}")
+        # (reprojected layers are kept in the cache, so the same layer is not reprojected again in the next runs, see "tn_core" module)
+        data = tn_core.reproject(data, data_spref, cor_sys, "Data layer")
 
         # if coordinate systems of area is different from the main coordinate system, it is reprojected into that coordinate system
-        if area_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(area, "reprj_area", cor_sys)
-            area = workspace + chr(92) + "reprj_area"
-            arcpy.AddMessage(f"Area layer was reprojected from {area_spref.factoryCode} to {cor_sys.factoryCode}")
+        area = tn_core.reproject(area, area_spref, cor_sys, "Area layer")
 
         # if coordinate systems of population grid is different from the main coordinate system, it is reprojected into that coordinate system
-        if pop_data_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(pop_data, "reprj_pop_data", cor_sys)
-            pop_data = workspace + chr(92) + "reprj_pop_data"
-            arcpy.AddMessage(f"Population data layer was reprojected from {pop_data_spref.factoryCode} to {cor_sys.factoryCode}")
+        pop_data = tn_core.reproject(pop_data, pop_data_spref, cor_sys, "Population data layer")
 
         # control of output polygon layer which user selected
         check_a = 0
         if hex_or_own == "true":
             # reprojection into the main coordinate system if necessary
-            if own_layer_spref.factoryCode != cor_sys.factoryCode:
-                arcpy.management.Project(own_layer, "reprj_own_layer", cor_sys)
-                own_layer = workspace + chr(92) + "reprj_own_layer"
-                arcpy.AddMessage(f"Your output layer was reprojected from {own_layer_spref.factoryCode} to {cor_sys.factoryCode}")
+            own_layer = tn_core.reproject(own_layer, own_layer_spref, cor_sys, "Your output layer")
             del own_layer_spref
             # control whether the area layer and the output polygon layer overlap
-            control_selection = arcpy.management.SelectLayerByLocation(own_layer, "INTERSECT", area)
-            if int(control_selection[2]) == 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(own_layer, "CLEAR_SELECTION")
+            # (extents are compared first and only the first intersecting feature is searched, see "tn_core" module)
+            if not tn_core.layers_overlap(own_layer, area):
                 arcpy.AddError("Your output layer and area layer don't overlap.")
-            elif int(control_selection[2]) > 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(own_layer, "CLEAR_SELECTION")
-                # control whether the data and the output polygon layer overlap
-                control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", own_layer)
-                if int(control_selection[2]) > 0:
-                    control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
-                    check_a += 1
-                    arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
-                else:
-                    arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
+            # control whether the data and the output polygon layer overlap
+            elif tn_core.layers_overlap(data, own_layer):
+                check_a += 1
+                arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
             else:
-                arcpy.AddError("Your chosen polygon layer for the output and area layer don't overlap.")
+                arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
         else:
             check_a += 1
 
         # control of area layer, whether it is a polygon layer and if it overlaps with OSM layer
         desc = arcpy.Describe(area)
-        control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", area)
 
         if desc.shapeType == "Polygon":
-            if int(control_selection[2]) == 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
+            if not tn_core.layers_overlap(data, area):
                 arcpy.AddError("Your data and area layers don't overlap.")
             # if it meets the requirements, OSM layer is clipped by area
-            elif int(control_selection[2]) > 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
+            else:
                 check_a += 1
                 arcpy.analysis.Clip(data, area, "clipped_data")
                 data = workspace + chr(92) + "clipped_data"
@@ -200,31 +161,40 @@ def main():
         else:
             arcpy.AddError("Your area layer is not of polygon shape type.")
 
-        # control and clipping of population grid: it has to be polygon layer, it has to contain field 'TOT_P_2018' and it has to overlap with area layer
+        # control and clipping of population grid: it has to be polygon layer, it has to contain all population fields (numeric, 'TOT_P_2018' by default,
+        # at least one field has to be set) and it has to overlap with area layer; names of fields of shapefile have at most 10 characters,
+        # so "SUM_<field>" and "rd/rlw_per_capita_<year>" of more population fields would be cut to the same names, more fields need output into gdb
         desc = arcpy.Describe(pop_data)
         fields = arcpy.ListFields(pop_data)
-        control_selection = arcpy.management.SelectLayerByLocation(pop_data, "INTERSECT", area)
+        # "invalid" are population fields which the population grid doesn't contain or which are not numeric
+        numeric = [fld.name for fld in fields if fld.type in ["SmallInteger", "Integer", "Single", "Double"]]
+        invalid = [fld for fld in pop_fields if fld not in numeric]
         if desc.shapeType == "Polygon":
-            for i in fields:
-                if (i.name == 'TOT_P_2018') and (i.type == 'Integer'):
-                    if int(control_selection[2]) == 0:
-                        arcpy.AddError("Your population data doesn't overlap with area layer.")
-                    # if it meets the requirements, population grid is clipped by area and population inside squares is recalculated based on the area:
-                    # copy of population grid is created, into this copied layer new field "area_orig" is added, the area of squares is loaded there,
-                    # then the copied layer is clipped by area, into this clipped layer new field "P_2018_orig" is added and
-                    # new population inside polygons is calculated as the original population divided by original area of polygons multiplied by current area of polygons/squares
-                    else:
-                        check_a += 1
-                        arcpy.management.CopyFeatures(control_selection, "pop_data_copy")
-                        control_selection = arcpy.management.SelectLayerByAttribute(pop_data, "CLEAR_SELECTION")
-                        arcpy.management.AddField("pop_data_copy", "area_orig", "DOUBLE")
-                        arcpy.management.CalculateField("pop_data_copy", "area_orig", '!Shape_Area!')
-                        arcpy.analysis.Clip("pop_data_copy", area, "clipped_pop_data")
-                        arcpy.management.AddField("clipped_pop_data", "P_2018_orig", "DOUBLE")
-                        arcpy.management.CalculateField("clipped_pop_data", "P_2018_orig", '(!TOT_P_2018!/!area_orig!)*!Shape_Area!')
-                        pop_data = workspace + chr(92) + "clipped_pop_data"
-                        arcpy.AddMessage("Your population data layer is OK and clipped.")
-                    break
+            if not pop_fields:
+                arcpy.AddError("You didn't set any population field.")
+            elif invalid:
+                arcpy.AddError(f"Your population data layer doesn't contain numeric population fields {invalid}.")
+            elif (len(pop_fields) > 1) and (ending != ".gdb"):
+                arcpy.AddError("More population fields can be saved only into a geodatabase, names of fields of shapefile are limited to 10 characters.")
+            elif not tn_core.layers_overlap(pop_data, area):
+                arcpy.AddError("Your population data doesn't overlap with area layer.")
+            # if it meets the requirements in tiled mode, population grid is clipped by area:
+            # copy of population grid is created, into this copied layer new field "area_orig" is added, the area of squares is loaded there,
+            # then the copied layer is clipped by area (population of the pieces is calculated from the original area in the tiles, see below);
+            # otherwise the population grid is not clipped, population is interpolated into hexagons by the areal-weighting matrix (see below)
+            else:
+                check_a += 1
+                if tile_size > 0:
+                    control_selection = arcpy.management.SelectLayerByLocation(pop_data, "INTERSECT", area)
+                    arcpy.management.CopyFeatures(control_selection, "pop_data_copy")
+                    control_selection = arcpy.management.SelectLayerByAttribute(pop_data, "CLEAR_SELECTION")
+                    arcpy.management.AddField("pop_data_copy", "area_orig", "DOUBLE")
+                    arcpy.management.CalculateField("pop_data_copy", "area_orig", '!shape.area!')
+                    arcpy.analysis.Clip("pop_data_copy", area, "clipped_pop_data")
+                    pop_data = workspace + chr(92) + "clipped_pop_data"
+                    arcpy.AddMessage("Your population data layer is OK and clipped.")
+                else:
+                    arcpy.AddMessage("Your population data layer is OK.")
         else:
             arcpy.AddError("Your population data layer is not of polygon shape type.")
 
@@ -232,8 +202,8 @@ def main():
 
         # if it doesn't meet the requirements, script is ended
         if check_a < 3:
-            del data, area, pop_data, size, workspace, cor_sys_string, desc, fields, i, control_selection, check_a, leng, ending
-            del area_name, data_spref, area_spref, pop_data_spref, cor_sys, hex_or_own, own_layer, rd_or_rlw, cursor, row
+            del data, area, pop_data, size, workspace, disk_workspace, cor_sys_string, tile_size, workers, pop_fields, pop_sums, pop_suffix, desc, fields, i, control_selection, check_a, leng, ending
+            del area_name, data_spref, area_spref, pop_data_spref, cor_sys, hex_or_own, own_layer, rd_or_rlw, numeric, invalid
         else:
             # if user selected their own output layer, it is clipped by area layer, this clipped layer is called "hex_gr"
             if hex_or_own == "true":
@@ -246,20 +216,29 @@ def main():
                     size = size.replace("Unknown", "SquareKilometers")
                     arcpy.AddMessage("You selected 'Unknown' as the areal unit, therefore 'Square Kilometers' will be used")
 
-                arcpy.management.GenerateTessellation("hex_grid", area, "HEXAGON", size)
-                arcpy.AddMessage("Hexagonal grid generated")
-                arcpy.analysis.Clip("hex_grid", area, "hex_gr")
-                arcpy.AddMessage("Clipped")
-
-            # into the field "area_orig" is loaded current area of squares of population grid, then it's intersected by "hex_gr", new field for population is added
-            # where the population is calculated proportionally to area, same principle as in clipping the population grid by area
-            # and finally dissolving all polygons in one polygon/hexagon and summing the population in one polygon/hexagon
-            arcpy.management.CalculateField(pop_data, "area_orig", '!Shape_Area!')
-            arcpy.analysis.Intersect([pop_data, "hex_gr"], "pop_data_isect", "ALL")
-            arcpy.management.AddField("pop_data_isect", "new_pop2018", "DOUBLE")
-            arcpy.management.CalculateField("pop_data_isect", "new_pop2018", '(!P_2018_orig!/!area_orig!)*!Shape_Area!')
-            arcpy.management.Dissolve("pop_data_isect", "pop_data_isect_diss", "FID_hex_gr", [["new_pop2018","SUM"]])
-            arcpy.AddMessage("Population in each hexagon calculated from 2018 estimate")
+                # the clipped grid is kept in the cache, so it is generated only once for the same area, size and coordinate system (see "tn_core" module)
+                tn_core.hexagon_grid(area, size, cor_sys)
+
+            # tiled mode: the hexagons/polygons are divided into tiles and the population grid is intersected and summed tile by tile,
+            # the population of the piece of square is calculated as the original population divided by the original area of the square ("area_orig")
+            # multiplied by the area of the piece, for all population fields from one Intersect, so Intersect and Dissolve never process the whole input at once
+            # (see "tn_core" module)
+            if tile_size > 0:
+                tiles = tn_core.hexagon_tiles("hex_gr", tile_size * 1000)
+                arcpy.AddMessage(f"Tiled mode: {len(tiles)} tiles")
+                population = tn_core.tiled_sums(pop_data, "hex_gr", tiles, pop_fields + ["area_orig", "SHAPE@AREA"], tn_core.proportional_values, workers)
+                population = dict((pop_fields[k], dict((oid, float(population[oid][k])) for oid in population)) for k in range(len(pop_fields)))
+            # otherwise the overlaps of squares of population grid and "hex_gr" are stored once as a sparse areal-weighting matrix (fraction of the area
+            # of the square in each hexagon, it is kept in the cache for the same population grid and "hex_gr") and the population in hexagons
+            # is the product of the matrix and the population of squares (all population fields at once), without Clip, Intersect and Dissolve
+            # of the population grid (see "tn_core" module)
+            else:
+                weights = tn_core.areal_weights(pop_data, "hex_gr")
+                population = tn_core.interpolate(weights, pop_data, pop_fields)
+                del weights
+            tn_core.write_fields("hex_gr", dict((pop_sums[fld], population[fld]) for fld in pop_fields))
+            del population
+            arcpy.AddMessage(f"Population in each hexagon calculated from fields {pop_fields}")
 
             # selection of roads: major roads (5111-5115), minor roads (5121-5124), major road links (5131-5135)
             if rd_or_rlw == "rd":
@@ -276,37 +255,50 @@ def main():
             selected_features = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
             arcpy.AddMessage("Exported into a new layer")
 
-            # intersecting (cutting) roads/railways by "hex_gr"
-            arcpy.analysis.Intersect(["lines_export", "hex_gr"], rd_or_rlw + "_isect", "ONLY_FID")
-            arcpy.AddMessage("Transport infrastructure intersected")
-
-            # dissolving (merging, aggregating) roads/railways in the same polygon/hexagon, so there will be only one feature for each polygon/hexagon
-            arcpy.management.Dissolve(rd_or_rlw + "_isect", rd_or_rlw + "_isect_diss", "FID_hex_gr")
-            arcpy.AddMessage("Dissolved")
-
-            # joining population and roads/railways length to "hex_gr"
-            arcpy.management.JoinField("hex_gr", "OBJECTID", "pop_data_isect_diss", "FID_hex_gr", ["SUM_new_pop2018"])
-            arcpy.management.AddField(rd_or_rlw + "_isect_diss", rd_or_rlw + "_length", "DOUBLE")
-            arcpy.management.CalculateField(rd_or_rlw + "_isect_diss", rd_or_rlw + "_length", '!Shape_Length!')
-            arcpy.management.JoinField("hex_gr", "OBJECTID", rd_or_rlw + "_isect_diss", "FID_hex_gr", [rd_or_rlw + "_length"])
+            # generated hexagon grid: length of roads/railways in hexagons is computed directly from coordinates of the lines,
+            # the lines are split at the edges of hexagons analytically (see "hex_lattice" and "tn_core" modules), so Intersect and Dissolve are not needed;
+            # in tiled mode only the lines of one tile are loaded at once
+            grid = None
+            if hex_or_own != "true":
+                grid = tn_core.grid_lattice("hex_gr")
+            if grid is not None:
+                tn_core.write_fields("hex_gr", {rd_or_rlw + "_length": tn_core.lattice_lengths("lines_export", grid, tiles=tiles if tile_size > 0 else None)})
+                arcpy.AddMessage("Length of transport infrastructure in hexagons calculated")
+            # tiled mode: roads/railways are intersected and summed tile by tile, with the same tiles as the population grid
+            elif tile_size > 0:
+                tn_core.write_fields("hex_gr", {rd_or_rlw + "_length": tn_core.tiled_sums("lines_export", "hex_gr", tiles, ["SHAPE@LENGTH"], workers=workers)})
+                arcpy.AddMessage("Length of transport infrastructure in hexagons calculated")
+            # user's own output layer (or too small area for the lattice)
+            else:
+                # intersecting (cutting) roads/railways by "hex_gr"
+                arcpy.analysis.Intersect(["lines_export", "hex_gr"], rd_or_rlw + "_isect", "ONLY_FID")
+                arcpy.AddMessage("Transport infrastructure intersected")
+
+                # dissolving (merging, aggregating) roads/railways in the same polygon/hexagon, so there will be only one feature for each polygon/hexagon
+                arcpy.management.Dissolve(rd_or_rlw + "_isect", rd_or_rlw + "_isect_diss", "FID_hex_gr")
+                arcpy.AddMessage("Dissolved")
+
+                # joining roads/railways length to "hex_gr"
+                arcpy.management.AddField(rd_or_rlw + "_isect_diss", rd_or_rlw + "_length", "DOUBLE")
+                arcpy.management.CalculateField(rd_or_rlw + "_isect_diss", rd_or_rlw + "_length", '!shape.length!')
+                arcpy.management.JoinField("hex_gr", "OBJECTID", rd_or_rlw + "_isect_diss", "FID_hex_gr", [rd_or_rlw + "_length"])
             arcpy.AddMessage("Join successful")
 
-            # creating new fields "rd/rlw_density" and "rd/rlw_per_capita", where the indicators will be calculated
-            arcpy.management.AddFields("hex_gr", [[rd_or_rlw + "_density", "DOUBLE"], [rd_or_rlw + "_per_capita", "DOUBLE"]])
+            # creating new fields "rd/rlw_density" and "rd/rlw_per_capita" (one for each population field), where the indicators will be calculated
+            arcpy.management.AddFields("hex_gr", [[rd_or_rlw + "_density", "DOUBLE"]] + [[rd_or_rlw + "_per_capita" + pop_suffix[fld], "DOUBLE"] for fld in pop_fields])
             arcpy.AddMessage("New fields added")
 
             # calculation of new fields:
             # "rd/rlw_density" is the roads/railways length in km per 1 square km
-            # "rd/rlw_per_capita" is the roads/railways length in m per 1 inhabitant
+            # "rd/rlw_per_capita" is the roads/railways length in m per 1 inhabitant (for each population field)
             if rd_or_rlw == "rd":
-                arcpy.management.CalculateField("hex_gr", "rd_density", '(!rd_length!/1000)/(!Shape_Area!/1000000)')
-                arcpy.management.CalculateField("hex_gr", "rd_per_capita", '!rd_length!/!SUM_new_pop2018!')
+                arcpy.management.CalculateField("hex_gr", "rd_density", '(!rd_length!/1000)/(!shape.area!/1000000)')
             elif rd_or_rlw == "rlw":
-                arcpy.management.CalculateField("hex_gr", "rlw_density", '(!rlw_length!/1000)/(!Shape_Area!/1000000)')
-                arcpy.management.CalculateField("hex_gr", "rlw_per_capita", '!rlw_length!/!SUM_new_pop2018!')
+                arcpy.management.CalculateField("hex_gr", "rlw_density", '(!rlw_length!/1000)/(!shape.area!/1000000)')
             elif rd_or_rlw == "rd_rlw":
-                arcpy.management.CalculateField("hex_gr", "rd_rlw_density", '(!rd_rlw_length!/1000)/(!Shape_Area!/1000000)')
-                arcpy.management.CalculateField("hex_gr", "rd_rlw_per_capita", '!rd_rlw_length!/!SUM_new_pop2018!')
+                arcpy.management.CalculateField("hex_gr", "rd_rlw_density", '(!rd_rlw_length!/1000)/(!shape.area!/1000000)')
+            for fld in pop_fields:
+                arcpy.management.CalculateField("hex_gr", rd_or_rlw + "_per_capita" + pop_suffix[fld], f'!{rd_or_rlw}_length!/!{pop_sums[fld]}!')
             arcpy.AddMessage("Indicators calculated")
 
             # "siz_uni" is a list that looks like this: ["your", "_output"] in case the output layer is provided by user,
@@ -353,6 +345,9 @@ def main():
             else:
                 area_ending = ""
 
+            # if intermediate layers were in memory, only the output "hex_gr" is copied into the workspace on the disk
+            workspace = tn_core.persist_output("hex_gr", workspace, disk_workspace)
+
             # "v" is version
             v = 0
             # if in the workspace is already a different layer with the same name, version number will be added
@@ -372,34 +367,18 @@ def main():
                     arcpy.AddMessage("Name of the output: " + rd_or_rlw + "_pop_grid" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
 
                 # deleting all layers that were created during the run of the script
-                if arcpy.Exists("reprj_data"):
-                    arcpy.management.Delete("reprj_data")
-                if arcpy.Exists("reprj_area"):
-                    arcpy.management.Delete("reprj_area")
-                if arcpy.Exists("reprj_pop_data"):
-                    arcpy.management.Delete("reprj_pop_data")
-                if arcpy.Exists("reprj_own_layer"):
-                    arcpy.management.Delete("reprj_own_layer")
                 if arcpy.Exists("hex_grid"):
                     arcpy.management.Delete("hex_grid")
-                arcpy.management.Delete(["clipped_data", "pop_data_isect", "pop_data_isect_diss", "lines_export", rd_or_rlw + "_isect", rd_or_rlw + "_isect_diss", "clipped_pop_data", "pop_data_copy"])
+                tn_core.delete_layers(["clipped_data", "pop_data_isect", "pop_data_isect_diss", "lines_export", rd_or_rlw + "_isect", rd_or_rlw + "_isect_diss", "clipped_pop_data", "pop_data_copy"])
             else:
                 # renaming the output layer: when exporting to shapefile, the version number is added automatically if some other layer with the same name is in the output folder
                 arcpy.management.Rename("hex_gr", rd_or_rlw + "_pop_grid" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
                 arcpy.conversion.FeatureClassToShapefile(rd_or_rlw + "_pop_grid" + "_" + siz_uni[0] + siz_uni[1] + area_ending, workspace[:(workspace.rfind(chr(92)))])
 
                 # deleting all layers that were created during the run of the script
-                if arcpy.Exists("reprj_data"):
-                    arcpy.management.Delete("reprj_data")
-                if arcpy.Exists("reprj_area"):
-                    arcpy.management.Delete("reprj_area")
-                if arcpy.Exists("reprj_pop_data"):
-                    arcpy.management.Delete("reprj_pop_data")
-                if arcpy.Exists("reprj_own_layer"):
-                    arcpy.management.Delete("reprj_own_layer")
                 if arcpy.Exists("hex_grid"):
                     arcpy.management.Delete("hex_grid")
-                arcpy.management.Delete(["clipped_data", "pop_data_isect", "pop_data_isect_diss", "lines_export", rd_or_rlw + "_isect", rd_or_rlw + "_isect_diss", "clipped_pop_data", "pop_data_copy"])
+                tn_core.delete_layers(["clipped_data", "pop_data_isect", "pop_data_isect_diss", "lines_export", rd_or_rlw + "_isect", rd_or_rlw + "_isect_diss", "clipped_pop_data", "pop_data_copy"])
                 arcpy.env.workspace = workspace[:(workspace.rfind(chr(92)))]
 
                 # deleting the "working.gdb"
@@ -407,8 +386,10 @@ def main():
                 arcpy.AddMessage("Name of the output: " + rd_or_rlw + "_pop_grid" + "_" + siz_uni[0] + siz_uni[1] + area_ending + ".shp")
 
             # deleting variables
-            del data, area, pop_data, size, siz_uni, workspace, cor_sys_string, desc, fields, i, v, control_selection, check_a, leng, ending
-            del area_name, data_spref, area_spref, pop_data_spref, cor_sys, area_ending, hex_or_own, own_layer, rd_or_rlw, cursor, row
+            if tile_size > 0:
+                del tiles
+            del data, area, pop_data, grid, size, siz_uni, workspace, disk_workspace, cor_sys_string, tile_size, workers, desc, fields, i, v, control_selection, check_a, leng, ending
+            del area_name, data_spref, area_spref, pop_data_spref, cor_sys, area_ending, hex_or_own, own_layer, rd_or_rlw, fld, numeric, invalid
             arcpy.AddMessage("Trash deleted")
 
             # finish! :D
@@ -17,16 +17,19 @@
 # Created:     18.03.2022
 #-------------------------------------------------------------------------------
 
-# importing Libraries arcpy, scipy and numpy (taken from the original script) and allowing overwriting features with the same name
+# importing Libraries arcpy and numpy and allowing overwriting features with the same name
+# (scipy is not needed anymore, the lines are fitted by "box_counting" module)
 import arcpy
-import scipy
-from scipy import optimize
 import numpy
-from numpy import *
+import box_counting
+import segment_index
+import tn_core
 arcpy.env.overwriteOutput = True
 
 def main():
     arcpy.AddMessage("The script has started!")
+    # results of the input checks of the previous run are forgotten (see "tn_core" module)
+    tn_core.reset_validation()
 
     # getting inputs from parameters in tool's interface
     data = arcpy.GetParameterAsText(0)
@@ -36,6 +39,18 @@ def main():
     own_layer = arcpy.GetParameterAsText(4)
     workspace = arcpy.GetParameterAsText(5)
     cor_sys_string = arcpy.GetParameterAsText(6)
+    # number of worker processes for the calculation of TP (1 means no parallel processing, 0 means all processors)
+    workers = tn_core.worker_count(tn_core.optional_parameter(7, "1"))
+    # if "true", standard error of the slope and R2 of the fit are saved into fields "TP_se" and "TP_r2"
+    fit_stats = tn_core.optional_parameter(8, "false")
+    # number of levels of squares (grids of 4, 16, 64, ..., 4**levels squares; 4 levels are used in the original script)
+    # and "adaptive", if "true", levels finer than the level where the counts of squares saturate are not used in the fit
+    levels = int(tn_core.optional_parameter(9, "4"))
+    adaptive = tn_core.optional_parameter(10, "false")
+    # if "resume" is "true", the hexagons already saved in the checkpoint table of the previous (crashed) run are not calculated again,
+    # "batch_size" is the number of hexagons calculated at once and saved into the checkpoint table
+    resume = tn_core.optional_parameter(11, "false")
+    batch_size = int(tn_core.optional_parameter(12, "10000"))
 
     area_name = area[(area.rfind(chr(92))+1):]
 
@@ -70,8 +85,11 @@ def main():
             arcpy.management.CreateFileGDB(workspace, "working.gdb")
             workspace = workspace + chr(92) + "working.gdb"
 
-        # setting of workspace in environments
-        arcpy.env.workspace = workspace
+        # setting of workspace in environments: intermediate layers can be kept in memory instead of the disk (optional parameters:
+        # "true" to use memory and the memory budget in MB), if their estimated size is bigger than the budget, the disk is used (see "tn_core" module);
+        # "disk_workspace" is the workspace on the disk where the output is saved
+        disk_workspace = workspace
+        workspace = tn_core.intermediate_workspace(workspace, tn_core.optional_parameter(13, "false"), float(tn_core.optional_parameter(14, "2048")), [data, area, own_layer])
 
          # checking and setting the main coordinate system and projecting data into it
         data_spref = arcpy.Describe(data).spatialReference
@@ -80,91 +98,50 @@ def main():
             own_layer_spref = arcpy.Describe(own_layer).spatialReference
 
         # if user selected projected coordinate system, it is set as the main coordinate system
-        if cor_sys_string[:6] == "PROJCS":
-            cor_sys = arcpy.SpatialReference()
-            cor_sys.loadFromString(cor_sys_string)
-            arcpy.AddMessage(f"You selected this projected coordinate system for the output: {cor_sys.name}")
         # if user selected geographic coordinate system or they selected nothing,
-        # this is the order of setting the main coordinate system:
+        # this is the order of setting the main coordinate system (see "tn_core" module):
         # the coordinate system of their own output layer, the coordinate system of line data, the system of area, WGS84 Web Mercator (Auxiliary Sphere)
+        if hex_or_own == "true":
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(own_layer_spref, "your output layer"), (data_spref, "line layer"), (area_spref, "area layer")], meter=False)
         else:
-            if hex_or_own == "true":
-                if own_layer_spref.type == "Projected":
-                    cor_sys = own_layer_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of your output layer {cor_sys.name} will be used.")
-                elif data_spref.type == "Projected":
-                    cor_sys = data_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of line layer {cor_sys.name} will be used.")
-                elif area_spref.type == "Projected":
-                    cor_sys = area_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of area layer {cor_sys.name} will be used.")
-                else:
-                    cor_sys = arcpy.SpatialReference(3857)
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
-            elif data_spref.type == "Projected":
-                cor_sys = data_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of line layer {cor_sys.name} will be used.")
-            elif area_spref.type == "Projected":
-                cor_sys = area_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of area layer {cor_sys.name} will be used.")
-            else:
-                cor_sys = arcpy.SpatialReference(3857)
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(data_spref, "line layer"), (area_spref, "area layer")], meter=False)
 
         arcpy.env.outputCoordinateSystem = cor_sys
 
         # if coordinate systems of data is different from the main coordinate system, it is reprojected into that coordinate system
-        if data_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(data, "reprj_data", cor_sys)
-            data = workspace + chr(92) + "reprj_data"
-            arcpy.AddMessage(f"Data layer was reprojected from {data_spref.factoryCode} to {cor_sys.factoryCode}")
+        # (reprojected layers are kept in the cache, so the same layer is not reprojected again in the next runs, see "tn_core" module)
+        data = tn_core.reproject(data, data_spref, cor_sys, "Data layer")
 
         # if coordinate systems of area is different from the main coordinate system, it is reprojected into that coordinate system
-        if area_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(area, "reprj_area", cor_sys)
-            area = workspace + chr(92) + "reprj_area"
-            arcpy.AddMessage(f"Area layer was reprojected from {area_spref.factoryCode} to {cor_sys.factoryCode}")
+        area = tn_core.reproject(area, area_spref, cor_sys, "Area layer")
 
         # control of output polygon layer which user selected
         check_a = 0
         if hex_or_own == "true":
             # reprojection into the main coordinate system if necessary
-            if own_layer_spref.factoryCode != cor_sys.factoryCode:
-                arcpy.management.Project(own_layer, "reprj_own_layer", cor_sys)
-                own_layer = workspace + chr(92) + "reprj_own_layer"
-                arcpy.AddMessage(f"Your output layer was reprojected from {own_layer_spref.factoryCode} to {cor_sys.factoryCode}")
+            own_layer = tn_core.reproject(own_layer, own_layer_spref, cor_sys, "Your output layer")
             del own_layer_spref
             # control whether the area layer and the output polygon layer overlap
-            control_selection = arcpy.management.SelectLayerByLocation(own_layer, "INTERSECT", area)
-            if int(control_selection[2]) == 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(own_layer, "CLEAR_SELECTION")
+            # (extents are compared first and only the first intersecting feature is searched, see "tn_core" module)
+            if not tn_core.layers_overlap(own_layer, area):
                 arcpy.AddError("Your output layer and area layer don't overlap.")
-            elif int(control_selection[2]) > 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(own_layer, "CLEAR_SELECTION")
-                # control whether the data and the output polygon layer overlap
-                control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", own_layer)
-                if int(control_selection[2]) > 0:
-                    control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
-                    check_a += 1
-                    arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
-                else:
-                    arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
+            # control whether the data and the output polygon layer overlap
+            elif tn_core.layers_overlap(data, own_layer):
+                check_a += 1
+                arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
             else:
-                arcpy.AddError("Your chosen polygon layer for the output and area layer don't overlap.")
+                arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
         else:
             check_a += 1
 
         # control of area layer, if it is a polygon layer and if it overlaps with line data
         desc = arcpy.Describe(area)
-        control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", area)
 
         if desc.shapeType == "Polygon":
-            if int(control_selection[2]) == 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
+            if not tn_core.layers_overlap(data, area):
                 arcpy.AddError("Your data and area layers don't overlap.")
             # if it meets the requirements, line data is clipped by area
-            elif int(control_selection[2]) > 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
+            else:
                 check_a += 1
                 arcpy.analysis.Clip(data, area, "clipped_data")
                 data = workspace + chr(92) + "clipped_data"
@@ -174,7 +151,7 @@ def main():
 
         # if it doesn't meet the requirements, script is ended
         if check_a < 2:
-            del data, area, size, workspace, cor_sys_string, desc, control_selection, check_a, leng, ending
+            del data, area, size, workspace, disk_workspace, cor_sys_string, desc, check_a, leng, ending
             del area_name, area_spref, data_spref, cor_sys, hex_or_own, own_layer
         else:
             # if user selected their own output layer, it is clipped by area layer, this clipped layer is called "hex_gr"
@@ -188,97 +165,139 @@ def main():
                     size = size.replace("Unknown", "SquareKilometers")
                     arcpy.AddMessage("You selected 'Unknown' as the areal unit, therefore 'Square Kilometers' will be used")
 
-                # (same as in the original script)
-                #arcpy.management.GenerateTessellation("hex_grid", area, "HEXAGON", size, cor_sys)
-                arcpy.management.GenerateTessellation("hex_grid", area, "HEXAGON", size)
-                arcpy.AddMessage("Hexagonal grid generated")
-                arcpy.analysis.Clip("hex_grid", area, "hex_gr")
-                arcpy.AddMessage("Clipped")
+                # the clipped grid is kept in the cache, so it is generated only once for the same area, size and coordinate system (see "tn_core" module)
+                tn_core.hexagon_grid(area, size, cor_sys)
 
-             # intersecting (cutting) lines by "hex_gr" (same as in the original script)
+            # intersecting (cutting) lines by "hex_gr" (same as in the original script)
             arcpy.analysis.Intersect([data, "hex_gr"], "roads_isect", "ONLY_FID")
             arcpy.AddMessage("Roads intersected by hexagons")
 
-            # dissolving (merging, aggregating) lines in the same hexagon, so there will be only one feature for each hexagon (same as in the original script)
-            arcpy.management.Dissolve("roads_isect", "roads_isect_diss", "FID_hex_gr")
-            arcpy.AddMessage("Dissolved")
+            # the intersected lines are loaded only once into the index of segments grouped by "FID_hex_gr" (see "segment_index" module),
+            # so the lines of any hexagon are found in memory without selections; the lines don't have to be dissolved anymore
+            with arcpy.da.SearchCursor("roads_isect", ["FID_hex_gr", "SHAPE@"]) as cursor:
+                index = segment_index.build_index((row[0], box_counting.polyline_segments(row[1])) for row in cursor)
+            arcpy.AddMessage("Roads loaded into the index")
 
             # creating new field TP, where the transport provision will be calculated (from this point on the code is taken from the original script with little corrections and edits)
-            arcpy.management.AddField("hex_gr", "TP", "FLOAT")
+            # if user wants statistics of the fit, fields "TP_se" (standard error of the slope) and "TP_r2" (R2) are created too
+            if fit_stats == "true":
+                arcpy.management.AddFields("hex_gr", [["TP", "FLOAT"], ["TP_se", "FLOAT"], ["TP_r2", "FLOAT"]])
+            else:
+                arcpy.management.AddField("hex_gr", "TP", "FLOAT")
             arcpy.AddMessage("New field added")
 
-            # some maths, fitting functions to data, but I have no idea what is lambda, p, x, y
-            fitfunc = lambda p, x: (p[0] + p[1] * x)
-            errfunc = lambda p, x, y: (y - fitfunc(p, x))
-
-            # "a" is the number of rows in "roads_isect_diss" feature class, it is the number of hexagons which contain some lines
-            # "rows" is a cursor, it is a list of objects, list of rows in "roads_isect_diss"
-            # "total" is a list of integers, values, IDs of hexagons which contain some lines
+            # "a" is the number of hexagons which contain some lines
             # "count" is a number of hexagons which cover our area
-            # "tp_values" is a list with calculated values of transport provision for each hexagon which contains some lines
-            a = int(arcpy.management.GetCount("roads_isect_diss").getOutput(0))
-            rows = arcpy.SearchCursor("roads_isect_diss")
-            total = []
-            for row in rows:
-               total.append(row.getValue("FID_hex_gr"))
+            a = len(index["ids"])
             count = int(arcpy.management.GetCount("hex_gr").getOutput(0))
-            tp_values = []
-            i = 1
             arcpy.AddMessage(f"Number of hexagons which intersect with roads: {a}. Total number of hexagons: {count}")
 
-            # the final loop, it runs while "i" (starting at 1) is less than or equal to "a", in the end of each iteration "i" is increased by 1,
-            # so the number of iterations will be equal to number of hexagons which contain some roads
+            # "extents" is a dictionary with extent (xmin, ymin, xmax, ymax) of each hexagon, key is OBJECTID of the hexagon
+            extents = {}
+            with arcpy.da.SearchCursor("hex_gr", ["OID@", "SHAPE@"]) as cursor:
+                for row in cursor:
+                    aa = row[1].extent
+                    extents[row[0]] = (aa.XMin, aa.YMin, aa.XMax, aa.YMax)
+
+            # list "edge" contains sizes of the squares relative to the extent of hexagon (1/1, 1/2, 1/4, 1/8, 1/16, ...),
+            # the respective numbers of squares in the grid are 1, 4, 16, 64, 256, ...
+            edge = box_counting.edge_sizes(levels)
+
+            # checkpoint: calculated values are saved in batches into the table "checkpoint" in the output geodatabase (or dbf table in the output folder),
+            # so they are not lost when the run crashes; if user runs the tool again with "resume", the hexagons which are already in the table are skipped
+            # (name of the table contains the size of hexagons, the name of area, the number of levels, "adaptive" if the adaptive stop is used
+            # and "stats" if the statistics of the fit are saved, so TP values fitted with different settings are never mixed in one output)
+            run_id = "".join(c if c.isalnum() else "_" for c in ("own" if hex_or_own == "true" else size) + "_" + area_name + "_L" + str(levels)
+                             + ("_adaptive" if adaptive == "true" else "") + ("_stats" if fit_stats == "true" else ""))
+            if ending == ".gdb":
+                checkpoint_dir = disk_workspace
+                checkpoint_name = "fractal_tp_checkpoint_" + run_id
+            else:
+                checkpoint_dir = disk_workspace[:(disk_workspace.rfind(chr(92)))]
+                checkpoint_name = "fractal_tp_checkpoint_" + run_id + ".dbf"
+            checkpoint = checkpoint_dir + chr(92) + checkpoint_name
+            # fields "TP_se" and "TP_r2" are in the table only if user wants statistics of the fit; dbf table can't store empty values,
+            # so empty statistics (all counts of the hexagon are the same) are stored there as -1 (the statistics are never negative)
+            checkpoint_fields = ["FID_hex_gr", "TP"]
+            if fit_stats == "true":
+                checkpoint_fields += ["TP_se", "TP_r2"]
+            if ending == ".gdb":
+                missing = None
+            else:
+                missing = -1
+
+            # "done" is a set of IDs of hexagons which were already calculated in the previous run
+            done = set()
+            if resume == "true" and arcpy.Exists(checkpoint):
+                with arcpy.da.SearchCursor(checkpoint, ["FID_hex_gr"]) as cursor:
+                    for row in cursor:
+                        done.add(row[0])
+                arcpy.AddMessage(f"Calculation resumed, TP of {len(done)} hexagons was already calculated")
+            else:
+                arcpy.management.CreateTable(checkpoint_dir, checkpoint_name)
+                arcpy.management.AddFields(checkpoint, [["FID_hex_gr", "LONG"]] + [[fld, "FLOAT"] for fld in checkpoint_fields[1:]])
+
+            # the final loop, hexagons which are not calculated yet are processed in batches of "batch_size" hexagons; for each batch:
+            # - "work" is a list of line segments (x0, y0, x1, y1) of each hexagon from the index with its extent and number of levels
+            # - "counts" is a list of "intersections" lists, counts of squares which cover lines in the polygon/hexagon, first it is 1/1, then a/4, b/16, c/64, d/256, ...
+            #   (the squares are not created as fishnet layers anymore, they are counted in memory by "box_counting" module;
+            #   if more worker processes are set, the batch is split into chunks and the squares of each chunk are counted in a separate process)
+            # - fractal dimension and transport provision calculation: straight line is fitted through logarithms of "edge" and counts
+            #   of all hexagons of the batch at once (the original script fitted each hexagon separately by scipy.optimize.leastsq, the result is the same),
+            #   transport provision is computed from the slope with the same formula as in the original script;
+            #   with adaptive stop, each hexagon uses only the levels up to the level where its counts saturate
+            # - results are appended to the checkpoint table
             # (this is one major change from the original script: there the while cycle runs "while i < count", which doesn't make sense, because the calculation can be done only for the polygons/hexagons which contain some lines)
-            while i <= a:
+            if workers > 1:
+                arcpy.AddMessage(f"Squares are counted in {workers} parallel processes")
+                pool = tn_core.process_pool(workers)
+            else:
+                pool = None
+            todo = [fid for fid in index["ids"] if fid not in done]
+            i = len(done)
+            for b in range(0, len(todo), batch_size):
+                batch = todo[b:b+batch_size]
+                work = [(segment_index.lookup(index, fid), extents[fid], levels) for fid in batch]
+                if pool is not None:
+                    counts = [c for chunk in pool.map(box_counting.box_counts_chunk, tn_core.chunks(work, workers*4)) for c in chunk]
+                else:
+                    counts = box_counting.box_counts_chunk(work)
+
+                if adaptive == "true":
+                    mask = box_counting.saturation_mask(counts)
+                else:
+                    mask = None
+                slope, slope_se, r2 = box_counting.fit_loglog(edge, counts, mask)
+                tp_values = box_counting.transport_provision(slope).tolist()
+                slope_se = [missing if numpy.isnan(se) else se for se in slope_se.tolist()]
+                r2 = [missing if numpy.isnan(r) else r for r in r2.tolist()]
+
+                with arcpy.da.InsertCursor(checkpoint, checkpoint_fields) as icursor:
+                    for k in range(len(batch)):
+                        icursor.insertRow([batch[k], tp_values[k], slope_se[k], r2[k]][:len(checkpoint_fields)])
+                i += len(batch)
                 arcpy.AddMessage(f"iteration: {i} out of {a}")
-                # select the lines and select the respective hexagon where the lines are
-                selected_roads = arcpy.management.SelectLayerByAttribute("roads_isect_diss", "NEW_SELECTION", "OBJECTID = %s" % i)
-                selected_hex = arcpy.management.SelectLayerByAttribute("hex_gr", "NEW_SELECTION", "OBJECTID = %s" % (total[i-1]))
-
-                # selected hexagon is exported into layer "one_hex"
-                arcpy.conversion.FeatureClassToFeatureClass(selected_hex, workspace, "one_hex")
-
-                # "aa" contains extent of this hexagon
-                aa = arcpy.Describe("one_hex").extent
-                xmin = aa.XMin
-                ymin  = aa.YMin
-
-                # list "squares" contains numbers of squares in fishnet, which will be generated in the next for loop
-                squares = [4,16,64,256]
-                # list "intersections" contains counts of squares which cover lines in the polygon/hexagon, first it is 1/1, then a/4, b/16, c/64, d/256
-                intersections = [1]
-
-                # this for loop has 4 iterations
-                # during one iteration it creates fishnet over the "one_hex", clips the fishnet by "one_hex", counts the number of squares that cover lines and add these counts into the list "intersections"
-                for n in range(len(squares)):
-                    arcpy.management.CreateFishnet("fishnet_" + str(squares[n]), str(xmin) + ' ' + str(ymin), str(xmin) + ' ' + str(ymin+1), "0", "0", int((squares[n])**(0.5)), int((squares[n])**(0.5)), "#", "NO_LABELS", "one_hex", "POLYGON")
-                    arcpy.analysis.Clip("fishnet_" + str(squares[n]), "one_hex", "fishnet_clip_" + str(squares[n]))
-                    c = int(arcpy.management.GetCount(arcpy.management.SelectLayerByLocation("fishnet_clip_" + str(squares[n]), "INTERSECT", selected_roads)).getOutput(0))
-                    intersections.append(c)
-                    arcpy.management.Delete(["fishnet_" + str(squares[n]), "fishnet_clip_" + str(squares[n])])
-
-                # fractal dimension and transport provision calculation (another math which I don't understand, but it works)
-                edge = [1,0.5,0.25,0.125,0.0625]
-                logx = log(edge)
-                logy = log(intersections)
-                qout, success = optimize.leastsq(errfunc, [0, 0], args = (logx, logy), maxfev = 30000)
-
-                # adding the transport provision into the list "tp_values" and deleting layer "one_hex"
-                # (in the original code, the field TP was calculated in the end of each iteration, in my version, transport provision for each polygon is saved in the list and after the while loop terminates, it is loaded into the field TP)
-                tp_values.append(float(int(qout[1]*100000))/(-200000))
-                arcpy.management.Delete("one_hex")
-                i += 1
-
-            # calculating field TP: if the hexagon contains some lines, it is assigned its transport provision value
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+            # calculating field TP: if the hexagon contains some lines, it is assigned its transport provision value from the checkpoint table
             # (from this point on, the code is mine, not taken from the original script)
-            i = 0
-            with arcpy.da.UpdateCursor("hex_gr", ["OBJECTID", "TP"]) as cursor:
+            # "results" is a dictionary, key is ID of hexagon and value is a list (TP) or (TP, TP_se, TP_r2) with empty values instead of -1
+            results = {}
+            with arcpy.da.SearchCursor(checkpoint, checkpoint_fields) as cursor:
                 for row in cursor:
-                    if row[0] == total[i]:
-                        row[1] = tp_values[i]
+                    results[row[0]] = [row[1]] + [None if v == -1 else v for v in row[2:]]
+            if fit_stats == "true":
+                flds = ["OBJECTID", "TP", "TP_se", "TP_r2"]
+            else:
+                flds = ["OBJECTID", "TP"]
+            with arcpy.da.UpdateCursor("hex_gr", flds) as cursor:
+                for row in cursor:
+                    if row[0] in results:
+                        row[1:] = results[row[0]][:len(flds)-1]
                         cursor.updateRow(row)
-                        if i < a-1:
-                            i += 1
+            arcpy.management.Delete(checkpoint)
             arcpy.AddMessage("Field TP calculated and updated")
 
 
@@ -326,6 +345,9 @@ def main():
             else:
                 area_ending = ""
 
+            # if intermediate layers were in memory, only the output "hex_gr" is copied into the workspace on the disk
+            workspace = tn_core.persist_output("hex_gr", workspace, disk_workspace)
+
             # "v" is version
             v = 0
             # if in the workspace is already a different layer with the same name, version number will be added
@@ -345,30 +367,18 @@ def main():
                     arcpy.AddMessage("Name of the output: " + "fractal_tp" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
 
                  # deleting all layers that were created during the run of the script
-                if arcpy.Exists("reprj_data"):
-                    arcpy.management.Delete("reprj_data")
-                if arcpy.Exists("reprj_area"):
-                    arcpy.management.Delete("reprj_area")
-                if arcpy.Exists("reprj_own_layer"):
-                    arcpy.management.Delete("reprj_own_layer")
                 if arcpy.Exists("hex_grid"):
                     arcpy.management.Delete("hex_grid")
-                arcpy.management.Delete(["clipped_data", "roads_isect_diss", "roads_isect"])
+                tn_core.delete_layers(["clipped_data", "roads_isect"])
             else:
                 # renaming the output layer: when exporting to shapefile, the version number is added automatically if some other layer with the same name is in the output folder
                 arcpy.management.Rename("hex_gr", "fractal_tp" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
                 arcpy.conversion.FeatureClassToShapefile("fractal_tp" + "_" + siz_uni[0] + siz_uni[1] + area_ending, workspace[:(workspace.rfind(chr(92)))])
 
                 # deleting all layers that were created during the run of the script
-                if arcpy.Exists("reprj_data"):
-                    arcpy.management.Delete("reprj_data")
-                if arcpy.Exists("reprj_area"):
-                    arcpy.management.Delete("reprj_area")
-                if arcpy.Exists("reprj_own_layer"):
-                    arcpy.management.Delete("reprj_own_layer")
                 if arcpy.Exists("hex_grid"):
                     arcpy.management.Delete("hex_grid")
-                arcpy.management.Delete(["clipped_data", "roads_isect_diss", "roads_isect", "fractal_tp" + "_" + siz_uni[0] + siz_uni[1] + area_ending])
+                tn_core.delete_layers(["clipped_data", "roads_isect", "fractal_tp" + "_" + siz_uni[0] + siz_uni[1] + area_ending])
                 arcpy.env.workspace = workspace[:(workspace.rfind(chr(92)))]
 
                 # deleting the "working.gdb"
@@ -376,8 +386,9 @@ def main():
                 arcpy.AddMessage("Name of the output: " + "fractal_tp" + "_" + siz_uni[0] + siz_uni[1] + area_ending + ".shp")
 
             # deleting variables
-            del area, data, size, siz_uni, workspace, ending, leng, area_ending, v, data_spref, area_spref, cor_sys, cor_sys_string, desc, i, cursor, control_selection, row, check_a
-            del fitfunc, errfunc, a, rows, total, count, tp_values, selected_roads, selected_hex, aa, xmin, ymin, squares, intersections, n, c, edge, logx, logy, qout, success, area_name, hex_or_own, own_layer
+            del area, data, size, siz_uni, workspace, disk_workspace, ending, leng, area_ending, v, data_spref, area_spref, cor_sys, cor_sys_string, desc, i, cursor, row, check_a
+            del a, extents, workers, fit_stats, levels, adaptive, resume, batch_size, flds, count, aa, edge
+            del run_id, checkpoint_dir, checkpoint_name, checkpoint, checkpoint_fields, missing, done, pool, todo, index, results, area_name, hex_or_own, own_layer
             arcpy.AddMessage("Trash deleted")
 
             # finish! :D
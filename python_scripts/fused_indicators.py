@@ -0,0 +1,396 @@
+#-------------------------------------------------------------------------------
+# Name:        Road Indicators Fused
+#
+# Purpose:     The purpose of this script is to calculate the road indicators of "Highways OSM", "Transport network EU population grid"
+#              and "Bridges Tunnels OSM" tools in one run: hway_percentage, hway_density, rd_density, rd_per_capita, br_rd_ratio and tu_rd_ratio.
+#              OSM roads are clipped by area and assigned to hexagons/polygons only once (with their attributes 'code', 'bridge' and 'tunnel'),
+#              all lengths are summed in one pass and the result is one layer with all six indicators, which can be used
+#              in "Summary Transport Index" tool directly.
+#
+# Author:      Adam Tóth
+#
+# This script is a part of bachelor thesis "Possibilities of calculation characteristics of the transport network of states and cities"
+# supervisor: doc. Ing. Zdena Dobešová, Ph.D.
+# Department of Geoinformatics, Faculty of Science, Palacký University in Olomouc, Czech republic
+#
+# Created:     17.10.2026
+#-------------------------------------------------------------------------------
+
+# import libraries arcpy and numpy and "box_counting", "hex_lattice" and "tn_core" modules of this toolbox and allow overwriting features with the same name
+import arcpy
+import numpy
+import box_counting
+import hex_lattice
+import tn_core
+arcpy.env.overwriteOutput = True
+
+
+# value of indicator: numerator / denominator * factor for each hexagon, None if the hexagon doesn't have the numerator
+# or the denominator (the same as empty value calculated by CalculateField from empty joined fields)
+def ratio(numerator, has_numerator, denominator, has_denominator, factor=1):
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        values = numerator / denominator * factor
+    valid = has_numerator & has_denominator & (denominator != 0)
+    return [float(values[k]) if valid[k] else None for k in range(len(values))]
+
+
+def main():
+    arcpy.AddMessage("The script has started!")
+    # results of the input checks of the previous run are forgotten (see "tn_core" module)
+    tn_core.reset_validation()
+
+    # getting inputs from parameters in tool's interface (the same as in "Transport network EU population grid" tool):
+    # OSM roads with fields 'code', 'bridge' and 'tunnel', population grid with field 'TOT_P_2018', area, hexagons or own layer, size of hexagons,
+    # own layer, output workspace and coordinate system
+    data = arcpy.GetParameterAsText(0)
+    pop_data = arcpy.GetParameterAsText(1)
+    area = arcpy.GetParameterAsText(2)
+    hex_or_own = arcpy.GetParameterAsText(3)
+    size = arcpy.GetParameterAsText(4)
+    own_layer = arcpy.GetParameterAsText(5)
+    workspace = arcpy.GetParameterAsText(6)
+    cor_sys_string = arcpy.GetParameterAsText(7)
+
+    area_name = area[(area.rfind(chr(92))+1):]
+
+    # checking OSM layer, if it is a line layer, if it has a field 'code' of Short/Long type,
+    # if it contains at least one road and if it contains fields 'bridge' and 'tunnel'
+    desc = arcpy.Describe(data)
+    fields = arcpy.ListFields(data)
+    check_d = 0
+
+    if desc.shapeType == "Polyline":
+        for i in fields:
+            if (i.name == 'code') and ((i.type == 'SmallInteger') or (i.type == 'Integer')):
+                # where-clause probe, only the first road is read (see "tn_core" module)
+                if tn_core.has_rows(data, "code > 5110 And code < 5136"):
+                    check_d += 1
+            if (i.name == 'bridge') and (i.type == 'String'):
+                check_d += 1
+            if (i.name == 'tunnel') and (i.type == 'String'):
+                check_d += 1
+
+    # check of output layer: if user selected that they want to use their own layer, it has to be provided in "own_layer"
+    # if user wanted to use hexagon grid, the size of hexagon has to be provided in "size"
+    if hex_or_own == "true":
+        if own_layer != "":
+            check_d += 1
+    else:
+        if size != "":
+            check_d += 1
+
+    # if it doesn't meet the requirements, script is ended
+    if check_d < 4:
+        del data, pop_data, area, size, workspace, cor_sys_string, desc, fields, check_d, area_name, hex_or_own, own_layer
+        arcpy.AddError("Your data is not suitable for this script.")
+    else:
+        # if the workspace is geodatabase, the result will be feature class in gdb,
+        # if the workspace is folder, the result will be shapefile in that folder, but first,
+        # "working.gdb" is created in the folder and from this geodatabase, the result will be exported as a shapefile into the folder
+        leng = len(workspace)
+        ending = workspace[(leng-4):leng]
+        if ending != ".gdb":
+            arcpy.management.CreateFileGDB(workspace, "working.gdb")
+            workspace = workspace + chr(92) + "working.gdb"
+
+        # setting of workspace in environments: intermediate layers can be kept in memory instead of the disk (optional parameters:
+        # "true" to use memory and the memory budget in MB), if their estimated size is bigger than the budget, the disk is used (see "tn_core" module);
+        # "disk_workspace" is the workspace on the disk where the output is saved
+        disk_workspace = workspace
+        workspace = tn_core.intermediate_workspace(workspace, tn_core.optional_parameter(8, "false"), float(tn_core.optional_parameter(9, "2048")), [data, pop_data, area, own_layer])
+
+        # checking and setting the main coordinate system and projecting data into it
+        data_spref = arcpy.Describe(data).spatialReference
+        area_spref = arcpy.Describe(area).spatialReference
+        pop_data_spref = arcpy.Describe(pop_data).spatialReference
+        if hex_or_own == "true":
+            own_layer_spref = arcpy.Describe(own_layer).spatialReference
+
+        # if user selected projected coordinate system with meter as its unit, it is set as the main coordinate system
+        # if user selected geographic coordinate system or projected coordinate system with different unit than meter or they selected nothing,
+        # this is the order of setting the main coordinate system (see "tn_core" module):
+        # the coordinate system of their own output layer, the coordinate system of population grid, the system of OSM layer, the system of area, WGS84 Web Mercator (Auxiliary Sphere)
+        if hex_or_own == "true":
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(own_layer_spref, "your output layer"), (pop_data_spref, "population grid"), (data_spref, "OSM layer"), (area_spref, "area layer")])
+        else:
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(pop_data_spref, "population grid"), (data_spref, "OSM layer"), (area_spref, "area layer")])
+
+        arcpy.env.outputCoordinateSystem = cor_sys
+
+        # if coordinate systems of data is different from the main coordinate system, it is reprojected into that coordinate system
+        # (reprojected layers are kept in the cache, so the same layer is not reprojected again in the next runs, see "tn_core" module)
+        data = tn_core.reproject(data, data_spref, cor_sys, "Data layer")
+
+        # if coordinate systems of area is different from the main coordinate system, it is reprojected into that coordinate system
+        area = tn_core.reproject(area, area_spref, cor_sys, "Area layer")
+
+        # if coordinate systems of population grid is different from the main coordinate system, it is reprojected into that coordinate system
+        pop_data = tn_core.reproject(pop_data, pop_data_spref, cor_sys, "Population data layer")
+
+        # control of output polygon layer which user selected
+        check_a = 0
+        if hex_or_own == "true":
+            # reprojection into the main coordinate system if necessary
+            own_layer = tn_core.reproject(own_layer, own_layer_spref, cor_sys, "Your output layer")
+            del own_layer_spref
+            # control whether the area layer and the output polygon layer overlap
+            # (extents are compared first and only the first intersecting feature is searched, see "tn_core" module)
+            if not tn_core.layers_overlap(own_layer, area):
+                arcpy.AddError("Your output layer and area layer don't overlap.")
+            # control whether the data and the output polygon layer overlap
+            elif tn_core.layers_overlap(data, own_layer):
+                check_a += 1
+                arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
+            else:
+                arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
+        else:
+            check_a += 1
+
+        # control of area layer, whether it is a polygon layer and if it overlaps with OSM layer
+        desc = arcpy.Describe(area)
+
+        if desc.shapeType == "Polygon":
+            if not tn_core.layers_overlap(data, area):
+                arcpy.AddError("Your data and area layers don't overlap.")
+            # if it meets the requirements, roads (major roads 5111-5115, minor roads 5121-5124, major road links 5131-5135) are clipped by area only once,
+            # with their attributes 'code', 'bridge' and 'tunnel'
+            else:
+                check_a += 1
+                roads = arcpy.management.SelectLayerByAttribute(data, "NEW_SELECTION", "code > 5110 And code < 5136")
+                arcpy.analysis.Clip(roads, area, "clipped_data")
+                roads = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
+                data = workspace + chr(92) + "clipped_data"
+                arcpy.AddMessage("Your area layer is OK, roads clipped by area.")
+        else:
+            arcpy.AddError("Your area layer is not of polygon shape type.")
+
+        # control of population grid: it has to be polygon layer, it has to contain numeric field 'TOT_P_2018'
+        # and it has to overlap with area layer (population grid is not clipped, population is interpolated into hexagons
+        # by the areal-weighting matrix, see below)
+        desc = arcpy.Describe(pop_data)
+        fields = arcpy.ListFields(pop_data)
+        # "invalid" are population fields which the population grid doesn't contain or which are not numeric
+        numeric = [fld.name for fld in fields if fld.type in ["SmallInteger", "Integer", "Single", "Double"]]
+        invalid = [fld for fld in ["TOT_P_2018"] if fld not in numeric]
+        if desc.shapeType == "Polygon":
+            if invalid:
+                arcpy.AddError(f"Your population data layer doesn't contain numeric population fields {invalid}.")
+            elif not tn_core.layers_overlap(pop_data, area):
+                arcpy.AddError("Your population data doesn't overlap with area layer.")
+            else:
+                check_a += 1
+                arcpy.AddMessage("Your population data layer is OK.")
+        else:
+            arcpy.AddError("Your population data layer is not of polygon shape type.")
+
+        control_selection = arcpy.management.SelectLayerByAttribute(pop_data, "CLEAR_SELECTION")
+
+        # if it doesn't meet the requirements, script is ended
+        if check_a < 3:
+            del data, pop_data, area, size, workspace, disk_workspace, cor_sys_string, desc, fields, i, control_selection, check_d, check_a, leng, ending
+            del area_name, data_spref, area_spref, pop_data_spref, cor_sys, hex_or_own, own_layer, numeric, invalid
+        else:
+            # if user selected their own output layer, it is clipped by area layer, this clipped layer is called "hex_gr"
+            if hex_or_own == "true":
+                arcpy.analysis.Clip(own_layer, area, "hex_gr")
+                arcpy.AddMessage("Your chosen polygon layer for the output was clipped")
+            # otherwise hexagon grid is generated and clipped by area layer, this clipped layer is called "hex_gr"
+            else:
+                # if user selects the areal unit "Unknown", it will be used as Square Kilometers
+                if size[len(size)-7:len(size)] == "Unknown":
+                    size = size.replace("Unknown", "SquareKilometers")
+                    arcpy.AddMessage("You selected 'Unknown' as the areal unit, therefore 'Square Kilometers' will be used")
+
+                # the clipped grid is kept in the cache, so it is generated only once for the same area, size and coordinate system (see "tn_core" module)
+                tn_core.hexagon_grid(area, size, cor_sys)
+
+            # "ids" are OBJECTIDs of hexagons/polygons of "hex_gr", "shape_area" their areas
+            ids = []
+            shape_area = []
+            with arcpy.da.SearchCursor("hex_gr", ["OID@", "SHAPE@AREA"]) as cursor:
+                for row in cursor:
+                    ids.append(row[0])
+                    shape_area.append(row[1])
+            shape_area = numpy.array(shape_area)
+            position = dict(zip(ids, range(len(ids))))
+
+            # lengths of roads in hexagons/polygons with their attributes: "hexagon" is index of the hexagon in "ids" for each piece of road,
+            # "length" its length, "highway", "bridge" and "tunnel" tell what kind of road the piece is;
+            # generated hexagon grid: roads are split at the edges of hexagons analytically (see "hex_lattice" module),
+            # otherwise roads are intersected with "hex_gr" once, attributes 'code', 'bridge' and 'tunnel' are kept
+            grid = None
+            if hex_or_own != "true":
+                grid = tn_core.grid_lattice("hex_gr")
+            hexagon, length, highway, bridge, tunnel = [], [], [], [], []
+            sums = {}
+            present = {}
+            if grid is not None:
+                lattice, keys, q, r = grid
+                # positions of hexagons of the lattice in "ids"
+                order = numpy.array([position[k] for k in keys], dtype=numpy.int64)
+                segments = {"road": [numpy.zeros((0, 4))], "highway": [numpy.zeros((0, 4))], "bridge": [numpy.zeros((0, 4))], "tunnel": [numpy.zeros((0, 4))]}
+                with arcpy.da.SearchCursor("clipped_data", ["SHAPE@", "code", "bridge", "tunnel"]) as cursor:
+                    for row in cursor:
+                        if row[0] is not None:
+                            pieces = box_counting.polyline_segments(row[0])
+                            segments["road"].append(pieces)
+                            if row[1] in (5111, 5112):
+                                segments["highway"].append(pieces)
+                            if row[2] == "T":
+                                segments["bridge"].append(pieces)
+                            if row[3] == "T":
+                                segments["tunnel"].append(pieces)
+                for kind in segments:
+                    lattice_sums, lattice_present = hex_lattice.hexagon_lengths(lattice, numpy.vstack(segments[kind]), q, r)
+                    sums[kind] = numpy.zeros(len(ids))
+                    present[kind] = numpy.zeros(len(ids), dtype=bool)
+                    sums[kind][order] = lattice_sums
+                    present[kind][order] = lattice_present
+                del lattice, keys, q, r, order, segments, kind, lattice_sums, lattice_present
+            else:
+                arcpy.analysis.Intersect(["clipped_data", "hex_gr"], "roads_isect", "ALL")
+                arcpy.AddMessage("Roads intersected by polygons")
+                with arcpy.da.SearchCursor("roads_isect", ["FID_hex_gr", "SHAPE@LENGTH", "code", "bridge", "tunnel"]) as cursor:
+                    for row in cursor:
+                        if row[0] in position:
+                            hexagon.append(position[row[0]])
+                            length.append(row[1])
+                            highway.append(row[2] in (5111, 5112))
+                            bridge.append(row[3] == "T")
+                            tunnel.append(row[4] == "T")
+                hexagon = numpy.array(hexagon, dtype=numpy.int64)
+                length = numpy.array(length, dtype=float)
+
+                # grouped sums of lengths of all roads, highways, bridges and tunnels in each hexagon/polygon (one pass, no Dissolve)
+                for kind, mask in (("road", numpy.ones(len(length), dtype=bool)), ("highway", numpy.array(highway, dtype=bool)),
+                                   ("bridge", numpy.array(bridge, dtype=bool)), ("tunnel", numpy.array(tunnel, dtype=bool))):
+                    sums[kind] = numpy.bincount(hexagon[mask], weights=length[mask], minlength=len(ids))
+                    present[kind] = numpy.bincount(hexagon[mask & (length > 0)], minlength=len(ids)) > 0
+                del kind, mask
+            arcpy.AddMessage("Lengths of roads, highways, bridges and tunnels in hexagons calculated")
+
+            # population in hexagons/polygons: sparse areal-weighting matrix of squares of population grid and "hex_gr" (fraction of the area of the square
+            # in each hexagon, kept in the cache) multiplied by the population of squares (see "tn_core" module)
+            weights = tn_core.areal_weights(pop_data, "hex_gr")
+            pop_values = tn_core.interpolate(weights, pop_data, "TOT_P_2018")
+            pop_hexagon = [position[k] for k in pop_values if k in position]
+            pop_value = [pop_values[k] for k in pop_values if k in position]
+            population = numpy.bincount(numpy.array(pop_hexagon, dtype=numpy.int64), weights=numpy.array(pop_value, dtype=float), minlength=len(ids))
+            has_population = numpy.bincount(numpy.array(pop_hexagon, dtype=numpy.int64), minlength=len(ids)) > 0
+            arcpy.AddMessage("Population in each hexagon calculated from 2018 estimate")
+
+            # all lengths, population and the six indicators are written into "hex_gr" in one pass:
+            # hway_percentage - highways length divided by roads length multiplied by 100, hway_density and rd_density - length in km per 1 square km,
+            # rd_per_capita - roads length in m per 1 inhabitant, br_rd_ratio and tu_rd_ratio - bridges/tunnels length in m per 1 km of roads
+            has_area = numpy.ones(len(ids), dtype=bool)
+            values = {}
+            for name, kind in (("rd_length", "road"), ("hway_length", "highway"), ("rd_bridges_length", "bridge"), ("rd_tunnels_length", "tunnel")):
+                values[name] = dict((ids[k], float(sums[kind][k])) for k in numpy.flatnonzero(present[kind]))
+            values["SUM_new_pop2018"] = dict((ids[k], float(population[k])) for k in numpy.flatnonzero(has_population))
+            indicators = {
+                "hway_percentage": ratio(sums["highway"], present["highway"], sums["road"], present["road"], 100),
+                "hway_density": ratio(sums["highway"] / 1000, present["highway"], shape_area / 1000000, has_area),
+                "rd_density": ratio(sums["road"] / 1000, present["road"], shape_area / 1000000, has_area),
+                "rd_per_capita": ratio(sums["road"], present["road"], population, has_population),
+                "br_rd_ratio": ratio(sums["bridge"], present["bridge"], sums["road"] / 1000, present["road"]),
+                "tu_rd_ratio": ratio(sums["tunnel"], present["tunnel"], sums["road"] / 1000, present["road"])}
+            for name in indicators:
+                values[name] = dict(zip(ids, indicators[name]))
+            tn_core.write_fields("hex_gr", values)
+            arcpy.AddMessage("Indicators hway_percentage, hway_density, rd_density, rd_per_capita, br_rd_ratio and tu_rd_ratio calculated")
+
+            # "siz_uni" is a list that looks like this: ["your", "_output"] in case the output layer is provided by user,
+            if hex_or_own == "true":
+                siz_uni = ["your", "_output"]
+            # or it can look like this : ["50", "km"] in case the hexagon grid is generated and used as the output layer
+            else:
+                siz_uni = size.split()
+                if siz_uni[1] == "SquareKilometers":
+                    siz_uni[1] = "km"
+                elif siz_uni[1] == "Hectares":
+                    siz_uni[1] = "ha"
+                elif siz_uni[1] == "Ares":
+                    siz_uni[1] = "a"
+                elif siz_uni[1] == "SquareMeters":
+                    siz_uni[1] = "m"
+                elif siz_uni[1] == "SquareDecimeters":
+                    siz_uni[1] = "dm"
+                elif siz_uni[1] == "SquareCentimeters":
+                    siz_uni[1] = "cm"
+                elif siz_uni[1] == "SquareMillimeters":
+                    siz_uni[1] = "mm"
+                elif siz_uni[1] == "SquareMiles":
+                    siz_uni[1] = "mi"
+                elif siz_uni[1] == "Acres":
+                    siz_uni[1] = "ac"
+                elif siz_uni[1] == "SquareYards":
+                    siz_uni[1] = "y"
+                elif siz_uni[1] == "SquareFeet":
+                    siz_uni[1] = "ft"
+                elif siz_uni[1] == "SquareInches":
+                    siz_uni[1] = "in"
+                elif siz_uni[1] == "Unknown":
+                    siz_uni[1] = "km"
+
+            # "area_ending" can contain the name of FUA/UrbanCore in case the area layer has the name from UA Boundary/UrbanCore layer
+            if "main." and "_UA2018_" in area_name:
+                area_ending = area_name[area_name.find("_"):]
+                area_ending = area_ending.replace("_UA2018", "")
+            if "main_" and "_UA2018_" in area_name:
+                area_name = area_name[6:]
+                area_ending = area_name[area_name.find("_"):]
+                area_ending = area_ending.replace("_UA2018", "")
+            else:
+                area_ending = ""
+
+            # if intermediate layers were in memory, only the output "hex_gr" is copied into the workspace on the disk
+            workspace = tn_core.persist_output("hex_gr", workspace, disk_workspace)
+
+            # "v" is version
+            v = 0
+            # if in the workspace is already a different layer with the same name, version number will be added
+            if ending == ".gdb":
+                try:
+                    arcpy.management.Rename("hex_gr", "road_indicators" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
+                except:
+                    v += 1
+                    # while some other layer with the same name exists in the geodatabase, the version number would increase by 1
+                    while arcpy.Exists("road_indicators" + "_" + siz_uni[0] + siz_uni[1] + area_ending + "_" + str(v)):
+                        v += 1
+                    arcpy.management.Rename("hex_gr", "road_indicators" + "_" + siz_uni[0] + siz_uni[1] + area_ending + "_" + str(v))
+
+                if v > 0:
+                    arcpy.AddMessage("Name of the output: " + "road_indicators" + "_" + siz_uni[0] + siz_uni[1] + area_ending + "_" + str(v))
+                else:
+                    arcpy.AddMessage("Name of the output: " + "road_indicators" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
+
+                # deleting all layers that were created during the run of the script
+                if arcpy.Exists("hex_grid"):
+                    arcpy.management.Delete("hex_grid")
+                tn_core.delete_layers(["clipped_data", "roads_isect"])
+            else:
+                # renaming the output layer: when exporting to shapefile, the version number is added automatically if some other layer with the same name is in the output folder
+                arcpy.management.Rename("hex_gr", "road_indicators" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
+                arcpy.conversion.FeatureClassToShapefile("road_indicators" + "_" + siz_uni[0] + siz_uni[1] + area_ending, workspace[:(workspace.rfind(chr(92)))])
+
+                # deleting all layers that were created during the run of the script
+                if arcpy.Exists("hex_grid"):
+                    arcpy.management.Delete("hex_grid")
+                tn_core.delete_layers(["clipped_data", "roads_isect"])
+                arcpy.env.workspace = workspace[:(workspace.rfind(chr(92)))]
+
+                # deleting the "working.gdb"
+                arcpy.management.Delete("working.gdb")
+                arcpy.AddMessage("Name of the output: " + "road_indicators" + "_" + siz_uni[0] + siz_uni[1] + area_ending + ".shp")
+
+            # deleting variables
+            del data, pop_data, area, size, siz_uni, workspace, disk_workspace, cor_sys_string, desc, fields, i, v, control_selection, check_d, check_a, leng, ending
+            del area_name, data_spref, area_spref, pop_data_spref, cor_sys, area_ending, hex_or_own, own_layer, numeric, invalid, roads, ids, shape_area, position, grid
+            del hexagon, length, highway, bridge, tunnel, sums, present, weights, pop_values, pop_hexagon, pop_value, population, has_population, has_area, values, indicators, name
+            arcpy.AddMessage("Trash deleted")
+
+            # finish! :D
+            arcpy.AddMessage("The script has succesfully ended! Your result is ready :)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#-------------------------------------------------------------------------------
+# Name:        Hexagon Lattice
+#
+# Purpose:     Analytic indexing of regular hexagon grids generated by GenerateTessellation (not user's own polygon layers).
+#              Hexagons of such grid are cells of one regular lattice, so the hexagon which contains a point is computed
+#              from its coordinates in closed form (axial coordinates q, r), and line segments are split at the edges of hexagons
+#              by walking through the lattice from one hexagon to its neighbour, without Intersect and Dissolve of layers.
+#              This module uses only numpy, so it can be imported without arcpy.
+#
+# Author:      Adam Tóth
+#
+# This script is a part of bachelor thesis "Possibilities of calculation characteristics of the transport network of states and cities"
+# supervisor: doc. Ing. Zdena Dobešová, Ph.D.
+# Department of Geoinformatics, Faculty of Science, Palacký University in Olomouc, Czech republic
+#
+# Created:     17.10.2026
+#-------------------------------------------------------------------------------
+
+import numpy
+
+
+# lattice of the grid from vertices of one complete (not clipped) hexagon of the grid (numpy array n x 2, the first vertex can be repeated at the end);
+# the lattice is a dictionary:
+# "center" - center of this hexagon (x, y), it is hexagon q = 0, r = 0,
+# "normals" - unit vectors (6 x 2) from the center to the middles of the 6 edges, in the direction of the 6 neighbours,
+# "apothem" - distance from the center to the edges,
+# "basis" - matrix (2 x 2) with vectors from the center to the centers of neighbours q + 1 and r + 1 in columns
+def lattice_from_hexagon(vertices):
+    vertices = numpy.asarray(vertices, dtype=float)
+    if len(vertices) > 6 and numpy.allclose(vertices[0], vertices[-1]):
+        vertices = vertices[:-1]
+    center = vertices.mean(axis=0)
+    radius = numpy.hypot(*(vertices - center).T).mean()
+    angle = numpy.arctan2(vertices[0, 1] - center[1], vertices[0, 0] - center[0])
+
+    # middles of edges are 30 degrees from the vertices, the distance of centers of neighbours is 2 * apothem
+    apothem = radius * numpy.sqrt(3) / 2
+    directions = angle + numpy.pi / 6 + numpy.arange(6) * numpy.pi / 3
+    normals = numpy.column_stack([numpy.cos(directions), numpy.sin(directions)])
+    basis = numpy.column_stack([normals[0], normals[1]]) * 2 * apothem
+    return {"center": center, "normals": normals, "apothem": apothem, "basis": basis}
+
+
+# steps of axial coordinates (q, r) to the neighbours in the directions of "normals" of the lattice
+# (normal 0 is q + 1, normal 1 is r + 1, normal 2 = normal 1 - normal 0, ... opposite directions have opposite steps)
+NEIGHBOURS = numpy.array([[1, 0], [0, 1], [-1, 1], [-1, 0], [0, -1], [1, -1]])
+
+
+# axial coordinates (q, r) of the hexagons which contain points "x", "y" (numpy arrays):
+# coordinates of the points in the basis of the lattice are rounded to the nearest center ("cube rounding" of hexagonal lattices)
+def axial(lattice, x, y):
+    inverse = numpy.linalg.inv(lattice["basis"])
+    dx = numpy.asarray(x, dtype=float) - lattice["center"][0]
+    dy = numpy.asarray(y, dtype=float) - lattice["center"][1]
+    q = inverse[0, 0] * dx + inverse[0, 1] * dy
+    r = inverse[1, 0] * dx + inverse[1, 1] * dy
+
+    # cube coordinates q + r + s = 0, the coordinate with the largest rounding error is computed from the other two
+    s = -q - r
+    rq, rr, rs = numpy.round(q), numpy.round(r), numpy.round(s)
+    eq, er, es = numpy.abs(rq - q), numpy.abs(rr - r), numpy.abs(rs - s)
+    fix_q = (eq > er) & (eq > es)
+    fix_r = ~fix_q & (er > es)
+    rq = numpy.where(fix_q, -rr - rs, rq)
+    rr = numpy.where(fix_r, -rq - rs, rr)
+    return rq.astype(numpy.int64), rr.astype(numpy.int64)
+
+
+# centers of hexagons with axial coordinates "q", "r"
+def centers(lattice, q, r):
+    x = lattice["center"][0] + lattice["basis"][0, 0] * q + lattice["basis"][0, 1] * r
+    y = lattice["center"][1] + lattice["basis"][1, 0] * q + lattice["basis"][1, 1] * r
+    return x, y
+
+
+# splits line segments (numpy array with rows x0, y0, x1, y1) at the edges of hexagons; returns numpy arrays q, r, length of the pieces
+# lattice walk: every segment starts in the hexagon of its start point, the parameter "t" (0-1) of the point where the segment leaves
+# the current hexagon is the smallest of the parameters of the edges which the segment goes towards, the segment continues in the neighbour
+# behind that edge, until it ends (t >= 1); all segments walk at once, so the number of loops is the largest number of hexagons crossed by one segment
+def split_segments(lattice, segments):
+    segments = numpy.asarray(segments, dtype=float).reshape(-1, 4)
+    d = segments[:, 2:] - segments[:, :2]
+    length = numpy.hypot(d[:, 0], d[:, 1])
+    keep = length > 0
+    segments, d, length = segments[keep], d[keep], length[keep]
+
+    q, r = axial(lattice, segments[:, 0], segments[:, 1])
+    t = numpy.zeros(len(segments))
+    # projection of the direction of segments on the normals (n x 6), only edges with positive projection can be crossed
+    towards = d @ lattice["normals"].T
+    pieces_q, pieces_r, pieces_length = [], [], []
+    active = numpy.arange(len(segments))
+    while len(active) > 0:
+        cx, cy = centers(lattice, q[active], r[active])
+        start = segments[active, :2] - numpy.column_stack([cx, cy])
+        distance = lattice["apothem"] - start @ lattice["normals"].T
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            exits = numpy.where(towards[active] > 0, distance / towards[active], numpy.inf)
+        edge = exits.argmin(axis=1)
+        t_exit = numpy.minimum(numpy.maximum(exits[numpy.arange(len(active)), edge], t[active]), 1)
+
+        pieces_q.append(q[active])
+        pieces_r.append(r[active])
+        pieces_length.append((t_exit - t[active]) * length[active])
+
+        # segments which didn't end continue in the neighbour hexagon
+        t[active] = t_exit
+        going = t_exit < 1
+        active, edge = active[going], edge[going]
+        q[active] += NEIGHBOURS[edge, 0]
+        r[active] += NEIGHBOURS[edge, 1]
+
+    if not pieces_q:
+        return numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0)
+    return numpy.concatenate(pieces_q), numpy.concatenate(pieces_r), numpy.concatenate(pieces_length)
+
+
+# sums of lengths of "segments" in hexagons with axial coordinates "keys_q", "keys_r" (numpy arrays, hexagons of the output layer);
+# returns numpy arrays "sums" (in the order of keys) and "present" (True if some part of the segments lies in the hexagon);
+# pieces in hexagons which are not in keys (outside the clipped grid) are ignored
+def hexagon_lengths(lattice, segments, keys_q, keys_r):
+    q, r, length = split_segments(lattice, segments)
+    keys = numpy.asarray(keys_q, dtype=numpy.int64) * 4294967296 + numpy.asarray(keys_r, dtype=numpy.int64)
+    order = numpy.argsort(keys)
+    pieces = q * 4294967296 + r
+    position = numpy.searchsorted(keys[order], pieces)
+    position = numpy.minimum(position, len(keys) - 1)
+    inside = (keys[order][position] == pieces) & (length > 0)
+    index = order[position[inside]]
+    sums = numpy.bincount(index, weights=length[inside], minlength=len(keys))
+    present = numpy.bincount(index, minlength=len(keys)) > 0
+    return sums, present
+
+
+# area of convex polygon "points" (list of (x, y)) clipped by half-planes (point - center) . normal <= apothem for all 6 normals
+# of the hexagon (Sutherland-Hodgman clipping, the area by the shoelace formula)
+def _clipped_area(points, center, normals, apothem):
+    for normal in normals:
+        clipped = []
+        for k in range(len(points)):
+            a, b = points[k - 1], points[k]
+            da = (a[0] - center[0]) * normal[0] + (a[1] - center[1]) * normal[1] - apothem
+            db = (b[0] - center[0]) * normal[0] + (b[1] - center[1]) * normal[1] - apothem
+            if (da <= 0) != (db <= 0):
+                t = da / (da - db)
+                clipped.append((a[0] + t * (b[0] - a[0]), a[1] + t * (b[1] - a[1])))
+            if db <= 0:
+                clipped.append(b)
+        points = clipped
+        if len(points) < 3:
+            return 0.0
+    return abs(sum(points[k - 1][0] * points[k][1] - points[k][0] * points[k - 1][1] for k in range(len(points)))) / 2
+
+
+# overlaps of one complete hexagon (vertices n x 2) with the squares of a regular square lattice with side "size"
+# (square (i, j) has the lower left corner at (i * size, j * size), e.g. GEOSTAT 1 km grid); returns numpy arrays i, j and fraction
+# (area of the overlap / area of the square) of the squares which overlap the hexagon: only the squares in the range of indices under the hexagon
+# are tested, squares with all 4 corners inside the hexagon have fraction 1, squares with all corners behind one edge of the hexagon don't overlap it
+# and only the remaining squares on the edges of the hexagon are clipped by its edges
+def square_overlaps(vertices, size):
+    lattice = lattice_from_hexagon(vertices)
+    vertices = numpy.asarray(vertices, dtype=float)
+    i0, j0 = numpy.floor(vertices.min(axis=0) / size).astype(numpy.int64)
+    i1, j1 = numpy.ceil(vertices.max(axis=0) / size).astype(numpy.int64)
+    i, j = numpy.meshgrid(numpy.arange(i0, i1), numpy.arange(j0, j1), indexing="ij")
+    i, j = i.ravel(), j.ravel()
+
+    # distances of the 4 corners of the squares behind the edges of the hexagon (squares x corners x normals), positive means outside
+    corners = numpy.array([[0, 0], [1, 0], [1, 1], [0, 1]]) * size
+    x = i[:, None] * size + corners[None, :, 0] - lattice["center"][0]
+    y = j[:, None] * size + corners[None, :, 1] - lattice["center"][1]
+    behind = x[:, :, None] * lattice["normals"][:, 0] + y[:, :, None] * lattice["normals"][:, 1] - lattice["apothem"]
+    tolerance = 1e-9 * size
+    inside = numpy.all(behind <= tolerance, axis=(1, 2))
+    outside = numpy.any(numpy.all(behind >= -tolerance, axis=1), axis=1)
+
+    fraction = inside.astype(float)
+    for k in numpy.flatnonzero(~inside & ~outside):
+        square = [(float(i[k] * size + cx), float(j[k] * size + cy)) for cx, cy in corners]
+        fraction[k] = _clipped_area(square, lattice["center"], lattice["normals"], lattice["apothem"]) / size ** 2
+    keep = fraction > 0
+    return i[keep], j[keep], fraction[keep]
@@ -13,13 +13,16 @@
 # Created:     03.03.2022
 #-------------------------------------------------------------------------------
 
-# import library arcpy and allow overwriting features with the same name
+# import library arcpy and "tn_core" module of this toolbox and allow overwriting features with the same name
 import arcpy
+import tn_core
 arcpy.env.overwriteOutput = True
 
 
 def main():
     arcpy.AddMessage("The script has started!")
+    # results of the input checks of the previous run are forgotten (see "tn_core" module)
+    tn_core.reset_validation()
 
     # getting inputs from parameters in tool's interface
     data = arcpy.GetParameterAsText(0)
@@ -41,12 +44,10 @@ def main():
     if desc.shapeType == "Polyline":
         for i in fields:
             if (i.name == 'code') and ((i.type == 'SmallInteger') or (i.type == 'Integer')):
-                with arcpy.da.SearchCursor(data, i.name) as cursor:
-                    for row in cursor:
-                        if (row[0] > 5110) and (row[0] < 5113):
-                            check_d += 1
-                            arcpy.AddMessage("Your data layer is OK.")
-                            break
+                # where-clause probe, only the first highway is read (see "tn_core" module)
+                if tn_core.has_rows(data, "code > 5110 And code < 5113"):
+                    check_d += 1
+                    arcpy.AddMessage("Your data layer is OK.")
                 break
 
     # check of output layer: if user selected that they want to use their own layer, it has to be provided in "own_layer"
@@ -60,7 +61,7 @@ def main():
 
     # if it doesn't meet the requirements, script is ended
     if check_d < 2:
-        del data, area, size, workspace, cor_sys_string, desc, fields, i, cursor, row, check_d, area_name, hex_or_own, own_layer
+        del data, area, size, workspace, cor_sys_string, desc, fields, i, check_d, area_name, hex_or_own, own_layer
         arcpy.AddError("Your data and/or settings for output are not suitable for this script.")
     else:
         # if the workspace is geodatabase, the result will be feature class in gdb,
@@ -72,8 +73,11 @@ def main():
             arcpy.management.CreateFileGDB(workspace, "working.gdb")
             workspace = workspace + chr(92) + "working.gdb"
 
-        # setting of workspace in environments
-        arcpy.env.workspace = workspace
+        # setting of workspace in environments: intermediate layers can be kept in memory instead of the disk (optional parameters:
+        # "true" to use memory and the memory budget in MB), if their estimated size is bigger than the budget, the disk is used (see "tn_core" module);
+        # "disk_workspace" is the workspace on the disk where the output is saved
+        disk_workspace = workspace
+        workspace = tn_core.intermediate_workspace(workspace, tn_core.optional_parameter(7, "false"), float(tn_core.optional_parameter(8, "2048")), [data, area, own_layer])
 
         # checking and setting the main coordinate system and projecting data into it
         data_spref = arcpy.Describe(data).spatialReference
@@ -82,91 +86,50 @@ def main():
             own_layer_spref = arcpy.Describe(own_layer).spatialReference
 
         # if user selected projected coordinate system with meter as its unit, it is set as the main coordinate system
-        if (cor_sys_string[:6] == "PROJCS") and ('UNIT["Meter",1.0]' in cor_sys_string):
-            cor_sys = arcpy.SpatialReference()
-            cor_sys.loadFromString(cor_sys_string)
-            arcpy.AddMessage(f"You selected this projected coordinate system for the output: {cor_sys.name}")
         # if user selected geographic coordinate system or projected coordinate system with different unit than meter or they selected nothing,
-        # this is the order of setting the main coordinate system:
+        # this is the order of setting the main coordinate system (see "tn_core" module):
         # the coordinate system of their own output layer, the coordinate system of OSM roads, the system of area, WGS84 Web Mercator (Auxiliary Sphere)
+        if hex_or_own == "true":
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(own_layer_spref, "your output layer"), (data_spref, "OSM layer"), (area_spref, "area layer")])
         else:
-            if hex_or_own == "true":
-                if (own_layer_spref.type == "Projected") and (own_layer_spref.linearUnitName == "Meter"):
-                    cor_sys = own_layer_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of your output layer {cor_sys.name} will be used.")
-                elif (data_spref.type == "Projected") and (data_spref.linearUnitName == "Meter"):
-                    cor_sys = data_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of OSM layer {cor_sys.name} will be used.")
-                elif (area_spref.type == "Projected") and (area_spref.linearUnitName == "Meter"):
-                    cor_sys = area_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of area layer {cor_sys.name} will be used.")
-                else:
-                    cor_sys = arcpy.SpatialReference(3857)
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
-            elif (data_spref.type == "Projected") and (data_spref.linearUnitName == "Meter"):
-                cor_sys = data_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of OSM layer {cor_sys.name} will be used.")
-            elif (area_spref.type == "Projected") and (area_spref.linearUnitName == "Meter"):
-                cor_sys = area_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of area layer {cor_sys.name} will be used.")
-            else:
-                cor_sys = arcpy.SpatialReference(3857)
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(data_spref, "OSM layer"), (area_spref, "area layer")])
 
         arcpy.env.outputCoordinateSystem = cor_sys
 
         # if coordinate systems of data is different from the main coordinate system, it is reprojected into that coordinate system
-        if data_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(data, "reprj_data", cor_sys)
-            data = workspace + chr(92) + "reprj_data"
-            arcpy.AddMessage(f"Data layer was reprojected from {data_spref.factoryCode} to {cor_sys.factoryCode}")
+        # (reprojected layers are kept in the cache, so the same layer is not reprojected again in the next runs, see "tn_core" module)
+        data = tn_core.reproject(data, data_spref, cor_sys, "Data layer")
 
         # if coordinate systems of area is different from the main coordinate system, it is reprojected into that coordinate system
-        if area_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(area, "reprj_area", cor_sys)
-            area = workspace + chr(92) + "reprj_area"
-            arcpy.AddMessage(f"Area layer was reprojected from {area_spref.factoryCode} to {cor_sys.factoryCode}")
+        area = tn_core.reproject(area, area_spref, cor_sys, "Area layer")
 
         # control of output polygon layer which user selected
         check_a = 0
         if hex_or_own == "true":
             # reprojection into the main coordinate system if necessary
-            if own_layer_spref.factoryCode != cor_sys.factoryCode:
-                arcpy.management.Project(own_layer, "reprj_own_layer", cor_sys)
-                own_layer = workspace + chr(92) + "reprj_own_layer"
-                arcpy.AddMessage(f"Your output layer was reprojected from {own_layer_spref.factoryCode} to {cor_sys.factoryCode}")
+            own_layer = tn_core.reproject(own_layer, own_layer_spref, cor_sys, "Your output layer")
             del own_layer_spref
             # control whether the area layer and the output polygon layer overlap
-            control_selection = arcpy.management.SelectLayerByLocation(own_layer, "INTERSECT", area)
-            if int(control_selection[2]) == 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(own_layer, "CLEAR_SELECTION")
+            # (extents are compared first and only the first intersecting feature is searched, see "tn_core" module)
+            if not tn_core.layers_overlap(own_layer, area):
                 arcpy.AddError("Your output layer and area layer don't overlap.")
-            elif int(control_selection[2]) > 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(own_layer, "CLEAR_SELECTION")
-                # control whether the data and the output polygon layer overlap
-                control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", own_layer)
-                if int(control_selection[2]) > 0:
-                    control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
-                    check_a += 1
-                    arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
-                else:
-                    arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
+            # control whether the data and the output polygon layer overlap
+            elif tn_core.layers_overlap(data, own_layer):
+                check_a += 1
+                arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
             else:
-                arcpy.AddError("Your chosen polygon layer for the output and area layer don't overlap.")
+                arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
         else:
             check_a += 1
 
         # control of area layer, whether it is a polygon layer and if it overlaps with OSM roads
         desc = arcpy.Describe(area)
-        control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", area)
 
         if desc.shapeType == "Polygon":
-            if int(control_selection[2]) == 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
+            if not tn_core.layers_overlap(data, area):
                 arcpy.AddError("Your data and area layers don't overlap.")
             # if it meets the requirements, OSM roads are clipped by area
-            elif int(control_selection[2]) > 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
+            else:
                 check_a += 1
                 arcpy.analysis.Clip(data, area, "clipped_data")
                 data = workspace + chr(92) + "clipped_data"
@@ -176,7 +139,7 @@ def main():
 
         # if it doesn't meet the requirements, script is ended
         if check_a < 2:
-            del data, area, size, workspace, cor_sys_string, desc, fields, i, cursor, row, control_selection, check_d, check_a, leng, ending
+            del data, area, size, workspace, disk_workspace, cor_sys_string, desc, fields, i, check_d, check_a, leng, ending
             del area_name, data_spref, area_spref, cor_sys, hex_or_own, own_layer
         else:
             # if user selected their own output layer, it is clipped by area layer, this clipped layer is called "hex_gr"
@@ -190,10 +153,8 @@ def main():
                     size = size.replace("Unknown", "SquareKilometers")
                     arcpy.AddMessage("You selected 'Unknown' as the areal unit, therefore 'Square Kilometers' will be used")
 
-                arcpy.management.GenerateTessellation("hex_grid", area, "HEXAGON", size)
-                arcpy.AddMessage("Hexagonal grid generated")
-                arcpy.analysis.Clip("hex_grid", area, "hex_gr")
-                arcpy.AddMessage("Clipped")
+                # the clipped grid is kept in the cache, so it is generated only once for the same area, size and coordinate system (see "tn_core" module)
+                tn_core.hexagon_grid(area, size, cor_sys)
 
             # selection of highways, there are 2 categories in OSM which are considered as highways: 5111 (motorways), 5112 (trunks)
             # export of selected features into a new layer
@@ -208,24 +169,34 @@ def main():
             selected_features = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
             arcpy.AddMessage("Roads selected and exported into a new layer")
 
-            # intersecting (cutting) highways and roads by "hex_gr"
-            arcpy.analysis.Intersect(["highways", "hex_gr"], "hways_isect", "ONLY_FID")
-            arcpy.analysis.Intersect(["roads", "hex_gr"], "roads_isect", "ONLY_FID")
-            arcpy.AddMessage("Highways and roads intersected by hexagons")
-
-            # dissolving (merging, aggregating) highways and roads in the same hexagon, so there will be only one feature for each hexagon
-            arcpy.management.Dissolve("hways_isect", "hways_isect_diss", "FID_hex_gr")
-            arcpy.management.Dissolve("roads_isect", "roads_isect_diss", "FID_hex_gr")
-            arcpy.AddMessage("Dissolved")
-
-            # joining highways and roads lengths to by "hex_gr"
-            arcpy.management.AddField("hways_isect_diss", "hway_length", "DOUBLE")
-            arcpy.management.CalculateField("hways_isect_diss", "hway_length", '!Shape_Length!')
-            arcpy.management.AddField("roads_isect_diss", "road_length", "DOUBLE")
-            arcpy.management.CalculateField("roads_isect_diss", "road_length", '!Shape_Length!')
-            arcpy.management.JoinField("hex_gr", "OBJECTID", "hways_isect_diss", "FID_hex_gr", ["hway_length"])
-            arcpy.management.JoinField("hex_gr", "OBJECTID", "roads_isect_diss", "FID_hex_gr", ["road_length"])
-            arcpy.AddMessage("Join successful")
+            # generated hexagon grid: lengths of highways and roads in hexagons are computed directly from coordinates of the lines,
+            # the lines are split at the edges of hexagons analytically (see "hex_lattice" and "tn_core" modules), so Intersect and Dissolve are not needed
+            grid = None
+            if hex_or_own != "true":
+                grid = tn_core.grid_lattice("hex_gr")
+            if grid is not None:
+                tn_core.write_fields("hex_gr", {"hway_length": tn_core.lattice_lengths("highways", grid), "road_length": tn_core.lattice_lengths("roads", grid)})
+                arcpy.AddMessage("Lengths of highways and roads in hexagons calculated")
+            # user's own output layer (or too small area for the lattice)
+            else:
+                # intersecting (cutting) highways and roads by "hex_gr"
+                arcpy.analysis.Intersect(["highways", "hex_gr"], "hways_isect", "ONLY_FID")
+                arcpy.analysis.Intersect(["roads", "hex_gr"], "roads_isect", "ONLY_FID")
+                arcpy.AddMessage("Highways and roads intersected by hexagons")
+
+                # dissolving (merging, aggregating) highways and roads in the same hexagon, so there will be only one feature for each hexagon
+                arcpy.management.Dissolve("hways_isect", "hways_isect_diss", "FID_hex_gr")
+                arcpy.management.Dissolve("roads_isect", "roads_isect_diss", "FID_hex_gr")
+                arcpy.AddMessage("Dissolved")
+
+                # joining highways and roads lengths to by "hex_gr"
+                arcpy.management.AddField("hways_isect_diss", "hway_length", "DOUBLE")
+                arcpy.management.CalculateField("hways_isect_diss", "hway_length", '!shape.length!')
+                arcpy.management.AddField("roads_isect_diss", "road_length", "DOUBLE")
+                arcpy.management.CalculateField("roads_isect_diss", "road_length", '!shape.length!')
+                arcpy.management.JoinField("hex_gr", "OBJECTID", "hways_isect_diss", "FID_hex_gr", ["hway_length"])
+                arcpy.management.JoinField("hex_gr", "OBJECTID", "roads_isect_diss", "FID_hex_gr", ["road_length"])
+                arcpy.AddMessage("Join successful")
 
             # creating new fields "hway_percentage" and "hway_density", where the indicators will be calculated
             arcpy.management.AddFields("hex_gr", [["hway_percentage", "DOUBLE"], ["hway_density", "DOUBLE"]])
@@ -235,7 +206,7 @@ def main():
             # hway_percentage is the percentage of highways length from the roads length (highways length divided by roads length multiplied by 100)
             # hway_density is the highways length in km per 1 square km of area
             arcpy.management.CalculateField("hex_gr", "hway_percentage", '!hway_length!/!road_length!*100')
-            arcpy.management.CalculateField("hex_gr", "hway_density", '(!hway_length!/1000)/(!Shape_Area!/1000000)')
+            arcpy.management.CalculateField("hex_gr", "hway_density", '(!hway_length!/1000)/(!shape.area!/1000000)')
             arcpy.AddMessage("Indicators 'highway ratio' and 'highway density' calculated")
 
             # "siz_uni" is a list that looks like this: ["your", "_output"] in case the output layer is provided by user,
@@ -282,6 +253,9 @@ def main():
             else:
                 area_ending = ""
 
+            # if intermediate layers were in memory, only the output "hex_gr" is copied into the workspace on the disk
+            workspace = tn_core.persist_output("hex_gr", workspace, disk_workspace)
+
             # "v" is version
             v = 0
             # if in the workspace is already a different layer with the same name, version number will be added
@@ -301,30 +275,18 @@ def main():
                     arcpy.AddMessage("Name of the output: " + "highways_osm" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
 
                 # deleting all layers that were created during the run of the script
-                if arcpy.Exists("reprj_data"):
-                    arcpy.management.Delete("reprj_data")
-                if arcpy.Exists("reprj_area"):
-                    arcpy.management.Delete("reprj_area")
-                if arcpy.Exists("reprj_own_layer"):
-                    arcpy.management.Delete("reprj_own_layer")
 ##                if arcpy.Exists("hex_grid"):
 ##                    arcpy.management.Delete("hex_grid")
-                arcpy.management.Delete(["clipped_data", "hways_isect", "hways_isect_diss", "highways", "roads_isect_diss", "roads_isect", "roads"])
+                tn_core.delete_layers(["clipped_data", "hways_isect", "hways_isect_diss", "highways", "roads_isect_diss", "roads_isect", "roads"])
             else:
                 # renaming the output layer: when exporting to shapefile, the version number is added automatically if some other layer with the same name is in the output folder
                 arcpy.management.Rename("hex_gr", "highways_osm" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
                 arcpy.conversion.FeatureClassToShapefile("highways_osm" + "_" + siz_uni[0] + siz_uni[1] + area_ending, workspace[:(workspace.rfind(chr(92)))])
 
                 # deleting all layers that were created during the run of the script
-                if arcpy.Exists("reprj_data"):
-                    arcpy.management.Delete("reprj_data")
-                if arcpy.Exists("reprj_area"):
-                    arcpy.management.Delete("reprj_area")
-                if arcpy.Exists("reprj_own_layer"):
-                    arcpy.management.Delete("reprj_own_layer")
                 if arcpy.Exists("hex_grid"):
                     arcpy.management.Delete("hex_grid")
-                arcpy.management.Delete(["clipped_data", "hways_isect", "hways_isect_diss", "highways", "roads_isect_diss", "roads_isect", "roads"])
+                tn_core.delete_layers(["clipped_data", "hways_isect", "hways_isect_diss", "highways", "roads_isect_diss", "roads_isect", "roads"])
                 arcpy.env.workspace = workspace[:(workspace.rfind(chr(92)))]
 
                 # deleting the "working.gdb"
@@ -332,8 +294,8 @@ def main():
                 arcpy.AddMessage("Name of the output: " + "highways_osm" + "_" + siz_uni[0] + siz_uni[1] + area_ending + ".shp")
 
             # deleting variables
-            del selected_features, area, data, size, siz_uni, workspace, ending, leng, area_ending, v, data_spref, area_spref, cor_sys, cor_sys_string, desc
-            del fields, i, cursor, control_selection, row, check_d, check_a, area_name, hex_or_own, own_layer
+            del selected_features, grid, area, data, size, siz_uni, workspace, disk_workspace, ending, leng, area_ending, v, data_spref, area_spref, cor_sys, cor_sys_string, desc
+            del fields, i, check_d, check_a, area_name, hex_or_own, own_layer
             arcpy.AddMessage("Trash deleted")
 
             # finish! :D
@@ -0,0 +1,56 @@
+#-------------------------------------------------------------------------------
+# Name:        Segment Index
+#
+# Purpose:     Packed in-memory index of line segments grouped by polygon/hexagon ID (for example "FID_hex_gr" of intersected lines).
+#              All segments are stored in one numpy array sorted by ID, so the segments of any polygon/hexagon are
+#              a continuous slice of this array and they are found in O(1) without touching the feature class again.
+#              It works the same way for generated hexagon grid and for user's own polygon layer.
+#              This module uses only numpy, so it can be imported without arcpy.
+#
+# Author:      Adam Tóth
+#
+# This script is a part of bachelor thesis "Possibilities of calculation characteristics of the transport network of states and cities"
+# supervisor: doc. Ing. Zdena Dobešová, Ph.D.
+# Department of Geoinformatics, Faculty of Science, Palacký University in Olomouc, Czech republic
+#
+# Created:     17.10.2026
+#-------------------------------------------------------------------------------
+
+import numpy
+
+
+# builds the index from "rows", iterable of pairs (ID, segments), where segments is numpy array with rows x0, y0, x1, y1
+# (one ID can be in more rows, for example multipart lines or lines which were not dissolved);
+# the index is a dictionary:
+# "segments" - all segments sorted by ID (n x 4),
+# "ids" - sorted list of IDs which have at least one segment,
+# "slices" - dictionary ID: (start, end), position of segments of the ID in "segments"
+def build_index(rows):
+    keys = []
+    arrays = []
+    for key, segments in rows:
+        if len(segments) > 0:
+            keys.append(numpy.full(len(segments), key, dtype=numpy.int64))
+            arrays.append(segments)
+    if not arrays:
+        return {"segments": numpy.zeros((0, 4)), "ids": [], "slices": {}}
+
+    keys = numpy.concatenate(keys)
+    order = numpy.argsort(keys, kind="stable")
+    keys = keys[order]
+    segments = numpy.vstack(arrays)[order]
+
+    # start and end of each group of the same ID
+    ids, starts = numpy.unique(keys, return_index=True)
+    ends = numpy.append(starts[1:], len(keys))
+    ids = ids.tolist()
+    slices = dict(zip(ids, zip(starts.tolist(), ends.tolist())))
+    return {"segments": segments, "ids": ids, "slices": slices}
+
+
+# segments (numpy array n x 4) of the polygon/hexagon "key", empty array if it has no segments
+def lookup(index, key):
+    if key in index["slices"]:
+        start, end = index["slices"][key]
+        return index["segments"][start:end]
+    return numpy.zeros((0, 4))
@@ -14,8 +14,14 @@
 # Created:     25.03.2022
 #-------------------------------------------------------------------------------
 
-# import library arcpy and allow overwriting features with the same name
+# import libraries arcpy, numpy and "deciles" and "tn_core" modules of this toolbox and allow overwriting features with the same name
+import os
+import bisect
+import itertools
 import arcpy
+import numpy
+import deciles as dec
+import tn_core
 arcpy.env.overwriteOutput = True
 
 def main():
@@ -32,6 +38,11 @@ def main():
     for i in range(2,15):
         weights.append(int(arcpy.GetParameterAsText(i)))
 
+    # streaming mode for very big layers (optional): if "true", the values are not loaded into memory, deciles are estimated by quantile sketch
+    # in one pass through the layer and the deciles are assigned in the second pass; "epsilon" is the allowed relative rank error of the deciles
+    streaming = tn_core.optional_parameter(15, "false")
+    epsilon = float(tn_core.optional_parameter(16, "0.001"))
+
     # control of input layer, if it contains at least one field with indicator, if it doesn't, the script will fail
     # at the same time, indicator fields from input layer will be loaded into the list "fields" and its respective weights into the list "pom"
     data_fields = arcpy.ListFields(in_layer)
@@ -53,6 +64,9 @@ def main():
         del in_layer, dir_name, weights, i, data_fields, indicators, fields, pom, check, f
     # but if there is at least one indicator field, the script continues here
     else:
+        # "all_fields" are all indicator fields of the input layer (for the cache of deciles)
+        all_fields = list(fields)
+
         # if the weight is set to 0, the respective indicator will not be included in the calculation of summary deciles index, so it is popped out of the list together with its 0 weight
         weights = pom
         while 0 in weights:
@@ -68,97 +82,146 @@ def main():
         workspace = dir_name[0:(dir_name.rfind(chr(92)))]
         name = dir_name[(dir_name.rfind(chr(92))+1):]
         ending = workspace[(len(workspace)-4):]
+        # "folder" is the folder of the output (the output folder for shapefile or the folder with the output gdb), it is set before
+        # the workspace is changed to "working.gdb", which is deleted at the end
         if ending != ".gdb":
+            folder = workspace
             arcpy.management.CreateFileGDB(workspace, "working.gdb")
             workspace = workspace + chr(92) + "working.gdb"
+        else:
+            folder = workspace[:(workspace.rfind(chr(92)))]
+
+        # weight-only recompute cache (optional, default "false", used only without streaming mode): unweighted deciles of all indicators of the input layer
+        # (also the ones with weight 0) are saved into the file "sum_tr_index_cache_" + input layer name + ".npz" in the output folder
+        # (the folder with the output gdb); when the tool runs again with the same indicator values, only the weights are applied,
+        # and if the output feature class in gdb from the previous run still exists, it isn't even copied again
+        cache = tn_core.optional_parameter(17, "false")
+        cache_file = os.path.join(folder, "sum_tr_index_cache_" + os.path.splitext(os.path.basename(in_layer))[0] + ".npz")
+        reuse = False
+
+        if streaming != "true":
+            # all indicator fields of the input layer are read at once into numpy structured array "source" (empty values are nan),
+            # "key" is hash of their values, the deciles are calculated again only if it is different from the key in the cache
+            source = arcpy.da.TableToNumPyArray(in_layer, all_fields, null_value=dict((f, numpy.nan) for f in all_fields))
+            key = dec.table_hash(source, all_fields)
+            cached = dec.load_classes(cache_file, key) if cache == "true" else None
+
+            # indicator values are the same as in the previous run, the output feature class of the previous run can be used
+            # if it still exists in gdb, it contains the same values and its OBJECTIDs are the OBJECTIDs saved with the deciles in the cache
+            if cached is not None:
+                arcpy.AddMessage("Indicator values haven't changed since the previous run, deciles are loaded from the cache: " + cache_file)
+                if ending == ".gdb" and cached["output"] == dir_name and arcpy.Exists(dir_name):
+                    previous = arcpy.da.TableToNumPyArray(dir_name, ["OID@"] + all_fields, null_value=dict((f, numpy.nan) for f in all_fields))
+                    reuse = (dec.table_hash(previous, all_fields) == key) and numpy.array_equal(previous["OID@"], cached["oids"])
+                    del previous
 
         # input layer is copied to the output gdb or "working.gdb"
-        arcpy.management.CopyFeatures(in_layer, workspace + chr(92) + name)
+        if not reuse:
+            arcpy.management.CopyFeatures(in_layer, workspace + chr(92) + name)
         in_layer = workspace + chr(92) + name
 
 
         # the main part: calculation of the summary decile index
-        # "index" is a list of 2-element's lists, first element is OBJECTID of hexagon/polygon and the second element is its summary deciles index
-        index = []
-        with arcpy.da.SearchCursor(in_layer, "OBJECTID") as cursor:
-            for row in cursor:
-                pom = [0,0]
-                pom[0] = row[0]
-                index.append(pom)
-
-        # the big for loop, it goes for all the indicators entering the calculation, "f" is integer variable
-        for f in range(len(fields)):
-            # "values" is a list of lists, 0th element is indicator value and 1st element is OBJECTID, so it can be sorted by indicator values and their deciles assigned
-            flds = ["OBJECTID", fields[f]]
-            values = []
-
-            # if there is some value in the indicator field, it will be loaded into "values"
-            with arcpy.da.SearchCursor(in_layer, flds) as cursor:
-                for row in cursor:
-                    if row[1] != None:
-                        pom = []
-                        for j in range(2,0,-1):
-                            pom.append(row[j-1])
-                        values.append(pom)
-
-            # "values" sorted by indicator value, "deciles" list created for decile values and "step" (size of one decile, type: float) is calculated
-            values.sort()
+        # streaming mode: peak memory doesn't depend on the number of rows
+        if streaming == "true":
+            # first pass: values are read in chunks of "chunk" rows and added into quantile sketches, one sketch for each indicator (see "deciles" module)
+            chunk = 100000
+            sketches = [dec.new_sketch(epsilon) for fld in fields]
+            with arcpy.da.SearchCursor(in_layer, fields) as cursor:
+                while True:
+                    rows = [[numpy.nan if v is None else v for v in row] for row in itertools.islice(cursor, chunk)]
+                    if not rows:
+                        break
+                    rows = numpy.array(rows, dtype=float)
+                    for f in range(len(fields)):
+                        dec.sketch_update(sketches[f], rows[:, f])
+
+            # decile breakpoints of each indicator and the maximum rank error introduced by the sketch
             deciles = []
-            step = len(values)/10
-
-            # decile values are the i*step-th elements from "values", i goes from 1 to 9 (both included)
-            for i in range(1,10):
-                deciles.append(values[round(i*step)-1][0])
-
-            # each value from "values" is assigned its decile, so values from 1st decile are assigned number 1, ... values from 10th decile number 10
-            # if user set some other weight than 1, the decile will be multiplied by this weight, for example weight = 2, values from 1st decile are assigned number 2, ... values from 10th decile number 20
-            # now "values" look like this: 0 – indicator value, 1 – OBJECTID, 2 – decile
-            j = 0
-            for i in values:
-                if i[0] <= deciles[j]:
-                    i.append((j+1)*weights[f])
-                elif j < 8:
-                    j += 1
-                    i.append((j+1)*weights[f])
+            for f in range(len(fields)):
+                if sketches[f]["n"] == 0:
+                    arcpy.AddWarning(f"Field {fields[f]} doesn't contain any value, its deciles are empty")
+                    deciles.append(None)
                 else:
-                    i.append((10)*weights[f])
-
-            # indicator values are removed and the list is sorted by OBJECTID, now it looks like this: 0 – OBJECTID, 1 – decile
-            for i in values:
-                i.pop(0)
-            values.sort()
+                    deciles.append(dec.sketch_breakpoints(sketches[f]).tolist())
+                    arcpy.AddMessage(f"Deciles of {fields[f]} estimated, maximum rank error: {sketches[f]['error']} of {sketches[f]['n']} values ({sketches[f]['error']/sketches[f]['n']:.4%})")
 
-            # new field "dec_" + fields[f] added, where the deciles of the current indicator will be stored; loading of deciles from "values" list to the field (matching determined by OBJECTID)
-            arcpy.management.AddField(in_layer, "dec_" + fields[f], "LONG")
-            i = 0
-            with arcpy.da.UpdateCursor(in_layer, ["OBJECTID", "dec_" + fields[f]]) as cursor:
+            # second pass: new fields are added and each value is assigned its decile (1 + number of breakpoints smaller than the value) multiplied by the weight,
+            # empty values have empty deciles; "sum_tr_index" is the sum of weighted deciles of the row
+            arcpy.management.AddFields(in_layer, [["dec_" + fld, "LONG"] for fld in fields] + [["sum_tr_index", "LONG"]])
+            with arcpy.da.UpdateCursor(in_layer, fields + ["dec_" + fld for fld in fields] + ["sum_tr_index"]) as cursor:
+                for row in cursor:
+                    total = 0
+                    for f in range(len(fields)):
+                        if row[f] is None or deciles[f] is None:
+                            row[len(fields)+f] = None
+                        else:
+                            row[len(fields)+f] = (bisect.bisect_left(deciles[f], row[f]) + 1) * weights[f]
+                            total += row[len(fields)+f]
+                    row[-1] = total
+                    cursor.updateRow(row)
+            arcpy.AddMessage("Fields with deciles and sum_tr_index calculated and updated")
+            del chunk, sketches, cursor, deciles
+
+        else:
+            # "all_classes" is a numpy array with unweighted deciles (rows are hexagons/polygons of the output with OBJECTIDs "oids", columns are indicators):
+            # they are taken from the cache if the output of the previous run is used or if the values of the output are the same as the values in the cache
+            # (deciles depend only on the values in the order of rows), otherwise "values" are indicator values, "deciles" are the 9 decile values of the non-empty values
+            # (see "deciles" module, the same positions as before: round(i*len/10)) and each value is assigned its decile,
+            # so values from 1st decile are assigned number 1, ... values from 10th decile number 10, empty values 0
+            if reuse:
+                all_classes = cached["classes"]
+                oids = cached["oids"]
+            else:
+                table = arcpy.da.TableToNumPyArray(in_layer, ["OID@"] + all_fields, null_value=dict((f, numpy.nan) for f in all_fields))
+                oids = table["OID@"]
+                key = dec.table_hash(table, all_fields)
+                if (cached is not None) and (cached["key"] == key):
+                    all_classes = cached["classes"]
+                else:
+                    all_classes = numpy.zeros((len(table), len(all_fields)), dtype=numpy.int8)
+                    for f in range(len(all_fields)):
+                        values = table[all_fields[f]].astype(float)
+                        if numpy.isnan(values).all():
+                            arcpy.AddWarning(f"Field {all_fields[f]} doesn't contain any value, its deciles are empty")
+                        else:
+                            deciles = dec.breakpoints(values[~numpy.isnan(values)])
+                            all_classes[:, f] = dec.classify(values, deciles)
+                        arcpy.AddMessage(f"Deciles of {all_fields[f]} calculated")
+                if cache == "true":
+                    dec.save_classes(cache_file, key, all_fields, all_classes, oids, dir_name)
+                del table
+
+            # "classes" is a numpy array with weighted deciles of each hexagon/polygon (rows in the order of "oids") and each indicator (columns),
+            # if user set some other weight than 1, the decile is multiplied by this weight, for example weight = 2, values from 1st decile are assigned number 2, ... values from 10th decile number 20;
+            # "index" is a numpy array with summary deciles index of each hexagon/polygon, sum of weighted deciles of all indicators
+            classes = all_classes[:, [all_fields.index(fld) for fld in fields]].astype(numpy.int64) * numpy.array(weights, dtype=numpy.int64)
+            index = classes.sum(axis=1)
+
+            # new fields "dec_" + indicator for deciles of each indicator and field "sum_tr_index" for the index are added at once;
+            # in the output of the previous run, decile fields of indicators which are no longer used are deleted and only the missing fields are added
+            dec_fields = ["dec_" + fld for fld in fields]
+            if reuse:
+                existing = [fld.name for fld in arcpy.ListFields(in_layer, "dec_*")]
+                if [fld for fld in existing if fld not in dec_fields]:
+                    arcpy.management.DeleteField(in_layer, [fld for fld in existing if fld not in dec_fields])
+                if [fld for fld in dec_fields if fld not in existing]:
+                    arcpy.management.AddFields(in_layer, [[fld, "LONG"] for fld in dec_fields if fld not in existing])
+            else:
+                arcpy.management.AddFields(in_layer, [[fld, "LONG"] for fld in dec_fields] + [["sum_tr_index", "LONG"]])
+
+            # all of them are loaded in one pass through the layer; rows are matched by OBJECTID, so the order of rows doesn't matter
+            # (empty indicator values have empty deciles)
+            position = dict((oid, i) for i, oid in enumerate(oids.tolist()))
+            with arcpy.da.UpdateCursor(in_layer, ["OID@"] + dec_fields + ["sum_tr_index"]) as cursor:
                 for row in cursor:
-                    if row[0] == values[i][0]:
-                        row[1] = values[i][1]
-                        cursor.updateRow(row)
-                        if i < len(values)-1:
-                            i += 1
-            arcpy.AddMessage(f"Field dec_{fields[f]} calculated and updated")
-
-            # deciles are added to the overall score in "index" list
-            j = 0
-            for i in index:
-                if i[0] == values[j][0]:
-                    i[1] += values[j][1]
-                    if j < len(values)-1:
-                        j += 1
-
-        # new field sum_tr_index added, where the index will be stored and loading of index from "index" list to the field (matching determined by OBJECTID)
-        arcpy.management.AddField(in_layer, "sum_tr_index", "LONG")
-        i = 0
-        with arcpy.da.UpdateCursor(in_layer, ["OBJECTID", "sum_tr_index"]) as cursor:
-            for row in cursor:
-                if row[0] == index[i][0]:
-                    row[1] = index[i][1]
+                    i = position[row[0]]
+                    for f in range(len(fields)):
+                        row[f+1] = int(classes[i, f]) if classes[i, f] > 0 else None
+                    row[-1] = int(index[i])
                     cursor.updateRow(row)
-                    if i < len(index)-1:
-                        i += 1
-        arcpy.AddMessage("Field sum_tr_index calculated and updated")
+            arcpy.AddMessage("Fields with deciles and sum_tr_index calculated and updated")
+            del source, key, cached, all_classes, oids, classes, index, dec_fields, position
 
         # if user selected a folder for the output, they will get a shapefile there, "working.gdb" is deleted
         if ending != ".gdb":
@@ -168,7 +231,7 @@ def main():
             arcpy.management.Delete(workspace + chr(92) + "working.gdb")
 
         # all variables deleted and final messages printed
-        del in_layer, dir_name, workspace, weights, i, data_fields, indicators, fields, pom, check, f, index, flds, values, j, deciles, step, name, ending
+        del in_layer, dir_name, workspace, weights, data_fields, indicators, fields, all_fields, pom, check, f, streaming, epsilon, cache, folder, cache_file, reuse, name, ending
         arcpy.AddMessage("Trash deleted")
         arcpy.AddMessage("The script has succesfully ended! Your result is ready :)")
 
@@ -0,0 +1,190 @@
+#-------------------------------------------------------------------------------
+# Name:        Summary Transport Index Batch
+#
+# Purpose:     Batch version of the "Summary Transport Index" tool (sum_tr_index.py) for many indicator layers at once,
+#              for example for all Urban Atlas FUAs. The deciles are global - the same breakpoints are used for all layers,
+#              so the summary index is comparable between the layers. Breakpoints are estimated in one streaming pass over all layers
+#              (quantile sketches of all layers are merged, see "deciles" module) and they are saved into .json file,
+#              so later added layers can be scored with the same breakpoints without processing the other layers again.
+#              The layers are processed in parallel worker processes, each of them in its own working geodatabase.
+#
+# Author:      Adam Tóth
+#
+# This script is a part of bachelor thesis "Possibilities of calculation characteristics of the transport network of states and cities"
+# supervisor: doc. Ing. Zdena Dobešová, Ph.D.
+# Department of Geoinformatics, Faculty of Science, Palacký University in Olomouc, Czech republic
+#
+# Created:     17.10.2026
+#-------------------------------------------------------------------------------
+
+# import libraries and "deciles" and "tn_core" modules of this toolbox and allow overwriting features with the same name
+import os
+import json
+import bisect
+import itertools
+import arcpy
+import numpy
+import deciles as dec
+import tn_core
+arcpy.env.overwriteOutput = True
+
+# indicator fields in the same order as the weights in the tool's parameters (the same as in sum_tr_index.py)
+indicators = ["TP", "tia_percentage", "tia_per_capita", "rd_density", "rd_per_capita", "rlw_density", "rlw_per_capita", "hway_percentage", "hway_density", "br_rd_ratio", "tu_rd_ratio", "br_rlw_ratio", "tu_rlw_ratio"]
+
+
+# worker of the first pass: quantile sketches of indicator "fields" of one layer, "task" is a tuple (layer, fields, epsilon);
+# returns dictionary field: sketch, only fields which the layer contains (values are read in chunks of 100000 rows)
+def layer_sketches(task):
+    layer, fields, epsilon = task
+    fields = [fld.name for fld in arcpy.ListFields(layer) if fld.name in fields]
+    sketches = dict((fld, dec.new_sketch(epsilon)) for fld in fields)
+    if not fields:
+        return sketches
+    with arcpy.da.SearchCursor(layer, fields) as cursor:
+        while True:
+            rows = [[numpy.nan if v is None else v for v in row] for row in itertools.islice(cursor, 100000)]
+            if not rows:
+                break
+            rows = numpy.array(rows, dtype=float)
+            for f in range(len(fields)):
+                dec.sketch_update(sketches[fields[f]], rows[:, f])
+    return sketches
+
+
+# worker of the second pass: one layer is copied to the output and classified by global breakpoints, "task" is a tuple
+# (layer, output, breaks, weights), where "output" is the path of the output feature class (in gdb), "breaks" is a dictionary
+# field: breakpoints and "weights" dictionary field: weight; each value is assigned its decile (1 + number of breakpoints smaller than the value)
+# multiplied by the weight, empty values have empty deciles, "sum_tr_index" is the sum of weighted deciles of the row
+def classify_layer(task):
+    layer, output, breaks, weights = task
+    fields = [fld.name for fld in arcpy.ListFields(layer) if fld.name in breaks]
+    arcpy.management.CopyFeatures(layer, output)
+    arcpy.management.AddFields(output, [["dec_" + fld, "LONG"] for fld in fields] + [["sum_tr_index", "LONG"]])
+    with arcpy.da.UpdateCursor(output, fields + ["dec_" + fld for fld in fields] + ["sum_tr_index"]) as cursor:
+        for row in cursor:
+            total = 0
+            for f in range(len(fields)):
+                if row[f] is None:
+                    row[len(fields)+f] = None
+                else:
+                    row[len(fields)+f] = (bisect.bisect_left(breaks[fields[f]], row[f]) + 1) * weights[fields[f]]
+                    total += row[len(fields)+f]
+            row[-1] = total
+            cursor.updateRow(row)
+    return output, fields
+
+
+def main():
+    arcpy.AddMessage("The script has started!")
+
+    # getting input from parameters in tool's interface: "in_layers" are input layers with already calculated indicators (multiple values separated by ";"),
+    # "workspace" is gdb or folder for the outputs (each output has the name of its input layer + "SumDecIndex"),
+    # "weights" is a list of weights (integers) set by user from range 0-10 (parameters 2-14, the same as in "Summary Transport Index" tool),
+    # "breaks_file" is .json file with global breakpoints: if it exists, its breakpoints are used and the layers are only classified,
+    # otherwise breakpoints are calculated from all input layers and saved into it,
+    # "workers" is the number of worker processes (1 means no parallel processing, 0 means all processors),
+    # "epsilon" is the allowed relative rank error of the breakpoints
+    in_layers = [layer.strip("'") for layer in arcpy.GetParameterAsText(0).split(";")]
+    workspace = arcpy.GetParameterAsText(1)
+    weights = []
+    for i in range(2,15):
+        weights.append(int(arcpy.GetParameterAsText(i)))
+    breaks_file = arcpy.GetParameterAsText(15)
+    workers = tn_core.worker_count(tn_core.optional_parameter(16, "1"))
+    epsilon = float(tn_core.optional_parameter(17, "0.001"))
+
+    # indicators with weight 0 are not included in the calculation
+    fields = [indicators[i] for i in range(len(indicators)) if weights[i] != 0]
+    weights = dict((indicators[i], weights[i]) for i in range(len(indicators)) if weights[i] != 0)
+    arcpy.AddMessage(f"Summary deciles index will be calculated from these indicators: {fields}")
+    arcpy.AddMessage(f"and their decile values will be multiplied by these weights, respectively: {list(weights.values())}")
+
+    if workers > 1:
+        arcpy.AddMessage(f"Layers are processed in {workers} parallel processes")
+        pool = tn_core.process_pool(workers)
+    else:
+        pool = None
+
+    # the worker functions are taken from this module imported by its name, so they can be sent to the worker processes
+    # also when the script runs as a tool inside ArcGIS Pro
+    import sum_tr_index_batch
+
+    # first pass: global breakpoints, sketches of all layers are merged into one sketch for each indicator
+    if os.path.exists(breaks_file):
+        with open(breaks_file) as file:
+            stored = json.load(file)
+        breaks = dict((fld, stored["breakpoints"][fld]) for fld in fields if fld in stored["breakpoints"])
+        for fld in fields:
+            if fld not in breaks:
+                arcpy.AddWarning(f"File {breaks_file} doesn't contain breakpoints of {fld}, it is not included in the index")
+        arcpy.AddMessage(f"Global breakpoints loaded from {breaks_file}")
+    else:
+        tasks = [(layer, fields, epsilon) for layer in in_layers]
+        if pool is not None:
+            results = pool.map(sum_tr_index_batch.layer_sketches, tasks)
+        else:
+            results = [sum_tr_index_batch.layer_sketches(task) for task in tasks]
+        sketches = dict((fld, dec.new_sketch(epsilon)) for fld in fields)
+        for sketch in results:
+            for fld in sketch:
+                dec.sketch_merge(sketches[fld], sketch[fld])
+
+        # breakpoints of each indicator and the maximum rank error introduced by the sketch are saved into "breaks_file"
+        # together with the number of values and the layers they were calculated from
+        breaks = {}
+        stored = {"breakpoints": {}, "count": {}, "error": {}, "layers": in_layers}
+        for fld in fields:
+            if sketches[fld]["n"] == 0:
+                arcpy.AddWarning(f"Field {fld} doesn't contain any value in any layer, it is not included in the index")
+            else:
+                breaks[fld] = dec.sketch_breakpoints(sketches[fld]).tolist()
+                stored["breakpoints"][fld] = breaks[fld]
+                stored["count"][fld] = sketches[fld]["n"]
+                stored["error"][fld] = sketches[fld]["error"]
+                arcpy.AddMessage(f"Global deciles of {fld} estimated from {sketches[fld]['n']} values, maximum rank error: {sketches[fld]['error']} ({sketches[fld]['error']/sketches[fld]['n']:.4%})")
+        with open(breaks_file, "w") as file:
+            json.dump(stored, file, indent=2)
+        arcpy.AddMessage(f"Global breakpoints saved into {breaks_file}")
+        del tasks, results, sketches, sketch
+
+    # second pass: each layer is copied and classified in its own "working_<n>.gdb" (file geodatabase doesn't allow more processes to change
+    # its schema at once, so the processes never write into the same gdb); the working gdbs are created in the output folder (or in the folder
+    # with the output gdb), the results are copied into the output gdb or converted to shapefiles one after another in this process;
+    # "names" are the names of the outputs: name of the input layer + "SumDecIndex", if more input layers have the same name
+    # (e.g. "hex_gr" from different gdbs), the number of the input layer is added, so the outputs don't overwrite each other
+    ending = workspace[(len(workspace)-4):]
+    if ending == ".gdb":
+        folder = workspace[:(workspace.rfind(chr(92)))]
+    else:
+        folder = workspace
+    names = []
+    tasks = []
+    for n in range(len(in_layers)):
+        name = os.path.splitext(os.path.basename(in_layers[n]))[0] + "SumDecIndex"
+        if name in names:
+            name = name + "_" + str(n)
+            arcpy.AddWarning(f"More input layers have the same name, the output of {in_layers[n]} is {name}")
+        names.append(name)
+        arcpy.management.CreateFileGDB(folder, f"working_{n}.gdb")
+        tasks.append((in_layers[n], folder + chr(92) + f"working_{n}.gdb" + chr(92) + name, breaks, weights))
+    if pool is not None:
+        results = pool.map(sum_tr_index_batch.classify_layer, tasks)
+        pool.close()
+        pool.join()
+    else:
+        results = [sum_tr_index_batch.classify_layer(task) for task in tasks]
+    for output, used in results:
+        arcpy.AddMessage(f"{output} classified by indicators {used}")
+        if ending == ".gdb":
+            arcpy.management.CopyFeatures(output, workspace + chr(92) + output[(output.rfind(chr(92))+1):])
+        else:
+            arcpy.conversion.FeatureClassToShapefile(output, workspace)
+        arcpy.management.Delete(output[:(output.rfind(chr(92)))])
+
+    # all variables deleted and final messages printed
+    del in_layers, workspace, weights, breaks_file, workers, epsilon, fields, pool, stored, breaks, ending, folder, names, tasks, n, name, results, output, used
+    arcpy.AddMessage("Trash deleted")
+    arcpy.AddMessage("The script has succesfully ended! Your results are ready :)")
+
+if __name__ == '__main__':
+    main()
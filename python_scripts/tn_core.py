@@ -0,0 +1,690 @@
+#-------------------------------------------------------------------------------
+# Name:        Transport Network Core
+#
+# Purpose:     Helpers shared by the scripts of "characteristics_of_transport_network.tbx" toolbox:
+#              optional parameters, worker processes, choice of the main coordinate system and persistent cache of reprojected inputs and hexagon grids
+#              lengths of lines in hexagons of generated grids computed by "hex_lattice" module and intermediate layers in memory.
+#
+# Author:      Adam Tóth
+#
+# This script is a part of bachelor thesis "Possibilities of calculation characteristics of the transport network of states and cities"
+# supervisor: doc. Ing. Zdena Dobešová, Ph.D.
+# Department of Geoinformatics, Faculty of Science, Palacký University in Olomouc, Czech republic
+#
+# Created:     17.10.2026
+#-------------------------------------------------------------------------------
+
+# import libraries
+import os
+import sys
+import re
+import json
+import time
+import itertools
+import contextlib
+import hashlib
+import shutil
+import tempfile
+import multiprocessing
+import numpy
+import arcpy
+import box_counting
+import hex_lattice
+
+
+# returns text of optional parameter of the tool at position "index",
+# if the tool doesn't have this parameter (older version of the toolbox) or it is empty, "default" is returned
+def optional_parameter(index, default=""):
+    if index < arcpy.GetArgumentCount():
+        value = arcpy.GetParameterAsText(index)
+        if value != "":
+            return value
+    return default
+
+
+# number of worker processes from the text of parameter: empty or 1 means no parallel processing,
+# 0 or negative number means all processors of the computer
+def worker_count(text):
+    workers = int(text) if text != "" else 1
+    if workers < 1:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+# splits list "items" into "n" chunks of (almost) the same size, order of items is kept
+def chunks(items, n):
+    n = max(1, min(n, len(items)))
+    size, rest = divmod(len(items), n)
+    result = []
+    start = 0
+    for k in range(n):
+        end = start + size + (1 if k < rest else 0)
+        result.append(items[start:end])
+        start = end
+    return result
+
+
+# creates pool of "workers" processes; when the script runs as a tool inside ArcGIS Pro, python executable
+# of the ArcGIS Pro environment has to be set for the new processes, otherwise ArcGISPro.exe would be started;
+# each new process runs function "initializer" with arguments "initargs" first (if it is set)
+def process_pool(workers, initializer=None, initargs=()):
+    if os.path.basename(sys.executable).lower().startswith("arcgispro"):
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, "pythonw.exe"))
+    return multiprocessing.Pool(workers, initializer, initargs)
+
+
+# staged validation of inputs: cheap checks first (extents, where-clause probes reading one row), exact spatial predicates
+# only for the few candidates which survive; results are memoized, so the same check of the same input is done only once in one run;
+# ArcGIS Pro runs script tools in its own python process and keeps imported modules between runs, so every tool clears the memo
+# by "reset_validation" at the start of its run (layers can be edited or reselected and intermediate layers have fixed names)
+_validation = {}
+
+
+# forgets all memoized results of "has_rows" and "layers_overlap" (called at the start of each run of a tool)
+def reset_validation():
+    _validation.clear()
+
+
+# True if "layer" contains at least one feature matching "where" (SQL where clause), only the first matching row is read
+def has_rows(layer, where):
+    key = ("rows", str(layer), where)
+    if key not in _validation:
+        with arcpy.da.SearchCursor(layer, ["OID@"], where) as cursor:
+            _validation[key] = next(cursor, None) is not None
+    return _validation[key]
+
+
+# True if the extents "a" and "b" don't touch each other
+def extents_disjoint(a, b):
+    return (a.XMin > b.XMax) or (a.XMax < b.XMin) or (a.YMin > b.YMax) or (a.YMax < b.YMin)
+
+
+# True if some feature of layer "a" intersects some feature of layer "b" (both in the same coordinate system, order of the layers doesn't matter):
+# 1. empty layers and layers with disjoint extents don't overlap,
+# 2. features of the layer with fewer features are the candidates, candidates outside the extent of the other layer are skipped,
+# 3. each remaining candidate is the spatial filter of a cursor on the other layer (spatial index is used) and only the first row is read;
+# ArcGIS Pro versions without spatial filter of cursors use SelectLayerByLocation as before
+def layers_overlap(a, b):
+    key = ("overlap",) + tuple(sorted([str(a), str(b)]))
+    if key in _validation:
+        return _validation[key]
+    count_a = int(arcpy.management.GetCount(a).getOutput(0))
+    count_b = int(arcpy.management.GetCount(b).getOutput(0))
+    if count_a > count_b:
+        a, b = b, a
+    extent_b = arcpy.Describe(b).extent
+    result = False
+    if (count_a > 0) and (count_b > 0) and not extents_disjoint(arcpy.Describe(a).extent, extent_b):
+        try:
+            with arcpy.da.SearchCursor(a, ["SHAPE@"]) as candidates:
+                for row in candidates:
+                    if (row[0] is None) or extents_disjoint(row[0].extent, extent_b):
+                        continue
+                    with arcpy.da.SearchCursor(b, ["OID@"], spatial_filter=row[0], spatial_relationship="INTERSECTS") as cursor:
+                        if next(cursor, None) is not None:
+                            result = True
+                            break
+        except TypeError:
+            selection = arcpy.management.SelectLayerByLocation(b, "INTERSECT", a)
+            result = int(selection[2]) > 0
+            arcpy.management.SelectLayerByAttribute(b, "CLEAR_SELECTION")
+    _validation[key] = result
+    return result
+
+
+# main coordinate system of the output: projected coordinate system selected by user ("cor_sys_string" from the tool's parameter),
+# otherwise the first projected coordinate system of "candidates" - list of pairs (spatial reference, description of the layer) in the order of priority,
+# otherwise WGS84 Web Mercator (Auxiliary Sphere); if "meter" is True, only projected coordinate systems with meter as their unit are appropriate
+def main_coordinate_system(cor_sys_string, candidates, meter=True):
+    if (cor_sys_string[:6] == "PROJCS") and ((not meter) or ('UNIT["Meter",1.0]' in cor_sys_string)):
+        cor_sys = arcpy.SpatialReference()
+        cor_sys.loadFromString(cor_sys_string)
+        arcpy.AddMessage(f"You selected this projected coordinate system for the output: {cor_sys.name}")
+        return cor_sys
+    for spref, description in candidates:
+        if (spref.type == "Projected") and ((not meter) or (spref.linearUnitName == "Meter")):
+            arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of {description} {spref.name} will be used.")
+            return spref
+    cor_sys = arcpy.SpatialReference(3857)
+    arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
+    return cor_sys
+
+
+# exclusive lock of the cache folder "folder" for the time of writing into the cache: the file "tn_cache.lock" is created only if it doesn't exist,
+# otherwise the run waits until the other run (e.g. another job of the batch runner with the same cache) deletes it;
+# the lock older than "stale" seconds was left by a crashed run, so it is deleted
+@contextlib.contextmanager
+def cache_lock(folder, stale=21600):
+    path = os.path.join(folder, "tn_cache.lock")
+    while True:
+        try:
+            handle = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) > stale:
+                    os.remove(path)
+                    continue
+            except OSError:
+                continue
+            time.sleep(1)
+    try:
+        os.write(handle, str(os.getpid()).encode())
+        yield
+    finally:
+        os.close(handle)
+        os.remove(path)
+
+
+# geodatabase of the persistent cache of the toolbox: "tn_cache.gdb" in the folder from environment variable TN_CACHE_DIR,
+# or in the folder "tn_cache" in the temporary folder of the user; it is created when it doesn't exist
+def cache_workspace():
+    folder = os.environ.get("TN_CACHE_DIR", os.path.join(tempfile.gettempdir(), "tn_cache"))
+    if not arcpy.Exists(os.path.join(folder, "tn_cache.gdb")):
+        os.makedirs(folder, exist_ok=True)
+        with cache_lock(folder):
+            if not arcpy.Exists(os.path.join(folder, "tn_cache.gdb")):
+                arcpy.management.CreateFileGDB(folder, "tn_cache.gdb")
+    return os.path.join(folder, "tn_cache.gdb")
+
+
+# writes "data" (dictionary for json file or numpy arrays for .npz file) into the file "path" in the cache: first into a temporary file
+# and then it replaces "path" at once, so an interrupted run never leaves a half-written file
+def write_cache_file(path, data):
+    temporary = os.path.splitext(path)[0] + f"_{os.getpid()}.tmp" + os.path.splitext(path)[1]
+    if path.endswith(".npz"):
+        numpy.savez(temporary, **data)
+    else:
+        with open(temporary, "w") as file:
+            json.dump(data, file, indent=2)
+    os.replace(temporary, path)
+
+
+# stamp of the content of the layer: modification time of its file (shapefile) or of the newest file of its geodatabase,
+# number of features (selection of the layer is respected) and selected features; when the layer is edited, the stamp changes
+def layer_stamp(layer):
+    desc = arcpy.Describe(layer)
+    path = desc.catalogPath
+    while path and not os.path.exists(path):
+        path = os.path.dirname(path)
+    if os.path.isdir(path):
+        modified = max([os.path.getmtime(os.path.join(path, f)) for f in os.listdir(path)] + [os.path.getmtime(path)])
+    elif path:
+        modified = os.path.getmtime(path)
+    else:
+        modified = 0
+    count = arcpy.management.GetCount(layer)[0]
+    return f"{modified}|{count}|{getattr(desc, 'FIDSet', '')}"
+
+
+# maximum age (in seconds) of reprojected layers in the cache: layers which no run used for longer time are deleted from the cache
+# by "reproject"; it is set in days by environment variable TN_CACHE_MAX_AGE, 30 days by default
+def cache_max_age():
+    return float(os.environ.get("TN_CACHE_MAX_AGE", "30")) * 86400
+
+
+# projects "layer" (with spatial reference "spref") into the main coordinate system "cor_sys", "description" is used in the message;
+# if the layer already is in this system, it is returned as it is, otherwise the path of the reprojected layer in the cache is returned
+# (layers "reprj_..." in "tn_cache.gdb", see "cache_workspace"): the reprojected layer is identified by the path of the source layer
+# and the target coordinate system, and it is projected again only when the stamp of the source layer (see "layer_stamp") changes,
+# the old version of the layer is deleted first; the reprojected layers in the cache are only read by the scripts, they must not be edited;
+# the cache is locked (see "cache_lock") while the index is read and the layer is projected, the entry of the layer is removed from the index
+# before Project and added again only after Project succeeded, so an interrupted run never leaves an entry of a half-written layer;
+# reprojected layers which were not used for longer than "cache_max_age" are deleted, so the cache doesn't grow without limit
+def reproject(layer, spref, cor_sys, description):
+    if spref.factoryCode == cor_sys.factoryCode:
+        return layer
+    cache = cache_workspace()
+    target = cor_sys.factoryCode if cor_sys.factoryCode else cor_sys.exportToString()
+    name = "reprj_" + hashlib.sha1(f"{arcpy.Describe(layer).catalogPath}|{target}".encode()).hexdigest()[:16]
+    stamp = layer_stamp(layer)
+
+    # "stamps" is a dictionary name of reprojected layer: [stamp of its source layer, time of its last use], it is saved in "reprojected.json"
+    # next to the cache gdb (entries of older versions of the toolbox are only stamps without time, they are treated as unused)
+    stamps_file = os.path.join(os.path.dirname(cache), "reprojected.json")
+    with cache_lock(os.path.dirname(cache)):
+        stamps = {}
+        if os.path.exists(stamps_file):
+            with open(stamps_file) as file:
+                stamps = json.load(file)
+        stamps = dict((key, value if isinstance(value, list) else [value, 0]) for key, value in stamps.items())
+
+        # eviction of reprojected layers which were not used for longer than the maximum age
+        now = time.time()
+        expired = [key for key in stamps if (key != name) and (now - stamps[key][1] > cache_max_age())]
+        for key in expired:
+            if arcpy.Exists(os.path.join(cache, key)):
+                arcpy.management.Delete(os.path.join(cache, key))
+            del stamps[key]
+        if expired:
+            write_cache_file(stamps_file, stamps)
+            arcpy.AddMessage(f"{len(expired)} reprojected layers unused for more than {cache_max_age() / 86400:g} days deleted from the cache")
+
+        if (name in stamps) and (stamps[name][0] == stamp) and arcpy.Exists(os.path.join(cache, name)):
+            stamps[name][1] = now
+            write_cache_file(stamps_file, stamps)
+            arcpy.AddMessage(f"{description} reprojected from {spref.factoryCode} to {cor_sys.factoryCode} was taken from the cache")
+        else:
+            if name in stamps:
+                del stamps[name]
+                write_cache_file(stamps_file, stamps)
+            # the old version of the layer (its source has changed) or a half-written layer of an interrupted run is deleted
+            if arcpy.Exists(os.path.join(cache, name)):
+                arcpy.management.Delete(os.path.join(cache, name))
+            arcpy.management.Project(layer, os.path.join(cache, name), cor_sys)
+            stamps[name] = [stamp, now]
+            write_cache_file(stamps_file, stamps)
+            arcpy.AddMessage(f"{description} was reprojected from {spref.factoryCode} to {cor_sys.factoryCode}")
+    return os.path.join(cache, name)
+
+
+# clipped hexagon grid "output" (in the current workspace) for the "area" layer, hexagons of the size "size" (e.g. "5 SquareKilometers")
+# in the main coordinate system "cor_sys" (it has to be set in arcpy.env.outputCoordinateSystem): the grid is generated and clipped by area
+# only the first time, then it is kept in the cache (layers "hex_..." in "tn_cache.gdb", see "cache_workspace") and only copied;
+# the grid in the cache is identified by the hash of the geometries of area, the size and the coordinate system
+def hexagon_grid(area, size, cor_sys, output="hex_gr"):
+    digest = hashlib.sha1()
+    with arcpy.da.SearchCursor(area, ["SHAPE@WKB"]) as cursor:
+        for row in cursor:
+            digest.update(bytes(row[0]))
+    digest.update(size.encode())
+    digest.update(str(cor_sys.factoryCode if cor_sys.factoryCode else cor_sys.exportToString()).encode())
+    cached = os.path.join(cache_workspace(), "hex_" + digest.hexdigest()[:16])
+
+    # the cache is locked, so the grid is never copied from the cache while another run writes it
+    with cache_lock(os.path.dirname(os.path.dirname(cached))):
+        if arcpy.Exists(cached):
+            arcpy.management.CopyFeatures(cached, output)
+            arcpy.AddMessage("Hexagonal grid clipped by area was taken from the cache")
+        else:
+            arcpy.management.GenerateTessellation("hex_grid", area, "HEXAGON", size)
+            arcpy.AddMessage("Hexagonal grid generated")
+            arcpy.analysis.Clip("hex_grid", area, output)
+            arcpy.AddMessage("Clipped")
+            arcpy.management.CopyFeatures(output, cached)
+
+
+# lattice of the generated hexagon grid "hex_layer" (see "hex_lattice" module) and axial coordinates of its hexagons;
+# returns tuple (lattice, ids, q, r), "ids" are OBJECTIDs of hexagons and "q", "r" their axial coordinates (from label points,
+# they lie inside the hexagon also when it is clipped by area); the lattice is taken from the hexagon with the largest area,
+# if it is not a complete regular hexagon (the whole area is smaller than one hexagon), None is returned and the overlay has to be used
+def grid_lattice(hex_layer="hex_gr"):
+    ids = []
+    points = []
+    largest = None
+    with arcpy.da.SearchCursor(hex_layer, ["OID@", "SHAPE@"]) as cursor:
+        for oid, shape in cursor:
+            ids.append(oid)
+            points.append((shape.labelPoint.X, shape.labelPoint.Y))
+            if (largest is None) or (shape.area > largest.area):
+                largest = shape
+    if (largest is None) or (largest.partCount != 1):
+        return None
+    vertices = numpy.array([(p.X, p.Y) for p in largest.getPart(0) if p])
+    if len(vertices) != 7:
+        return None
+    lattice = hex_lattice.lattice_from_hexagon(vertices)
+    if abs(largest.area - 2 * numpy.sqrt(3) * lattice["apothem"] ** 2) > 0.001 * largest.area:
+        return None
+    points = numpy.array(points)
+    q, r = hex_lattice.axial(lattice, points[:, 0], points[:, 1])
+    return lattice, ids, q, r
+
+
+# sums of lengths of lines of the layer "lines" (only features matching "where", if it is set) in hexagons of the grid from "grid_lattice";
+# returns dictionary OBJECTID of hexagon: length, hexagons without lines are not in the dictionary (like hexagons without join in JoinField);
+# in tiled mode ("tiles" from "hexagon_tiles" of "hex_layer") only the lines which intersect the hexagons of one tile are loaded at once
+# and only their pieces in these hexagons are summed, so the lines crossing more tiles are not counted twice
+def lattice_lengths(lines, grid, where=None, tiles=None, hex_layer="hex_gr"):
+    lattice, ids, q, r = grid
+    if tiles is None:
+        segments = [numpy.zeros((0, 4))]
+        with arcpy.da.SearchCursor(lines, ["SHAPE@"], where) as cursor:
+            for row in cursor:
+                if row[0] is not None:
+                    segments.append(box_counting.polyline_segments(row[0]))
+        sums, present = hex_lattice.hexagon_lengths(lattice, numpy.vstack(segments), q, r)
+        return dict((ids[k], float(sums[k])) for k in numpy.flatnonzero(present))
+
+    position = dict((ids[k], k) for k in range(len(ids)))
+    oid = arcpy.Describe(hex_layer).OIDFieldName
+    lengths = {}
+    for tile in tiles:
+        arcpy.management.MakeFeatureLayer(lines, "tile_lines", where)
+        arcpy.management.MakeFeatureLayer(hex_layer, "tile_hex", f"{oid} IN ({','.join(str(k) for k in tile)})")
+        selection = arcpy.management.SelectLayerByLocation("tile_lines", "INTERSECT", "tile_hex")
+        if int(selection[2]) > 0:
+            segments = [numpy.zeros((0, 4))]
+            with arcpy.da.SearchCursor("tile_lines", ["SHAPE@"]) as cursor:
+                for row in cursor:
+                    if row[0] is not None:
+                        segments.append(box_counting.polyline_segments(row[0]))
+            keys = [position[k] for k in tile if k in position]
+            sums, present = hex_lattice.hexagon_lengths(lattice, numpy.vstack(segments), q[keys], r[keys])
+            lengths.update((ids[keys[k]], float(sums[k])) for k in numpy.flatnonzero(present))
+        arcpy.management.Delete(["tile_lines", "tile_hex"])
+    return lengths
+
+
+# adds fields of type DOUBLE to the layer and loads their values in one pass, "values" is a dictionary
+# name of field: dictionary OBJECTID: value (features which are not in the dictionary have empty value)
+def write_fields(layer, values):
+    names = list(values)
+    arcpy.management.AddFields(layer, [[name, "DOUBLE"] for name in names])
+    with arcpy.da.UpdateCursor(layer, ["OID@"] + names) as cursor:
+        for row in cursor:
+            for k in range(len(names)):
+                row[k+1] = values[names[k]].get(row[0])
+            cursor.updateRow(row)
+
+
+# tiled processing mode for continent-scale inputs: hexagons/polygons of "hex_layer" are divided into square tiles with side "tile_size"
+# (in units of the coordinate system) by their centroids, so each hexagon belongs to exactly one tile and the boundary of the tile follows
+# the edges of hexagons; returns list of tiles, each tile is a list of OBJECTIDs of its hexagons
+def hexagon_tiles(hex_layer, tile_size):
+    tiles = {}
+    with arcpy.da.SearchCursor(hex_layer, ["OID@", "SHAPE@XY"]) as cursor:
+        for oid, (x, y) in cursor:
+            tiles.setdefault((int(x // tile_size), int(y // tile_size)), []).append(oid)
+    return [tiles[key] for key in sorted(tiles)]
+
+
+# values of the piece of polygon proportional to its area, "row" is (values of the original polygon..., area of the original polygon, area of the piece),
+# e.g. population of more years in the piece of population grid square (empty value is 0); None if the original area is 0
+def proportional_values(row):
+    if not row[-2]:
+        return None
+    return [0 if v is None else v / row[-2] * row[-1] for v in row[:-2]]
+
+
+# sums of values of the pieces of "layer" in hexagons "ids" of one tile ("task" is a tuple (layer, hex_layer, ids, fields, value), see "tiled_sums"):
+# features of "layer" which intersect the hexagons of the tile are selected, intersected with these hexagons ("tile_isect" in the current workspace)
+# and the values of the pieces are summed in one pass of the cursor; returns dictionary OBJECTID of hexagon: sum
+def tile_sums(task):
+    layer, hex_layer, ids, fields, value = task
+    oid = arcpy.Describe(hex_layer).OIDFieldName
+    sums = {}
+    arcpy.management.MakeFeatureLayer(layer, "tile_layer")
+    arcpy.management.MakeFeatureLayer(hex_layer, "tile_hex", f"{oid} IN ({','.join(str(k) for k in ids)})")
+    # tile without any feature is skipped (layer without selection would be processed whole)
+    selection = arcpy.management.SelectLayerByLocation("tile_layer", "INTERSECT", "tile_hex")
+    if int(selection[2]) > 0:
+        arcpy.analysis.Intersect(["tile_layer", "tile_hex"], "tile_isect", "ALL")
+        # OBJECTIDs of hexagons are in the field "FID_tile_hex" (FID_ + name of the input layer)
+        with arcpy.da.SearchCursor("tile_isect", ["FID_tile_hex"] + fields) as cursor:
+            for row in cursor:
+                piece = row[1] if value is None else value(row[1:])
+                if piece is not None:
+                    sums[row[0]] = sums.get(row[0], 0) + numpy.asarray(piece, dtype=float)
+        arcpy.management.Delete("tile_isect")
+    arcpy.management.Delete(["tile_layer", "tile_hex"])
+    return sums
+
+
+# initializer of the worker processes of "tiled_sums": each worker has its own scratch geodatabase in "folder",
+# so the intermediate layers with fixed names ("tile_isect", ...) don't collide between the workers
+def _tile_worker(folder):
+    name = f"tile_{os.getpid()}.gdb"
+    arcpy.management.CreateFileGDB(folder, name)
+    arcpy.env.workspace = os.path.join(folder, name)
+    arcpy.env.overwriteOutput = True
+
+
+# sums of values of the pieces of "layer" in hexagons of "hex_layer" computed tile by tile ("tiles" from "hexagon_tiles"), so the size of intermediate
+# layers depends on the size of tiles, not on the size of inputs; "fields" are fields of the pieces read by the cursor (e.g. "SHAPE@LENGTH"),
+# "value" is a function of this module which returns the value of the piece from the row of these fields (None is skipped), by default the first field,
+# or a list of values (then the sums are numpy arrays);
+# with more "workers" the tiles are processed in parallel processes: the tasks are in a queue from the biggest tile (most hexagons) to the smallest
+# and each worker takes the next task when it finishes the previous one, so dense tiles don't wait behind empty ones, and the results are merged
+# when they come; layers in memory can't be read by other processes, so then the tiles are processed in this process
+# returns dictionary OBJECTID of hexagon: sum (like "lattice_lengths")
+def tiled_sums(layer, hex_layer, tiles, fields, value=None, workers=1):
+    if (workers > 1) and (arcpy.env.workspace == "memory"):
+        arcpy.AddMessage("Intermediate layers are in memory, so the tiles are processed in one process")
+        workers = 1
+    tasks = [(arcpy.Describe(layer).catalogPath, arcpy.Describe(hex_layer).catalogPath, ids, fields, value) for ids in sorted(tiles, key=len, reverse=True)]
+    sums = {}
+    folder = None
+    if workers > 1:
+        folder = tempfile.mkdtemp(prefix="tn_tiles_")
+        pool = process_pool(workers, _tile_worker, (folder,))
+        results = pool.imap_unordered(tile_sums, tasks)
+    else:
+        results = (tile_sums(task) for task in tasks)
+    n = 0
+    for result in results:
+        for key in result:
+            sums[key] = sums.get(key, 0) + result[key]
+        n += 1
+        arcpy.AddMessage(f"Tile {n}/{len(tasks)} processed")
+    if folder is not None:
+        pool.close()
+        pool.join()
+        shutil.rmtree(folder, ignore_errors=True)
+    return sums
+
+
+# cross-tabulation of the pieces of "layer" (e.g. Intersect of Urban Atlas and hexagons) in one pass of the cursor: area of the pieces summed
+# by the hexagon (OBJECTID in the field "fid") and by the class (field "class_field", e.g. "code_2018"), so the area of any combination of classes
+# in a hexagon is a sum of columns without another overlay; "fields" and "value" are as in "tiled_sums" (e.g. population of the pieces) and the values
+# are summed by the hexagon in the same pass; returns dictionary class: dictionary OBJECTID of hexagon: area and dictionary OBJECTID of hexagon: sum
+def class_areas(layer, fid, class_field, fields=(), value=None):
+    areas = {}
+    sums = {}
+    with arcpy.da.SearchCursor(layer, [fid, class_field, "SHAPE@AREA"] + list(fields)) as cursor:
+        for row in cursor:
+            if row[1] is not None:
+                column = areas.setdefault(str(row[1]), {})
+                column[row[0]] = column.get(row[0], 0) + row[2]
+            if value is not None:
+                piece = value(row[3:])
+                if piece is not None:
+                    sums[row[0]] = sums.get(row[0], 0) + numpy.asarray(piece, dtype=float)
+    return areas, sums
+
+
+# sum of the columns "classes" of the cross-tabulation from "class_areas" (classes which are not in the cross-tabulation are skipped);
+# returns dictionary OBJECTID of hexagon: area, only hexagons with some of the classes
+def class_sum(areas, classes):
+    total = {}
+    for name in classes:
+        for oid, area in areas.get(name, {}).items():
+            total[oid] = total.get(oid, 0) + area
+    return total
+
+
+# regular square lattice of GEOSTAT population grid: the squares are recognized from field "GRD_ID" (e.g. "1kmN2599E4695"
+# or "CRS3035RES1000mN2599000E4695000" - size of the square and its lower left corner) and the geometries of the first 100 squares are checked,
+# so the grid reprojected into another coordinate system (squares are not squares anymore) or other polygons are not recognized;
+# returns dictionary "size" - side of the squares, "cells" - dictionary (i, j): OBJECTID of the square with the lower left corner (i * size, j * size),
+# or None if "source" is not such lattice
+def square_lattice(source):
+    if "GRD_ID" not in [f.name for f in arcpy.ListFields(source)]:
+        return None
+    pattern = re.compile(r"(?:CRS\d+RES(\d+)m|(\d+)(k?m))N(\d+)E(\d+)$")
+    size = None
+    cells = {}
+    # only attributes are read, the geometry only for the first 100 squares
+    with arcpy.da.SearchCursor(source, ["OID@", "GRD_ID"]) as cursor:
+        for oid, grd_id in cursor:
+            match = pattern.match(grd_id or "")
+            if match is None:
+                return None
+            factor = 1000 if match.group(3) == "km" else 1
+            cell_size = int(match.group(1) or match.group(2)) * factor
+            if size is None:
+                size = cell_size
+            elif cell_size != size:
+                return None
+            cells[(int(match.group(5)) * factor // size, int(match.group(4)) * factor // size)] = oid
+    if size is None:
+        return None
+    with arcpy.da.SearchCursor(source, ["GRD_ID", "SHAPE@"]) as cursor:
+        for grd_id, shape in itertools.islice(cursor, 100):
+            match = pattern.match(grd_id)
+            factor = 1000 if match.group(3) == "km" else 1
+            x, y = int(match.group(5)) * factor, int(match.group(4)) * factor
+            if (shape is None) or (abs(shape.area - size * size) > 1e-6 * size * size) or (abs(shape.extent.XMin - x) > 1e-3 * size) or (abs(shape.extent.YMin - y) > 1e-3 * size):
+                return None
+    return {"size": size, "cells": cells}
+
+
+# areal-weighting matrix of the square lattice "squares" (from "square_lattice") and the generated hexagon grid "target" (its lattice "grid"
+# from "grid_lattice") computed in closed form:
+# squares under each complete hexagon are found from the range of their indices and their overlaps are computed analytically (see "hex_lattice" module),
+# only hexagons clipped by area are intersected with their squares by arcpy geometries; returns the matrix in the same form as "areal_weights"
+def lattice_weights(squares, target, grid):
+    size = squares["size"]
+    cells = squares["cells"]
+    full_area = 2 * numpy.sqrt(3) * grid[0]["apothem"] ** 2
+    rows, cols, fractions = [], [], []
+    with arcpy.da.SearchCursor(target, ["OID@", "SHAPE@"]) as cursor:
+        for oid, shape in cursor:
+            vertices = numpy.array([(p.X, p.Y) for p in shape.getPart(0) if p]) if shape.partCount == 1 else numpy.zeros((0, 2))
+            if (len(vertices) == 7) and (abs(shape.area - full_area) <= 0.001 * full_area):
+                i, j, fraction = hex_lattice.square_overlaps(vertices, size)
+            else:
+                # hexagon clipped by area: each square in the range of indices under it is clipped by its geometry
+                i, j, fraction = [], [], []
+                for a in range(int(shape.extent.XMin // size), int(shape.extent.XMax // size) + 1):
+                    for b in range(int(shape.extent.YMin // size), int(shape.extent.YMax // size) + 1):
+                        if (a, b) in cells:
+                            square = arcpy.Polygon(arcpy.Array([arcpy.Point(a * size, b * size), arcpy.Point((a + 1) * size, b * size),
+                                                                 arcpy.Point((a + 1) * size, (b + 1) * size), arcpy.Point(a * size, (b + 1) * size)]), shape.spatialReference)
+                            overlap = shape.intersect(square, 4).area
+                            if overlap > 0:
+                                i.append(a)
+                                j.append(b)
+                                fraction.append(overlap / (size * size))
+            for a, b, f in zip(i, j, fraction):
+                if (int(a), int(b)) in cells:
+                    rows.append(oid)
+                    cols.append(cells[(int(a), int(b))])
+                    fractions.append(f)
+    return {"rows": numpy.array(rows, dtype=numpy.int64), "cols": numpy.array(cols, dtype=numpy.int64), "fractions": numpy.array(fractions)}
+
+
+# sparse areal-weighting matrix (target polygons x source polygons) in coordinate form: "rows" - OBJECTIDs of polygons of "target" (e.g. "hex_gr"),
+# "cols" - OBJECTIDs of polygons of "source" (e.g. population grid), "fractions" - area of their overlap divided by the area of the source polygon;
+# the source polygons which intersect the target are intersected with it only once and the matrix is saved in the cache folder (see "cache_workspace")
+# as "weights_<hash>.npz", identified by the path and the stamp of the source (see "layer_stamp") and by OBJECTIDs and centroids of the target polygons,
+# so the same grid over the same source layer is taken from the cache in the next runs
+def areal_weights(source, target):
+    digest = hashlib.sha1(f"{arcpy.Describe(source).catalogPath}|{layer_stamp(source)}".encode())
+    with arcpy.da.SearchCursor(target, ["OID@", "SHAPE@XY"]) as cursor:
+        digest.update(numpy.array([(oid, x, y) for oid, (x, y) in cursor], dtype=float).tobytes())
+    path = os.path.join(os.path.dirname(cache_workspace()), "weights_" + digest.hexdigest()[:16] + ".npz")
+    if os.path.exists(path):
+        with numpy.load(path) as cached:
+            arcpy.AddMessage("Areal weights of the grids were taken from the cache")
+            return {"rows": cached["rows"], "cols": cached["cols"], "fractions": cached["fractions"]}
+
+    # GEOSTAT grid in the coordinate system of the output and the generated hexagon grid: overlaps are computed in closed form
+    grid = grid_lattice(target)
+    squares = square_lattice(source) if grid is not None else None
+    if squares is not None:
+        weights = lattice_weights(squares, target, grid)
+        write_cache_file(path, weights)
+        arcpy.AddMessage(f"Areal weights of the regular population grid and hexagons calculated analytically ({len(weights['rows'])} overlaps) and saved into the cache")
+        return weights
+
+    selection = arcpy.management.SelectLayerByLocation(source, "INTERSECT", target)
+    areas = {}
+    with arcpy.da.SearchCursor(selection[0], ["OID@", "SHAPE@AREA"]) as cursor:
+        for oid, area in cursor:
+            areas[oid] = area
+    arcpy.analysis.Intersect([selection[0], target], "weights_isect", "ONLY_FID")
+    arcpy.management.SelectLayerByAttribute(selection[0], "CLEAR_SELECTION")
+    # OBJECTIDs of source polygons are in the first "FID_" field, of target polygons in the last one
+    fids = [f.name for f in arcpy.ListFields("weights_isect") if f.name.startswith("FID_")]
+    rows, cols, fractions = [], [], []
+    with arcpy.da.SearchCursor("weights_isect", [fids[-1], fids[0], "SHAPE@AREA"]) as cursor:
+        for row in cursor:
+            if areas.get(row[1]):
+                rows.append(row[0])
+                cols.append(row[1])
+                fractions.append(row[2] / areas[row[1]])
+    arcpy.management.Delete("weights_isect")
+    weights = {"rows": numpy.array(rows, dtype=numpy.int64), "cols": numpy.array(cols, dtype=numpy.int64), "fractions": numpy.array(fractions)}
+    write_cache_file(path, weights)
+    arcpy.AddMessage(f"Areal weights of the grids calculated ({len(rows)} overlaps) and saved into the cache")
+    return weights
+
+
+# values of "fields" of polygons of "source" interpolated into the target polygons by the matrix "weights" from "areal_weights":
+# matrix product, the value of the target polygon is the sum of the fractions multiplied by the values of the source polygons (empty values are skipped);
+# "fields" is one field or a list of fields (e.g. population of more years), all of them are read in one pass of the cursor into one matrix
+# and multiplied by the same weights; returns dictionary OBJECTID of target polygon: value (for a list of fields dictionary field: such dictionary),
+# polygons without overlap are not in the dictionary (like JoinField)
+def interpolate(weights, source, fields):
+    names = [fields] if isinstance(fields, str) else list(fields)
+    oids = []
+    values = []
+    with arcpy.da.SearchCursor(source, ["OID@"] + names) as cursor:
+        for row in cursor:
+            oids.append(row[0])
+            values.append([numpy.nan if v is None else v for v in row[1:]])
+    oids = numpy.array(oids, dtype=numpy.int64)
+    values = numpy.array(values, dtype=float).reshape(len(oids), len(names))
+    order = numpy.argsort(oids)
+    position = numpy.minimum(numpy.searchsorted(oids[order], weights["cols"]), max(len(oids) - 1, 0))
+    found = (oids[order][position] == weights["cols"]) if len(oids) else numpy.zeros(len(weights["cols"]), dtype=bool)
+    targets, index = numpy.unique(weights["rows"], return_inverse=True)
+    # rows of the matrix of values in the order of the overlaps, all columns at once
+    columns = numpy.nan_to_num(values[order][position[found]]) * weights["fractions"][found][:, None]
+    result = {}
+    for k in range(len(names)):
+        sums = numpy.bincount(index[found], weights=columns[:, k], minlength=len(targets))
+        result[names[k]] = dict(zip(targets.tolist(), sums.tolist()))
+    return result[fields] if isinstance(fields, str) else result
+
+
+# estimated size (MB) of intermediate layers created from "layers" (empty strings are skipped): average size of the first 1000 features
+# (16 bytes per vertex and 200 bytes for attributes) multiplied by the number of features and by 4 (clipped, exported, intersected and dissolved copies)
+def estimated_size(layers):
+    total = 0
+    for layer in layers:
+        if layer == "":
+            continue
+        count = int(arcpy.management.GetCount(layer)[0])
+        sample = 0
+        n = 0
+        with arcpy.da.SearchCursor(layer, ["SHAPE@"]) as cursor:
+            for row in itertools.islice(cursor, 1000):
+                n += 1
+                sample += 200 + 16 * (row[0].pointCount if row[0] is not None else 0)
+        if n > 0:
+            total += sample / n * count
+    return total * 4 / 1048576
+
+
+# workspace for intermediate layers: "memory" if user allowed it ("use_memory" is "true") and the estimated size of intermediate layers
+# created from "layers" fits into "budget" (MB), otherwise "workspace" on the disk (fallback when the memory isn't enough);
+# arcpy.env.workspace is set to the returned workspace
+def intermediate_workspace(workspace, use_memory, budget, layers):
+    if use_memory == "true":
+        size = estimated_size(layers)
+        if size <= budget:
+            arcpy.env.workspace = "memory"
+            arcpy.AddMessage(f"Intermediate layers are kept in memory (estimated size {size:.0f} MB)")
+            return "memory"
+        arcpy.AddMessage(f"Estimated size of intermediate layers ({size:.0f} MB) exceeds the memory budget ({budget:.0f} MB), they are saved on the disk")
+    arcpy.env.workspace = workspace
+    return workspace
+
+
+# if intermediate layers are in memory ("workspace" is "memory"), the output layer "name" is copied into "disk_workspace",
+# the memory is cleared and arcpy.env.workspace is set back to "disk_workspace"; returns "disk_workspace"
+def persist_output(name, workspace, disk_workspace):
+    if workspace == "memory":
+        arcpy.management.CopyFeatures("memory" + chr(92) + name, disk_workspace + chr(92) + name)
+        arcpy.management.Delete("memory")
+        arcpy.env.workspace = disk_workspace
+    return disk_workspace
+
+
+# deletes intermediate layers "names" from the current workspace, layers which don't exist (they were in memory or weren't created) are skipped
+def delete_layers(names):
+    names = [name for name in names if arcpy.Exists(name)]
+    if names:
+        arcpy.management.Delete(names)
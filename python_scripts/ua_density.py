@@ -13,12 +13,15 @@
 # Created:     24.01.2022
 #-------------------------------------------------------------------------------
 
-# import library arcpy and allow overwriting features with the same name
+# import library arcpy and "tn_core" module of this toolbox and allow overwriting features with the same name
 import arcpy
+import tn_core
 arcpy.env.overwriteOutput = True
 
 def main():
     arcpy.AddMessage("The script has started!")
+    # results of the input checks of the previous run are forgotten (see "tn_core" module)
+    tn_core.reset_validation()
 
     # getting inputs from parameters in tool's interface
     data = arcpy.GetParameterAsText(0)
@@ -46,11 +49,9 @@ def main():
     if desc.shapeType == "Polygon":
         for i in fields:
             if (i.name == 'code_2018') and (i.type == 'String'):
-                with arcpy.da.SearchCursor(data, i.name) as cursor:
-                    for row in cursor:
-                        if (int(row[0]) > 12209) and (int(row[0]) < 12401):
-                            check_d += 1
-                            break
+                # where-clause probe, only the first ti feature is read (see "tn_core" module); codes have 5 digits, so they can be compared as text
+                if tn_core.has_rows(data, "code_2018 > '12209' And code_2018 < '12401'"):
+                    check_d += 1
             if (i.name == 'Pop2018') and (i.type == 'Integer'):
                 check_d += 1
 
@@ -65,7 +66,7 @@ def main():
 
     # if it doesn't meet the requirements, script is ended
     if check_d < 3:
-        del data, area, size, workspace, cor_sys_string, desc, fields, i, cursor, row, check_d, ti_types, area_name, hex_or_own, own_layer
+        del data, area, size, workspace, cor_sys_string, desc, fields, i, check_d, ti_types, area_name, hex_or_own, own_layer
         arcpy.AddError("Your data is not suitable for this script.")
     else:
         arcpy.AddMessage("Your data layer is OK.")
@@ -79,8 +80,11 @@ def main():
             arcpy.management.CreateFileGDB(workspace, "working.gdb")
             workspace = workspace + chr(92) + "working.gdb"
 
-        # setting of workspace in environments
-        arcpy.env.workspace = workspace
+        # setting of workspace in environments: intermediate layers can be kept in memory instead of the disk (optional parameters:
+        # "true" to use memory and the memory budget in MB), if their estimated size is bigger than the budget, the disk is used (see "tn_core" module);
+        # "disk_workspace" is the workspace on the disk where the output is saved
+        disk_workspace = workspace
+        workspace = tn_core.intermediate_workspace(workspace, tn_core.optional_parameter(12, "false"), float(tn_core.optional_parameter(13, "2048")), [data, area, own_layer])
 
         # checking and setting the main coordinate system and projecting data into it
         data_spref = arcpy.Describe(data).spatialReference
@@ -89,93 +93,55 @@ def main():
             own_layer_spref = arcpy.Describe(own_layer).spatialReference
 
         # if user selected projected coordinate system with meter as its unit, it is set as the main coordinate system
-        if (cor_sys_string[:6] == "PROJCS") and ('UNIT["Meter",1.0]' in cor_sys_string):
-            cor_sys = arcpy.SpatialReference()
-            cor_sys.loadFromString(cor_sys_string)
-            arcpy.AddMessage(f"You selected this projected coordinate system for the output: {cor_sys.name}")
         # if user selected geographic coordinate system or projected coordinate system with different unit than meter or they selected nothing,
-        # this is the order of setting the main coordinate system:
+        # this is the order of setting the main coordinate system (see "tn_core" module):
         # the coordinate system of their own output layer, the coordinate system of UA data, the system of area, WGS84 Web Mercator (Auxiliary Sphere)
+        if hex_or_own == "true":
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(own_layer_spref, "your output layer"), (data_spref, "UA layer"), (area_spref, "area layer")])
         else:
-            if hex_or_own == "true":
-                if (own_layer_spref.type == "Projected") and (own_layer_spref.linearUnitName == "Meter"):
-                    cor_sys = own_layer_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of your output layer {cor_sys.name} will be used.")
-                elif (data_spref.type == "Projected") and (data_spref.linearUnitName == "Meter"):
-                    cor_sys = data_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of UA layer {cor_sys.name} will be used.")
-                elif (area_spref.type == "Projected") and (area_spref.linearUnitName == "Meter"):
-                    cor_sys = area_spref
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of area layer {cor_sys.name} will be used.")
-                else:
-                    cor_sys = arcpy.SpatialReference(3857)
-                    arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
-            elif (data_spref.type == "Projected") and (data_spref.linearUnitName == "Meter"):
-                cor_sys = data_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of UA layer {cor_sys.name} will be used.")
-            elif (area_spref.type == "Projected") and (area_spref.linearUnitName == "Meter"):
-                cor_sys = area_spref
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system, so coordinate system of area layer {cor_sys.name} will be used.")
-            else:
-                cor_sys = arcpy.SpatialReference(3857)
-                arcpy.AddMessage(f"You didn't select any appropriate coordinate system and systems of input layers weren't appropriate, so {cor_sys.name} coordinate system will be used.")
+            cor_sys = tn_core.main_coordinate_system(cor_sys_string, [(data_spref, "UA layer"), (area_spref, "area layer")])
 
         arcpy.env.outputCoordinateSystem = cor_sys
 
         # if coordinate systems of data is different from the main coordinate system, it is reprojected into that coordinate system
-        if data_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(data, "reprj_data", cor_sys)
-            data = workspace + chr(92) + "reprj_data"
-            arcpy.AddMessage(f"Data layer was reprojected from {data_spref.factoryCode} to {cor_sys.factoryCode}")
+        # (reprojected layers are kept in the cache, so the same layer is not reprojected again in the next runs, see "tn_core" module)
+        data = tn_core.reproject(data, data_spref, cor_sys, "Data layer")
 
         # if coordinate systems of area is different from the main coordinate system, it is reprojected into that coordinate system
-        if area_spref.factoryCode != cor_sys.factoryCode:
-            arcpy.management.Project(area, "reprj_area", cor_sys)
-            area = workspace + chr(92) + "reprj_area"
-            arcpy.AddMessage(f"Area layer was reprojected from {area_spref.factoryCode} to {cor_sys.factoryCode}")
+        area = tn_core.reproject(area, area_spref, cor_sys, "Area layer")
 
         # control of output polygon layer which user selected
         check_a = 0
         if hex_or_own == "true":
             # reprojection into the main coordinate system if necessary
-            if own_layer_spref.factoryCode != cor_sys.factoryCode:
-                arcpy.management.Project(own_layer, "reprj_own_layer", cor_sys)
-                own_layer = workspace + chr(92) + "reprj_own_layer"
-                arcpy.AddMessage(f"Your output layer was reprojected from {own_layer_spref.factoryCode} to {cor_sys.factoryCode}")
+            own_layer = tn_core.reproject(own_layer, own_layer_spref, cor_sys, "Your output layer")
             del own_layer_spref
             # control whether the area layer and the output polygon layer overlap
-            control_selection = arcpy.management.SelectLayerByLocation(own_layer, "INTERSECT", area)
-            if int(control_selection[2]) == 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(own_layer, "CLEAR_SELECTION")
+            # (extents are compared first and only the first intersecting feature is searched, see "tn_core" module)
+            if not tn_core.layers_overlap(own_layer, area):
                 arcpy.AddError("Your output layer and area layer don't overlap.")
-            elif int(control_selection[2]) > 0:
-                control_selection = arcpy.management.SelectLayerByAttribute(own_layer, "CLEAR_SELECTION")
-                # control whether the data and the output polygon layer overlap
-                control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", own_layer)
-                if int(control_selection[2]) > 0:
-                    control_selection = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
-                    check_a += 1
-                    arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
-                else:
-                    arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
+            # control whether the data and the output polygon layer overlap
+            elif tn_core.layers_overlap(data, own_layer):
+                check_a += 1
+                arcpy.AddMessage("Your chosen polygon layer for the output is OK.")
             else:
-                arcpy.AddError("Your chosen polygon layer for the output and area layer don't overlap.")
+                arcpy.AddError("Your chosen polygon layer for the output and data layer don't overlap.")
         else:
             check_a += 1
 
         # control of area layer, whether it is a polygon layer and if it overlaps with UA data
         desc = arcpy.Describe(area)
-        control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", area)
 
         if desc.shapeType == "Polygon":
-            if int(control_selection[2]) == 0:
+            if not tn_core.layers_overlap(data, area):
                 arcpy.AddError("Your data and area layers don't overlap.")
             # if it meets the requirements, UA data is clipped by area and population inside polygons is recalculated based on the area:
             # copy of UA data is created, into this copied layer new field "area_orig" is added, the area of polygons is loaded there,
             # then the copied layer is clipped by area, into this clipped layer new field "P_2018_orig" is added and
             # new population inside polygons is calculated as the original population divided by original area of polygons multiplied by current area of polygons
-            elif int(control_selection[2]) > 0:
+            else:
                 check_a += 1
+                control_selection = arcpy.management.SelectLayerByLocation(data, "INTERSECT", area)
                 arcpy.management.CopyFeatures(control_selection, "data_copy")
                 arcpy.management.AddField("data_copy", "area_orig", "DOUBLE")
                 arcpy.management.CalculateField("data_copy", "area_orig", '!geom_Area!')
@@ -191,7 +157,7 @@ def main():
 
         # if it doesn't meet the requirements, script is ended
         if check_a < 2:
-            del data, area, size, workspace, cor_sys_string, desc, fields, i, cursor, row, control_selection, check_d, check_a, leng, ending
+            del data, area, size, workspace, disk_workspace, cor_sys_string, desc, fields, i, control_selection, check_d, check_a, leng, ending
             del ti_types, area_name, data_spref, area_spref, cor_sys, hex_or_own, own_layer
         else:
             # if user selected their own output layer, it is clipped by area layer, this clipped layer is called "hex_gr"
@@ -205,63 +171,35 @@ def main():
                     size = size.replace("Unknown", "SquareKilometers")
                     arcpy.AddMessage("You selected 'Unknown' as the areal unit, therefore 'Square Kilometers' will be used")
 
-                arcpy.management.GenerateTessellation("hex_grid", area, "HEXAGON", size)
-                arcpy.AddMessage("Hexagon grid generated")
-                arcpy.analysis.Clip("hex_grid", area, "hex_gr")
-                arcpy.AddMessage("Clipped")
+                # the clipped grid is kept in the cache, so it is generated only once for the same area, size and coordinate system (see "tn_core" module)
+                tn_core.hexagon_grid(area, size, cor_sys)
 
-            # adding geometry attribute (area) of polygons to UA data, then intersecting it, adding new field for population and calculating it proportionally to area
-            # and finally dissolving all polygons in one polygon/hexagon and summing the population in one polygon/hexagon
+            # adding geometry attribute (area) of polygons to UA data and intersecting it with "hex_gr" only once, then in one pass through the pieces
+            # the area of each class of land use ("code_2018") in each polygon/hexagon is summed into a wide table and the population of the pieces
+            # is calculated proportionally to area and summed in the same pass, without Dissolve (see "tn_core" module);
+            # population of the piece is P_2018_orig / POLY_AREA * area of the piece (the original script multiplied by "geom_Area", the area of the whole
+            # UA polygon, so a polygon cut by the edges of hexagons gave its whole population to each piece), the values differ from the original outputs
             arcpy.management.AddGeometryAttributes(data, "AREA", "", "SQUARE_METERS")
             arcpy.analysis.Intersect([data, "hex_gr"], "data_isect", "ALL")
-            arcpy.management.AddField("data_isect", "new_pop2018_ua", "DOUBLE")
-            arcpy.management.CalculateField("data_isect", "new_pop2018_ua", '(!P_2018_orig!/!POLY_AREA!)*!geom_Area!')
-            arcpy.management.Dissolve("data_isect", "data_isect_diss", "FID_hex_gr", [["new_pop2018_ua","SUM"]])
-            arcpy.AddMessage("Population in each hexagon calculated from 2018 estimate")
+            areas, population = tn_core.class_areas("data_isect", "FID_hex_gr", "code_2018", ["P_2018_orig", "POLY_AREA", "SHAPE@AREA"], tn_core.proportional_values)
+            arcpy.AddMessage("Population and area of classes in each hexagon calculated from 2018 estimate")
 
             # ti  selected, in UA data there are 5 categories of ti: 12210, 12220, 12230, 12300, 12400
             # (Fast transit roads and associated land, Other roads and associated land, Railways and associated land, Port areas, Airports)
-            # at first, all categories are selected, that's the default in tool's interface
-            selected_features = arcpy.management.SelectLayerByAttribute(data, "NEW_SELECTION", "code_2018 = '12210' Or code_2018 = '12220' Or code_2018 = '12230' Or code_2018 = '12300' Or code_2018 = '12400'")
-            s = 5
-            # and then if certain category is unselected (it is 'false' or ''), it is removed from the default selection
-            if ti_types[0] != 'true':
-                selected_features = arcpy.management.SelectLayerByAttribute(data, "REMOVE_FROM_SELECTION", "code_2018 = '12210'")
-                s -= 1
-            if ti_types[1] != 'true':
-                selected_features = arcpy.management.SelectLayerByAttribute(data, "REMOVE_FROM_SELECTION", "code_2018 = '12220'")
-                s -= 1
-            if ti_types[2] != 'true':
-                selected_features = arcpy.management.SelectLayerByAttribute(data, "REMOVE_FROM_SELECTION", "code_2018 = '12230'")
-                s -= 1
-            if ti_types[3] != 'true':
-                selected_features = arcpy.management.SelectLayerByAttribute(data, "REMOVE_FROM_SELECTION", "code_2018 = '12300'")
-                s -= 1
-            if ti_types[4] != 'true':
-                selected_features = arcpy.management.SelectLayerByAttribute(data, "REMOVE_FROM_SELECTION", "code_2018 = '12400'")
-                s -= 1
+            # the category is included if it is selected in tool's interface ('true'), all categories are selected by default
+            ti_codes = ["12210", "12220", "12230", "12300", "12400"]
+            selected = [ti_codes[k] for k in range(5) if ti_types[k] == 'true']
             # if user accidentally unselected all 5 categories, all 5 will be selected and included in calculation
-            if s == 0:
-                selected_features = arcpy.management.SelectLayerByAttribute(data, "NEW_SELECTION", "code_2018 = '12210' Or code_2018 = '12220' Or code_2018 = '12230' Or code_2018 = '12300' Or code_2018 = '12400'")
-
-            # export of selected ti into a new layer
-            arcpy.conversion.FeatureClassToFeatureClass(selected_features, workspace, "tport_istructure")
-            selected_features = arcpy.management.SelectLayerByAttribute(data, "CLEAR_SELECTION")
-            arcpy.AddMessage("Transport infrastructure selected and exported into a new layer")
-
-            # intersecting (cutting) ti by "hex_gr"
-            arcpy.analysis.Intersect(["tport_istructure", "hex_gr"], "ti_isect", "ONLY_FID")
-            arcpy.AddMessage("Transport infrastructure intersected by hexagons")
-
-            # dissolving (merging, aggregating) ti in the same hexagon, so there will be only one ti feature for each hexagon
-            arcpy.management.Dissolve("ti_isect", "ti_isect_diss", "FID_hex_gr")
-            arcpy.AddMessage("Dissolved")
-
-            # joining ti area and population to "hex_gr"
-            arcpy.management.JoinField("hex_gr", "OBJECTID", "data_isect_diss", "FID_hex_gr", ["SUM_new_pop2018_ua"])
-            arcpy.management.AddField("ti_isect_diss", "ti_area", "DOUBLE")
-            arcpy.management.CalculateField("ti_isect_diss", "ti_area", '!Shape_Area!')
-            arcpy.management.JoinField("hex_gr", "OBJECTID", "ti_isect_diss", "FID_hex_gr", ["ti_area"])
+            if len(selected) == 0:
+                selected = ti_codes
+            arcpy.AddMessage(f"Transport infrastructure selected: {selected}")
+
+            # writing the area of each class ("area_<code_2018>"), population and ti area into "hex_gr": ti area is the sum of columns of the selected categories,
+            # so any other combination of categories can be calculated from the fields "area_<code_2018>" of the output without any overlay
+            values = dict(("area_" + code, areas[code]) for code in sorted(areas))
+            values["SUM_new_pop2018_ua"] = dict((oid, float(population[oid][0])) for oid in population)
+            values["ti_area"] = tn_core.class_sum(areas, selected)
+            tn_core.write_fields("hex_gr", values)
             arcpy.AddMessage("Join of fields successful.")
 
             # creating new fields "tia_percentage" and "tia_per_capita", where the indicators will be calculated
@@ -271,7 +209,7 @@ def main():
             # calculation of new fields:
             # "ti_percentage" is the percentage which ti area covers
             # "tia_per_capita" is ti area in square meters per 1 inhabitant
-            arcpy.management.CalculateField("hex_gr", "tia_percentage", '!ti_area!/!Shape_Area!*100')
+            arcpy.management.CalculateField("hex_gr", "tia_percentage", '!ti_area!/!shape.area!*100')
             arcpy.management.CalculateField("hex_gr", "tia_per_capita", '!ti_area!/!SUM_new_pop2018_ua!')
             arcpy.AddMessage("Indicators calculated")
 
@@ -319,6 +257,9 @@ def main():
             else:
                 area_ending = ""
 
+            # if intermediate layers were in memory, only the output "hex_gr" is copied into the workspace on the disk
+            workspace = tn_core.persist_output("hex_gr", workspace, disk_workspace)
+
             # "v" is version
             v = 0
             # if in the workspace is already a different layer with the same name, version number will be added
@@ -337,30 +278,18 @@ def main():
                     arcpy.AddMessage("Name of the output: " + "ti_ua" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
 
                 # deleting all layers that were created during the run of the script
-                if arcpy.Exists("reprj_data"):
-                    arcpy.management.Delete("reprj_data")
-                if arcpy.Exists("reprj_area"):
-                    arcpy.management.Delete("reprj_area")
-                if arcpy.Exists("reprj_own_layer"):
-                    arcpy.management.Delete("reprj_own_layer")
                 if arcpy.Exists("hex_grid"):
                     arcpy.management.Delete("hex_grid")
-                arcpy.management.Delete(["data_copy", "clipped_data", "data_isect", "data_isect_diss", "ti_isect", "ti_isect_diss", "tport_istructure"])
+                tn_core.delete_layers(["data_copy", "clipped_data", "data_isect"])
             else:
                 # renaming the output layer: when exporting to shapefile, the version number is added automatically if some other layer with the same name is in the output folder
                 arcpy.management.Rename("hex_gr", "ti_ua" + "_" + siz_uni[0] + siz_uni[1] + area_ending)
                 arcpy.conversion.FeatureClassToShapefile("ti_ua" + "_" + siz_uni[0] + siz_uni[1] + area_ending, workspace[:(workspace.rfind(chr(92)))])
 
                 # deleting all layers that were created during the run of the script
-                if arcpy.Exists("reprj_data"):
-                    arcpy.management.Delete("reprj_data")
-                if arcpy.Exists("reprj_area"):
-                    arcpy.management.Delete("reprj_area")
-                if arcpy.Exists("reprj_own_layer"):
-                    arcpy.management.Delete("reprj_own_layer")
                 if arcpy.Exists("hex_grid"):
                     arcpy.management.Delete("hex_grid")
-                arcpy.management.Delete(["data_copy", "clipped_data", "data_isect", "data_isect_diss", "ti_isect", "ti_isect_diss", "tport_istructure"])
+                tn_core.delete_layers(["data_copy", "clipped_data", "data_isect"])
                 arcpy.env.workspace = workspace[:(workspace.rfind(chr(92)))]
 
                 # deleting the "working.gdb"
@@ -368,8 +297,8 @@ def main():
                 arcpy.AddMessage("Name of the output: " + "ti_ua" + "_" + siz_uni[0] + siz_uni[1] + area_ending + ".shp")
 
             # deleting variables
-            del data, area, size, workspace, cor_sys_string, desc, fields, i, cursor, row, control_selection, check_d, check_a, leng, ending
-            del ti_types, area_name, data_spref, area_spref, cor_sys, selected_features, siz_uni, s, area_ending, v, hex_or_own, own_layer
+            del data, area, size, workspace, disk_workspace, cor_sys_string, desc, fields, i, control_selection, check_d, check_a, leng, ending
+            del ti_types, area_name, data_spref, area_spref, cor_sys, areas, population, ti_codes, selected, values, siz_uni, area_ending, v, hex_or_own, own_layer
             arcpy.AddMessage("Trash deleted")
 
             # finish! :D
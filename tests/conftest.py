@@ -0,0 +1,5 @@
+# the modules of the toolbox are imported from the folder "python_scripts" (the same way as ArcGIS Pro imports them next to the scripts)
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "python_scripts"))
@@ -0,0 +1,41 @@
+import numpy
+
+import box_counting
+
+
+# L-shaped line in the extent 16 x 16: horizontal line through the bottom row of squares and vertical line through the left column,
+# in the finest grid (16 x 16 squares of size 1) it covers 16 + 15 squares, in the coarser grids 15, 7, 3 and 1 squares
+def test_box_counts_l_shape():
+    segments = numpy.array([[0.5, 0.5, 15.5, 0.5], [0.5, 0.5, 0.5, 15.5]])
+    assert box_counting.box_counts(segments, (0, 0, 16, 16), 4) == [1, 3, 7, 15, 31]
+
+
+def test_box_counts_straight_line():
+    segments = numpy.array([[0.5, 0.5, 15.5, 0.5]])
+    assert box_counting.box_counts(segments, (0, 0, 16, 16), 4) == [1, 2, 4, 8, 16]
+    assert box_counting.box_counts_chunk([(segments, (0, 0, 16, 16), 4)] * 2) == [[1, 2, 4, 8, 16]] * 2
+
+
+# counts doubling with each halving of the squares: log(count) = -1 * log(edge) exactly, so slope is -1, its standard error 0 and R2 1
+def test_fit_loglog_exact_line():
+    slope, slope_se, r2 = box_counting.fit_loglog(box_counting.edge_sizes(4), [[1, 2, 4, 8, 16]])
+    assert numpy.allclose(slope, [-1.0])
+    assert numpy.allclose(slope_se, [0.0])
+    assert numpy.allclose(r2, [1.0])
+    assert numpy.allclose(box_counting.transport_provision(slope), [0.5])
+
+
+def test_fit_loglog_matches_polyfit_and_mask():
+    edge = box_counting.edge_sizes(4)
+    counts = [[1, 3, 7, 15, 31], [1, 4, 16, 40, 90]]
+    mask = [[True] * 5, [True, True, True, False, False]]
+    slope, slope_se, r2 = box_counting.fit_loglog(edge, counts, mask)
+    assert numpy.isclose(slope[0], numpy.polyfit(numpy.log(edge), numpy.log(counts[0]), 1)[0])
+    # first three levels of the second hexagon: counts 1, 4, 16, so slope is -2
+    assert numpy.isclose(slope[1], -2.0)
+
+
+def test_fit_loglog_constant_counts():
+    slope, slope_se, r2 = box_counting.fit_loglog(box_counting.edge_sizes(4), [[5, 5, 5, 5, 5]])
+    assert numpy.allclose(slope, [0.0])
+    assert numpy.isnan(r2[0])
@@ -0,0 +1,54 @@
+import numpy
+import pytest
+
+import deciles as dec
+
+
+# the original loop of "Summary Transport Index" tool: values sorted together with OBJECTID, breakpoints at positions round(i*step)-1
+# and the decile moved by at most one decile per value
+def original_classes(values):
+    pairs = sorted([values[k], k] for k in range(len(values)) if values[k] is not None)
+    step = len(pairs) / 10
+    deciles = [pairs[round(i * step) - 1][0] for i in range(1, 10)]
+    classes = [0] * len(values)
+    j = 0
+    for value, k in pairs:
+        if value <= deciles[j]:
+            classes[k] = j + 1
+        elif j < 8:
+            j += 1
+            classes[k] = j + 1
+        else:
+            classes[k] = 10
+    return classes
+
+
+def engine_classes(values):
+    array = numpy.array([numpy.nan if v is None else v for v in values], dtype=float)
+    return dec.classify(array, dec.breakpoints(array[~numpy.isnan(array)])).tolist()
+
+
+@pytest.mark.parametrize("values", [
+    list(range(100)),
+    list(range(37, 0, -1)),
+    [5.0] * 20,
+    [1, 1, 1, 2, 2, 3, 3, 3, 3, 9, 9, 9, 9, 9, 9, 10],
+    [0, 0, 0, 0, 0, 0, 0, 0, 1, 2, 3],
+    [3.5, None, 1.0, None, 2.0, 2.0, 8.0],
+    [1, 2, 3, 4],
+    [7],
+])
+def test_classify_matches_original_loop(values):
+    assert engine_classes(values) == original_classes(values)
+
+
+def test_classify_matches_original_loop_random():
+    generator = numpy.random.default_rng(0)
+    for n in (10, 11, 57, 500):
+        # rounded values, so there are many ties
+        values = numpy.round(generator.gamma(1.0, 3.0, n), 1).tolist()
+        assert engine_classes(values) == original_classes(values)
+
+
+def test_classify_empty_and_missing():
+    assert dec.classify(numpy.array([numpy.nan, numpy.nan]), numpy.zeros(9)).tolist() == [0, 0]
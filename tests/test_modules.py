@@ -0,0 +1,62 @@
+# smoke test: every function of a module of this toolbox which the scripts call ("tn_core.<name>", "box_counting.<name>", ...)
+# has to be defined in that module; the modules are parsed, not imported, so arcpy is not needed
+import ast
+import os
+
+import pytest
+
+FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "python_scripts")
+MODULES = sorted(name[:-3] for name in os.listdir(FOLDER) if name.endswith(".py"))
+
+
+def parse(module):
+    with open(os.path.join(FOLDER, module + ".py"), encoding="utf-8") as file:
+        return ast.parse(file.read())
+
+
+# names defined at the top level of the module (functions, classes, variables and imports)
+def defined_names(module):
+    names = set()
+    for node in parse(module).body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Assign):
+            names.update(target.id for target in node.targets if isinstance(target, ast.Name))
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+    return names
+
+
+# attributes of the modules of this toolbox used by "script": pairs (module, name)
+def used_names(script):
+    tree = parse(script)
+    aliases = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.name in MODULES:
+                    aliases[alias.asname or alias.name] = alias.name
+    used = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id in aliases:
+            used.add((aliases[node.value.id], node.attr))
+    return used
+
+
+@pytest.mark.parametrize("script", MODULES)
+def test_called_names_exist(script):
+    missing = [f"{module}.{name}" for module, name in sorted(used_names(script)) if name not in defined_names(module)]
+    assert missing == []
+
+
+def test_scripts_use_core_modules():
+    used = set()
+    for script in MODULES:
+        used.update(used_names(script))
+    assert {module for module, name in used} >= {"tn_core", "box_counting", "deciles"}
+
+
+# the numeric modules use only numpy, so they can be imported without arcpy
+@pytest.mark.parametrize("module", ["box_counting", "deciles", "hex_lattice"])
+def test_numeric_modules_import(module):
+    __import__(module)